@@ -13,7 +13,7 @@ log = structlog.get_logger()
 ROOT_FOLDER = Path(__file__).resolve().parent.parent
 
 
-@dataclass
+@dataclass(frozen=True)
 class TokenSettings:
     ticker: str
     amount_required: int
@@ -21,7 +21,7 @@ class TokenSettings:
     mintable: bool = False
 
 
-@dataclass
+@dataclass(frozen=True)
 class Settings:
     name: str  # basename (without file extension) of the corresponding toml file
     network: str
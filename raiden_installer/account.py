@@ -1,14 +1,16 @@
 import datetime
+import hashlib
+import hmac
 import json
-import math
 import os
 import random
 import string
 import sys
+import threading
 import time
 import uuid
 from pathlib import Path
-from typing import Optional, Union
+from typing import Dict, Optional, Tuple, Union
 
 from eth_keyfile import create_keyfile_json, decode_keyfile_json
 from eth_typing import Address
@@ -16,7 +18,8 @@ from eth_utils import to_canonical_address, to_checksum_address
 from web3 import Web3
 
 from raiden_installer import log
-from raiden_installer.constants import REQUIRED_BLOCK_CONFIRMATIONS, WEB3_TIMEOUT
+from raiden_installer.constants import UNLOCKED_KEY_TTL, WEB3_TIMEOUT
+from raiden_installer.head_watcher import balance_confirmed, get_head_watcher
 from raiden_installer.tokens import EthereumAmount, Wei
 
 
@@ -37,6 +40,102 @@ def find_keystore_folder_path() -> Path:  # pragma: no cover
         raise RuntimeError("Unsupported Operating System")
 
 
+class _UnlockedKey:
+    def __init__(self, private_key: bytes, passphrase_digest: bytes, expires_at: float):
+        self.private_key = bytearray(private_key)
+        self.passphrase_digest = passphrase_digest
+        self.expires_at = expires_at
+
+    def wipe(self):
+        for index in range(len(self.private_key)):
+            self.private_key[index] = 0
+
+
+class UnlockedKeyCache:
+    """ In-memory cache of decrypted private keys
+
+    Decrypting a keystore file runs a deliberately slow KDF. Once a key has
+    been decrypted it is kept here for ``ttl`` seconds after its last use,
+    together with an HMAC of the passphrase (under a random per-process key),
+    so later unlocks can be verified without running the KDF again. The key
+    material is overwritten when an entry expires or is evicted.
+    """
+
+    def __init__(self, ttl: float = UNLOCKED_KEY_TTL):
+        self.ttl = ttl
+        self._entries: Dict[Tuple[str, str], _UnlockedKey] = {}
+        self._digest_key = os.urandom(32)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_cache_key(keystore_content: dict) -> Tuple[str, str]:
+        crypto = keystore_content.get("crypto") or keystore_content.get("Crypto") or {}
+        return keystore_content.get("address", ""), crypto.get("ciphertext", "")
+
+    def _get_passphrase_digest(self, passphrase: str) -> bytes:
+        return hmac.new(self._digest_key, passphrase.encode(), hashlib.sha256).digest()
+
+    def _get_entry(self, keystore_content: dict) -> Optional[_UnlockedKey]:
+        now = time.monotonic()
+        for cache_key, entry in list(self._entries.items()):
+            if entry.expires_at <= now:
+                self._entries.pop(cache_key).wipe()
+
+        entry = self._entries.get(self._get_cache_key(keystore_content))
+        if entry is not None:
+            entry.expires_at = now + self.ttl
+        return entry
+
+    def check_passphrase(self, keystore_content: dict, passphrase: str) -> Optional[bool]:
+        """ Verify ``passphrase`` against the cache, ``None`` if the key is not unlocked """
+        with self._lock:
+            entry = self._get_entry(keystore_content)
+            if entry is None:
+                return None
+            return hmac.compare_digest(
+                entry.passphrase_digest, self._get_passphrase_digest(passphrase)
+            )
+
+    def get(self, keystore_content: dict, passphrase: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._get_entry(keystore_content)
+            if entry is None or not hmac.compare_digest(
+                entry.passphrase_digest, self._get_passphrase_digest(passphrase)
+            ):
+                return None
+            return bytes(entry.private_key)
+
+    def store(self, keystore_content: dict, passphrase: str, private_key: bytes):
+        with self._lock:
+            cache_key = self._get_cache_key(keystore_content)
+            previous_entry = self._entries.get(cache_key)
+            if previous_entry is not None:
+                previous_entry.wipe()
+            self._entries[cache_key] = _UnlockedKey(
+                private_key,
+                self._get_passphrase_digest(passphrase),
+                time.monotonic() + self.ttl,
+            )
+
+    def evict(self, keystore_content: dict):
+        with self._lock:
+            entry = self._entries.pop(self._get_cache_key(keystore_content), None)
+            if entry is not None:
+                entry.wipe()
+
+    def clear(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry.wipe()
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+UNLOCKED_KEYS = UnlockedKeyCache()
+
+
 class Account:
     def __init__(self, keystore_file_path: Union[Path, str], passphrase: Optional[str] = None):
         self.passphrase = passphrase
@@ -54,7 +153,14 @@ class Account:
         if not self.passphrase:
             raise ValueError("Passphrase is not known, can not get private key")
 
-        return decode_keyfile_json(self.content, self.passphrase.encode())
+        return self._decrypt(self.passphrase)
+
+    def _decrypt(self, passphrase: str) -> bytes:
+        private_key = UNLOCKED_KEYS.get(self.content, passphrase)
+        if private_key is None:
+            private_key = decode_keyfile_json(self.content, passphrase.encode())
+            UNLOCKED_KEYS.store(self.content, passphrase, private_key)
+        return private_key
 
     @property
     def address(self) -> Address:
@@ -66,30 +172,26 @@ class Account:
     def wait_for_ethereum_funds(
         self, w3: Web3, expected_amount: EthereumAmount, timeout: int = WEB3_TIMEOUT
     ) -> EthereumAmount:
-        time_remaining = timeout
-        POLLING_INTERVAL = 1
-        block_with_balance = math.inf
-        current_block = w3.eth.blockNumber
-
-        while (current_block < block_with_balance + REQUIRED_BLOCK_CONFIRMATIONS and
-                time_remaining > 0):
-            current_block = w3.eth.blockNumber
+        try:
+            balance = get_head_watcher(w3).wait_until(
+                balance_confirmed(lambda: self.get_ethereum_balance(w3), expected_amount),
+                timeout=timeout,
+            )
+        except TimeoutError:
             balance = self.get_ethereum_balance(w3)
-
-            if balance >= expected_amount:
-                if block_with_balance == math.inf:
-                    block_with_balance = w3.eth.blockNumber
-            else:
-                block_with_balance = math.inf
-
-            time.sleep(POLLING_INTERVAL)
-            time_remaining -= POLLING_INTERVAL
         log.debug(f"Balance is {balance}")
         return balance
 
     def check_passphrase(self, passphrase):
+        if passphrase is None or self.content is None:
+            return False
+
+        is_valid = UNLOCKED_KEYS.check_passphrase(self.content, passphrase)
+        if is_valid is not None:
+            return is_valid
+
         try:
-            decode_keyfile_json(self.content, passphrase.encode())
+            self._decrypt(passphrase)
             return True
         except Exception:
             return False
@@ -100,6 +202,11 @@ class Account:
         else:
             raise ValueError("Invalid Passphrase")
 
+    def lock(self):
+        self.passphrase = None
+        if self.content is not None:
+            UNLOCKED_KEYS.evict(self.content)
+
     @classmethod
     def generate_private_key(cls):
         return os.urandom(32)
@@ -5,9 +5,45 @@ WEB3_TIMEOUT = 300
 GAS_PRICE_MARGIN = 1.35
 GAS_LIMIT_MARGIN = 1.25
 EXCHANGE_PRICE_MARGIN = 1.2
+EXCHANGE_QUOTE_DEADLINE = 20
+EXCHANGE_METADATA_TTL = 60 * 60
 REQUIRED_BLOCK_CONFIRMATIONS = 5
+WEB3_PROVIDER_CACHE_SIZE = 16
+WEB3_HTTP_POOL_SIZE = 10
+WEB3_HTTP_TIMEOUT = 10
+RPC_BATCH_WINDOW = 0.01
+RPC_BATCH_MAX_WORKERS = 16
+UNLOCKED_KEY_TTL = 15 * 60
+BLOCK_CACHE_HEAD_INTERVAL = 2
+BLOCK_CACHE_MAX_ENTRIES = 1024
+HEAD_WATCHER_POLL_INTERVAL = 1
 NULL_ADDRESS = to_canonical_address("0x0000000000000000000000000000000000000000")
 
+# downloads
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_TIMEOUT = 30
+ARTIFACT_CACHE_MAX_SIZE = 1024 * 2 ** 20
+ARTIFACT_CACHE_STALE_PART_AGE = 24 * 60 * 60
+DOWNLOAD_CONNECTIONS = 4
+DOWNLOAD_MIN_SEGMENT_SIZE = 8 * 2 ** 20
+DOWNLOAD_SEGMENT_RETRIES = 3
+DOWNLOAD_PROGRESS_INTERVAL = 0.5
+RELEASE_INDEX_TTL = 15 * 60
+
+# background tasks
+TASK_HISTORY_SIZE = 100
+
+# raiden client
+READINESS_MIN_INTERVAL = 0.5
+READINESS_MAX_INTERVAL = 4
+READINESS_REQUEST_TIMEOUT = 5
+FLEET_BASE_PORT = 5001
+FLEET_MONITOR_INTERVAL = 5
+FLEET_MAX_RESTARTS = 5
+FLEET_RESTART_BACKOFF = 5
+FLEET_MAX_RESTART_BACKOFF = 5 * 60
+FLEET_READY_TIMEOUT = 30 * 60
+
 # 3rd party urls
 
 ETH_GAS_STATION_API = "https://ethgasstation.info/api/ethgasAPI.json"
@@ -0,0 +1,561 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional, Tuple
+
+import requests
+from xdg import XDG_DATA_HOME
+
+from raiden_installer import log
+from raiden_installer.constants import (
+    ARTIFACT_CACHE_MAX_SIZE,
+    ARTIFACT_CACHE_STALE_PART_AGE,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_CONNECTIONS,
+    DOWNLOAD_MIN_SEGMENT_SIZE,
+    DOWNLOAD_PROGRESS_INTERVAL,
+    DOWNLOAD_SEGMENT_RETRIES,
+    DOWNLOAD_TIMEOUT,
+    RELEASE_INDEX_TTL,
+)
+
+# Called with the number of bytes downloaded so far and the total size, if known
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class ProgressReader:
+    """ File-like wrapper around a stream that reports how much of it has been read """
+
+    def __init__(
+        self,
+        stream: BinaryIO,
+        total_size: Optional[int] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+    ):
+        self.stream = stream
+        self.total_size = total_size
+        self.bytes_read = 0
+        self.progress_callback = progress_callback
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        self.bytes_read += len(data)
+        if self.progress_callback is not None:
+            self.progress_callback(self.bytes_read, self.total_size)
+        return data
+
+
+@contextmanager
+def open_download(
+    url: str, progress_callback: Optional[ProgressCallback] = None
+) -> Iterator[ProgressReader]:
+    """ Stream the body of ``url`` without loading it into memory """
+    with requests.get(url, stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        content_length = response.headers.get("Content-Length")
+        response.raw.decode_content = True
+        yield ProgressReader(
+            response.raw,
+            total_size=int(content_length) if content_length else None,
+            progress_callback=progress_callback,
+        )
+
+
+def copy_stream(source, destination: BinaryIO):
+    shutil.copyfileobj(source, destination, DOWNLOAD_CHUNK_SIZE)
+
+
+@contextmanager
+def atomic_write(destination_path: Path, mode: int = 0o644) -> Iterator[BinaryIO]:
+    """ Write to a temporary file next to ``destination_path`` and move it in place at the end
+
+    Readers never see a partially written file, and nothing is left behind if
+    writing fails.
+    """
+    fd, temporary_path = tempfile.mkstemp(
+        dir=destination_path.parent, prefix=f".{destination_path.name}.", suffix=".part"
+    )
+    try:
+        with open(fd, "wb") as temporary_file:
+            yield temporary_file
+            temporary_file.flush()
+            os.fsync(temporary_file.fileno())
+        os.chmod(temporary_path, mode)
+        os.replace(temporary_path, destination_path)
+    except BaseException:
+        os.unlink(temporary_path)
+        raise
+
+
+class DownloadError(Exception):
+    pass
+
+
+class _CachingReader:
+    """ Reads the part of an artifact downloaded earlier from disk, then the rest from the network
+
+    Everything read from the network is appended to the partial file, and all
+    bytes are hashed on the way through.
+    """
+
+    def __init__(self, partial_path: Path, resume_offset: int, stream: BinaryIO):
+        self.stream = stream
+        self.sha256 = hashlib.sha256()
+        self._partial_file = partial_path.open("r+b" if resume_offset else "wb")
+        self._cached = partial_path.open("rb")
+        self._cached_remaining = resume_offset
+        self._partial_file.seek(resume_offset)
+        self._partial_file.truncate()
+
+    def read(self, size: int = -1) -> bytes:
+        if self._cached_remaining:
+            count = self._cached_remaining if size < 0 else min(size, self._cached_remaining)
+            data = self._cached.read(count)
+            self._cached_remaining -= len(data)
+        else:
+            data = self.stream.read(size)
+            self._partial_file.write(data)
+        self.sha256.update(data)
+        return data
+
+    def drain(self):
+        while self.read(DOWNLOAD_CHUNK_SIZE):
+            pass
+
+    def close(self):
+        self._cached.close()
+        self._partial_file.close()
+
+
+def get_range_support(url: str) -> Optional[Tuple[int, Optional[str]]]:
+    """ Total size and validator of ``url`` if the server answers range requests """
+    headers = {"Range": "bytes=0-0", "Accept-Encoding": "identity"}
+    with requests.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        total_size = response.headers.get("Content-Range", "").rpartition("/")[2]
+        if response.status_code != 206 or not total_size.isdigit():
+            return None
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        return int(total_size), validator
+
+
+class SegmentedDownload:
+    """ Downloads ``url`` into ``path`` over several connections, one byte range each
+
+    The file is allocated to its full size upfront and every connection writes
+    its own segment. A segment that fails is retried from where it stopped,
+    without affecting the others.
+    """
+
+    RETRY_DELAY = 1
+
+    def __init__(
+        self,
+        url: str,
+        path: Path,
+        total_size: int,
+        validator: Optional[str] = None,
+        connections: int = DOWNLOAD_CONNECTIONS,
+        progress_callback: Optional[ProgressCallback] = None,
+        retries: int = DOWNLOAD_SEGMENT_RETRIES,
+    ):
+        self.url = url
+        self.path = path
+        self.total_size = total_size
+        self.validator = validator
+        self.progress_callback = progress_callback
+        self.retries = retries
+        self.bytes_downloaded = 0
+        segment_size = -(-total_size // connections)
+        self.segments = [
+            (start, min(start + segment_size, total_size))
+            for start in range(0, total_size, segment_size)
+        ]
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def run(self):
+        with self.path.open("wb") as download_file:
+            download_file.truncate(self.total_size)
+
+        with ThreadPoolExecutor(
+            max_workers=len(self.segments), thread_name_prefix="wizard-download"
+        ) as executor:
+            pending = {
+                executor.submit(self._download_segment, *segment) for segment in self.segments
+            }
+            try:
+                # Progress is reported from the calling thread, so the callback can cancel
+                while pending:
+                    done, pending = wait(
+                        pending, timeout=DOWNLOAD_PROGRESS_INTERVAL, return_when=FIRST_EXCEPTION
+                    )
+                    for future in done:
+                        future.result()
+                    if self.progress_callback is not None:
+                        self.progress_callback(self.bytes_downloaded, self.total_size)
+            except BaseException:
+                self._stopped.set()
+                raise
+
+    def _download_segment(self, start: int, end: int):
+        offset = start
+        failures = 0
+        with self.path.open("r+b") as download_file:
+            while offset < end and not self._stopped.is_set():
+                headers = {"Range": f"bytes={offset}-{end - 1}", "Accept-Encoding": "identity"}
+                if self.validator is not None:
+                    headers["If-Range"] = self.validator
+                try:
+                    with requests.get(
+                        self.url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT
+                    ) as response:
+                        response.raise_for_status()
+                        if response.status_code != 206:
+                            raise DownloadError(f"{self.url} changed during the download")
+                        download_file.seek(offset)
+                        while offset < end and not self._stopped.is_set():
+                            data = response.raw.read(min(DOWNLOAD_CHUNK_SIZE, end - offset))
+                            if not data:
+                                raise ConnectionError(f"Segment ended at {offset} of {end}")
+                            download_file.write(data)
+                            offset += len(data)
+                            with self._lock:
+                                self.bytes_downloaded += len(data)
+                except OSError as exc:
+                    failures += 1
+                    if failures > self.retries:
+                        raise
+                    log.warning(f"Retrying download of {self.url} at {offset}", error=str(exc))
+                    self._stopped.wait(self.RETRY_DELAY * failures)
+
+
+def _hash_file(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with path.open("rb") as hashed_file:
+        for chunk in iter(lambda: hashed_file.read(DOWNLOAD_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ArtifactCache:
+    """ Local cache of downloaded release archives, keyed by download URL
+
+    Interrupted downloads are resumed with HTTP range requests, and archives
+    are hashed while they are streamed. Completed archives are reused without
+    network access. The least recently used ones are removed once the cache
+    grows beyond ``max_size`` bytes.
+    """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard", "downloads")
+
+    def __init__(self, max_size: int = ARTIFACT_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    @staticmethod
+    def get_key(url: str) -> str:
+        return hashlib.sha256(url.encode()).hexdigest()[:32]
+
+    def _paths(self, url: str):
+        base_path = self.FOLDER_PATH.joinpath(self.get_key(url))
+        return (
+            base_path,
+            base_path.with_suffix(".part"),
+            base_path.with_suffix(".json"),
+        )
+
+    def _read_metadata(self, metadata_path: Path) -> dict:
+        try:
+            return json.loads(metadata_path.read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_metadata(self, metadata_path: Path, metadata: dict):
+        with atomic_write(metadata_path) as metadata_file:
+            metadata_file.write(json.dumps(metadata).encode())
+
+    def get(self, url: str) -> Optional[Path]:
+        """ Path of the completely downloaded and verified archive for ``url``, if cached """
+        artifact_path, _, metadata_path = self._paths(url)
+        metadata = self._read_metadata(metadata_path)
+        try:
+            if not metadata.get("sha256") or artifact_path.stat().st_size != metadata["size"]:
+                return None
+        except FileNotFoundError:
+            return None
+
+        # The modification time doubles as last access time for eviction
+        os.utime(artifact_path)
+        return artifact_path
+
+    @contextmanager
+    def open(
+        self,
+        url: str,
+        progress_callback: Optional[ProgressCallback] = None,
+        sha256: Optional[str] = None,
+        connections: int = DOWNLOAD_CONNECTIONS,
+    ) -> Iterator[ProgressReader]:
+        """ Stream the archive at ``url``, from the cache if possible
+
+        On a cache miss the archive is downloaded (resuming an earlier partial
+        download if there is one) and stored while it is being read. With more
+        than one connection, servers that answer range requests are downloaded
+        in segments first. If ``sha256`` is given, the download is only
+        accepted if it matches.
+        """
+        downloaded = False
+        with self._locks[self.get_key(url)]:
+            self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+
+            artifact_path = self.get(url)
+            if artifact_path is None and connections > 1:
+                artifact_path = self._download_segmented(
+                    url, progress_callback, sha256, connections
+                )
+                downloaded = artifact_path is not None
+
+            if artifact_path is not None:
+                metadata = self._read_metadata(self._paths(url)[2])
+                if sha256 is not None and metadata["sha256"] != sha256:
+                    raise DownloadError(f"Cached archive for {url} does not match {sha256}")
+                log.debug(f"Using cached archive for {url}")
+                with artifact_path.open("rb") as cached_file:
+                    # Progress of a segmented download was reported while downloading
+                    yield ProgressReader(
+                        cached_file,
+                        artifact_path.stat().st_size,
+                        None if downloaded else progress_callback,
+                    )
+            else:
+                with self._download(url, progress_callback, sha256) as reader:
+                    yield reader
+                downloaded = True
+
+        if downloaded:
+            self.evict()
+
+    @contextmanager
+    def _download(self, url, progress_callback, sha256):
+        _, partial_path, metadata_path = self._paths(url)
+        metadata = self._read_metadata(metadata_path)
+        if metadata.get("url") != url or not partial_path.exists():
+            metadata = {"url": url}
+        resume_offset = partial_path.stat().st_size if "validator" in metadata else 0
+
+        headers = {}
+        if resume_offset:
+            headers["Range"] = f"bytes={resume_offset}-"
+            headers["If-Range"] = metadata["validator"]
+
+        with requests.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+            if response.status_code == 416:
+                # The partial download is not part of what the server has now
+                resume_offset = 0
+                partial_path.unlink()
+                with self._download(url, progress_callback, sha256) as reader:
+                    yield reader
+                return
+
+            response.raise_for_status()
+            if response.status_code != 206:
+                resume_offset = 0
+            elif resume_offset:
+                log.info(f"Resuming download of {url} at {resume_offset} bytes")
+
+            content_length = response.headers.get("Content-Length")
+            size = resume_offset + int(content_length) if content_length else None
+            validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+            if validator is not None:
+                self._write_metadata(metadata_path, {"url": url, "validator": validator})
+
+            response.raw.decode_content = True
+            reader = _CachingReader(partial_path, resume_offset, response.raw)
+            try:
+                yield ProgressReader(reader, size, progress_callback)
+                reader.drain()
+            finally:
+                reader.close()
+
+        self._store(url, reader.sha256.hexdigest(), size, sha256)
+
+    def _download_segmented(self, url, progress_callback, sha256, connections) -> Optional[Path]:
+        artifact_path, partial_path, metadata_path = self._paths(url)
+        if "validator" in self._read_metadata(metadata_path) and partial_path.exists():
+            # Resuming the interrupted single stream download is cheaper
+            return None
+
+        range_support = get_range_support(url)
+        if range_support is None:
+            log.debug(f"{url} does not support range requests, using a single stream")
+            return None
+        total_size, validator = range_support
+        connections = min(connections, total_size // DOWNLOAD_MIN_SEGMENT_SIZE)
+        if connections < 2:
+            return None
+
+        if metadata_path.exists():
+            metadata_path.unlink()
+        download = SegmentedDownload(
+            url, partial_path, total_size, validator, connections, progress_callback
+        )
+        try:
+            download.run()
+        except BaseException:
+            # Segments can't be resumed as a single stream, so start over next time
+            partial_path.unlink()
+            raise
+
+        self._store(url, _hash_file(partial_path), total_size, sha256)
+        return artifact_path
+
+    def _store(self, url: str, digest: str, size: Optional[int], sha256: Optional[str]):
+        """ Move a finished download into the cache, after checking it is complete and intact """
+        artifact_path, partial_path, metadata_path = self._paths(url)
+        downloaded_size = partial_path.stat().st_size
+        if (sha256 is not None and digest != sha256) or (size and downloaded_size != size):
+            partial_path.unlink()
+            if metadata_path.exists():
+                metadata_path.unlink()
+            raise DownloadError(f"Download of {url} is corrupted, sha256 {digest}")
+
+        os.replace(partial_path, artifact_path)
+        self._write_metadata(
+            metadata_path, {"url": url, "size": downloaded_size, "sha256": digest}
+        )
+
+    def evict(self):
+        """ Remove the least recently used archives until the cache fits into ``max_size``
+
+        Partial files are only removed once they haven't been written to for
+        ``ARTIFACT_CACHE_STALE_PART_AGE`` seconds, as they may belong to a
+        download still running in another thread or wizard process.
+        """
+        if not self.FOLDER_PATH.exists():
+            return
+
+        now = time.time()
+        total_size = 0
+        artifacts = []
+        for path in self.FOLDER_PATH.iterdir():
+            if path.suffix not in ("", ".part"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            total_size += stat.st_size
+            if path.suffix != ".part" or now - stat.st_mtime > ARTIFACT_CACHE_STALE_PART_AGE:
+                artifacts.append((stat.st_mtime, stat.st_size, path))
+
+        for _, size, path in sorted(artifacts)[:-1]:
+            if total_size <= self.max_size:
+                break
+            log.debug(f"Evicting {path} from the download cache")
+            for evicted_path in (path, path.with_suffix(".json")):
+                try:
+                    evicted_path.unlink()
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+
+
+ARTIFACT_CACHE = ArtifactCache()
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    content: bytes
+    fetched_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ReleaseIndexCache:
+    """ On-disk cache of release index responses, shared by all wizards of a user
+
+    Entries younger than ``ttl`` seconds are used without network access.
+    Older ones are revalidated with a conditional request, which GitHub
+    does not count against the rate limit when nothing changed. If the index
+    can't be fetched, a stale entry is better than failing the launch.
+    """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard", "release-index")
+
+    def __init__(self, ttl: float = RELEASE_INDEX_TTL):
+        self.ttl = ttl
+        self._locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    def _get_path(self, url: str) -> Path:
+        return self.FOLDER_PATH.joinpath(f"{ArtifactCache.get_key(url)}.json")
+
+    def _load(self, url: str) -> Optional[CachedResponse]:
+        try:
+            data = json.loads(self._get_path(url).read_text())
+            data["content"] = data["content"].encode()
+            cached_response = CachedResponse(**data)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return cached_response if cached_response.url == url else None
+
+    def _store(self, cached_response: CachedResponse):
+        self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        data = dict(cached_response.__dict__, content=cached_response.content.decode())
+        with atomic_write(self._get_path(cached_response.url)) as cache_file:
+            cache_file.write(json.dumps(data).encode())
+
+    def get(self, url: str) -> CachedResponse:
+        with self._locks[url]:
+            cached_response = self._load(url)
+            if cached_response is not None and cached_response.age < self.ttl:
+                return cached_response
+
+            headers = {}
+            if cached_response is not None and cached_response.etag:
+                headers["If-None-Match"] = cached_response.etag
+            if cached_response is not None and cached_response.last_modified:
+                headers["If-Modified-Since"] = cached_response.last_modified
+
+            try:
+                response = requests.get(url, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+                if response.status_code != 304:
+                    response.raise_for_status()
+            except requests.RequestException as exc:
+                if cached_response is None:
+                    raise
+                log.warning(f"Could not refresh {url}, using cached index", error=str(exc))
+                return cached_response
+
+            if response.status_code == 304 and cached_response is not None:
+                cached_response.fetched_at = time.time()
+            else:
+                cached_response = CachedResponse(
+                    url=url,
+                    content=response.content,
+                    fetched_at=time.time(),
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+            self._store(cached_response)
+            return cached_response
+
+
+RELEASE_INDEX_CACHE = ReleaseIndexCache()
@@ -1,11 +1,22 @@
+import hashlib
+import hmac
+import os
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from re import search
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import requests
 import structlog
+from eth_utils import to_bytes
 from hexbytes import HexBytes
 from web3 import HTTPProvider, Web3
+from web3._utils.caching import generate_cache_key
+from web3._utils.encoding import FriendlyJsonSerde
 from web3.eth import Eth
 from web3.exceptions import BlockNotFound
 from web3.gas_strategies.time_based import construct_time_based_gas_price_strategy
@@ -13,19 +24,384 @@ from web3.middleware import construct_sign_and_send_raw_middleware, simple_cache
 from web3.types import Wei
 
 from raiden_installer.account import Account
-from raiden_installer.constants import ETH_GAS_STATION_API, GAS_PRICE_MARGIN
-from raiden_installer.network import Network
+from raiden_installer.constants import (
+    BLOCK_CACHE_HEAD_INTERVAL,
+    BLOCK_CACHE_MAX_ENTRIES,
+    ETH_GAS_STATION_API,
+    GAS_PRICE_MARGIN,
+    RPC_BATCH_MAX_WORKERS,
+    RPC_BATCH_WINDOW,
+    WEB3_HTTP_POOL_SIZE,
+    WEB3_HTTP_TIMEOUT,
+    WEB3_PROVIDER_CACHE_SIZE,
+)
+from raiden_installer.network import Network, get_chain_context
 
 log = structlog.get_logger()
 
 EXTRA_DATA_LENGTH = 66  # 32 bytes hex encoded + `0x` prefix
+SIGNING_MIDDLEWARE = "sign_and_send_raw"
 WEB3_BLOCK_NOT_FOUND_RETRY_COUNT = 3
 
+RPC_BATCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=RPC_BATCH_MAX_WORKERS, thread_name_prefix="rpc-batch"
+)
 
-def make_web3_provider(url: str, account: Account) -> Web3:
-    w3 = Web3(HTTPProvider(url))
+_batch_context = threading.local()
+
+
+def make_http_session(pool_size: int = WEB3_HTTP_POOL_SIZE) -> requests.Session:
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class SessionHTTPProvider(HTTPProvider):
+    """ HTTPProvider that sends its requests through a keep-alive ``requests.Session``
+
+    The stock provider looks the session up in a small global cache shared by
+    every endpoint, so connections (and TLS handshakes) are not reliably reused.
+    """
+
+    def __init__(self, endpoint_uri: str, session: Optional[requests.Session] = None, **kw):
+        super().__init__(endpoint_uri, **kw)
+        self.session = session or make_http_session()
+
+    def post(self, request_data: bytes) -> bytes:
+        request_kwargs = self.get_request_kwargs()
+        request_kwargs.setdefault("timeout", WEB3_HTTP_TIMEOUT)
+        response = self.session.post(self.endpoint_uri, data=request_data, **request_kwargs)
+        response.raise_for_status()
+        return response.content
+
+    def make_request(self, method, params):
+        batch = getattr(_batch_context, "batch", None)
+        if batch is not None and batch.provider is self:
+            return batch.request(method, params)
+
+        request_data = self.encode_rpc_request(method, params)
+        return self.decode_rpc_response(self.post(request_data))
+
+
+class _PendingRequest:
+    def __init__(self, request_id: int, method: str, params: Any):
+        self.payload = {
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": params or [],
+            "id": request_id,
+        }
+        self.done = threading.Event()
+        self.response: Optional[dict] = None
+        self.error: Optional[Exception] = None
+
+
+class JSONRPCBatch:
+    """ Coalesces the requests of concurrently running read calls into JSON-RPC batches
+
+    Calls registered with ``call`` run on worker threads once the batch is
+    executed. Their requests are held back until every running call is
+    waiting on the node, or until ``window`` seconds have passed, and are then
+    sent to the node in a single POST.
+    """
+
+    def __init__(self, provider: SessionHTTPProvider, window: float = RPC_BATCH_WINDOW):
+        self.provider = provider
+        self.window = window
+        self.round_trips = 0
+        self._calls: List[Tuple[Future, Callable, tuple, dict]] = []
+        self._pending: List[_PendingRequest] = []
+        self._running = 0
+        self._flush_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def call(self, function: Callable, *args, **kw) -> Future:
+        future: Future = Future()
+        self._calls.append((future, function, args, kw))
+        return future
+
+    def execute(self):
+        calls, self._calls = self._calls, []
+        with self._lock:
+            self._running += len(calls)
+        wait([RPC_BATCH_EXECUTOR.submit(self._run_call, *call) for call in calls])
+
+    def request(self, method: str, params: Any) -> dict:
+        pending = _PendingRequest(next(self.provider.request_counter), method, params)
+        with self._lock:
+            self._pending.append(pending)
+            ready = self._take_if_all_waiting()
+            if not ready and self._flush_timer is None:
+                self._flush_timer = threading.Timer(self.window, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        self._send(ready)
+
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.response  # type: ignore
+
+    def flush(self):
+        with self._lock:
+            ready = self._take_pending()
+        self._send(ready)
+
+    def _run_call(self, future: Future, function: Callable, args: tuple, kw: dict):
+        _batch_context.batch = self
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(*args, **kw))
+                except Exception as exc:
+                    future.set_exception(exc)
+        finally:
+            _batch_context.batch = None
+            with self._lock:
+                self._running -= 1
+                ready = self._take_if_all_waiting()
+            self._send(ready)
+
+    def _take_if_all_waiting(self) -> List[_PendingRequest]:
+        if self._pending and len(self._pending) >= self._running:
+            return self._take_pending()
+        return []
+
+    def _take_pending(self) -> List[_PendingRequest]:
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        ready, self._pending = self._pending, []
+        return ready
+
+    def _send(self, requests: List[_PendingRequest]):
+        if not requests:
+            return
+
+        self.round_trips += 1
+        try:
+            request_data = to_bytes(
+                text=FriendlyJsonSerde().json_encode([request.payload for request in requests])
+            )
+            responses = self.provider.decode_rpc_response(self.provider.post(request_data))
+            if isinstance(responses, dict):
+                # Nodes answer with a single error object if they reject the whole batch
+                responses = [{**responses, "id": request.payload["id"]} for request in requests]
+            responses_by_id = {response["id"]: response for response in responses}
+            for request in requests:
+                request.response = responses_by_id[request.payload["id"]]
+        except Exception as exc:
+            for request in requests:
+                request.error = exc
+        finally:
+            for request in requests:
+                request.done.set()
+
+
+@contextmanager
+def batch_requests(w3: Web3, window: float = RPC_BATCH_WINDOW):
+    """ Run the calls registered on the batch concurrently when the block exits
+
+    Example::
+
+        with batch_requests(w3) as batch:
+            eth_balance = batch.call(account.get_ethereum_balance, w3)
+            token_balance = batch.call(get_token_balance, w3, account, token)
+
+        eth_balance.result()
+    """
+    batch = JSONRPCBatch(w3.provider, window=window)
+    yield batch
+    batch.execute()
+
+
+def _timed(function: Callable, *args) -> Tuple[Any, float]:
+    started_at = time.monotonic()
+    result = function(*args)
+    return result, time.monotonic() - started_at
+
+
+def run_call_graph(
+    w3: Web3, steps: Dict[str, Tuple[Callable, Tuple[str, ...]]]
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """ Run interdependent calls, each as soon as the results it depends on are known
+
+    ``steps`` maps a name to a function and the names of the steps whose
+    results it takes as arguments. All steps that are ready at the same time
+    run as one batch, so their requests share a round trip. Returns the
+    results and the latency of every step; the first error is raised.
+
+    Example::
+
+        results, latencies = run_call_graph(w3, {
+            "block": (lambda: w3.eth.getBlock("latest"), ()),
+            "gas_price": (w3.eth.generateGasPrice, ()),
+            "gas": (estimate, ("block", "gas_price")),
+        })
+    """
+    results: Dict[str, Any] = {}
+    latencies: Dict[str, float] = {}
+    remaining = dict(steps)
+    while remaining:
+        ready = {
+            name: step
+            for name, step in remaining.items()
+            if all(dependency in results for dependency in step[1])
+        }
+        if not ready:
+            raise ValueError(f"Unresolvable dependencies of {', '.join(remaining)}")
+
+        with batch_requests(w3) as batch:
+            calls = {
+                name: batch.call(_timed, function, *(results[d] for d in dependencies))
+                for name, (function, dependencies) in ready.items()
+            }
+        for name, call in calls.items():
+            results[name], latencies[name] = call.result()
+            del remaining[name]
+    return results, latencies
+
+
+class BlockCache:
+    """ Cache for read requests, keyed by method, params and the current head
+
+    The head is refreshed with ``eth_blockNumber`` at most once every
+    ``head_interval`` seconds and all entries are dropped as soon as a new
+    head shows up. Cached results can therefore lag behind the chain by up to
+    ``head_interval``. One cache is shared by all accounts using an endpoint.
+    """
+
+    CACHED_METHODS = {
+        "eth_blockNumber",
+        "eth_call",
+        "eth_estimateGas",
+        "eth_gasPrice",
+        "eth_getBalance",
+        "eth_getCode",
+        "eth_getStorageAt",
+        "eth_getTransactionCount",
+        "eth_getTransactionReceipt",
+    }
+
+    def __init__(
+        self,
+        head_interval: float = BLOCK_CACHE_HEAD_INTERVAL,
+        max_entries: int = BLOCK_CACHE_MAX_ENTRIES,
+    ):
+        self.head_interval = head_interval
+        self.max_entries = max_entries
+        self.head: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._head_checked_at = 0.0
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._head_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "head": self.head,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+        }
+
+    def is_cacheable(self, method: str, params: Any) -> bool:
+        # "pending" state changes with every transaction we send
+        return method in self.CACHED_METHODS and "pending" not in (params or [])
+
+    def update_head(self, make_request: Callable) -> Optional[int]:
+        if time.monotonic() - self._head_checked_at < self.head_interval:
+            return self.head
+
+        # Only one thread refreshes the head, the others go on with the current one
+        if not self._head_lock.acquire(blocking=False):
+            return self.head
+        try:
+            response = make_request("eth_blockNumber", [])
+            if "result" not in response:
+                return self.head
+
+            head = int(response["result"], 16)
+            with self._lock:
+                self._head_checked_at = time.monotonic()
+                if head != self.head:
+                    if self._entries:
+                        self.invalidations += 1
+                    self._entries.clear()
+                    self.head = head
+                    self._entries[generate_cache_key(("eth_blockNumber", []))] = response
+            return head
+        finally:
+            self._head_lock.release()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return response
+
+    def set(self, key: str, head: int, response: dict):
+        with self._lock:
+            # The head may have moved on while the request was in flight
+            if head != self.head or "result" not in response:
+                return
+            self._entries[key] = response
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.head = None
+            self._head_checked_at = 0.0
+
+
+def construct_block_cache_middleware(block_cache: BlockCache):
+    def block_cache_middleware(make_request, web3: Web3):  # pylint: disable=unused-argument
+        def middleware(method, params):
+            if not block_cache.is_cacheable(method, params):
+                return make_request(method, params)
+
+            head = block_cache.update_head(make_request)
+            if head is None:
+                return make_request(method, params)
+
+            key = generate_cache_key((method, params))
+            response = block_cache.get(key)
+            if response is None:
+                response = make_request(method, params)
+                block_cache.set(key, head, response)
+            return response
+
+        return middleware
+
+    return block_cache_middleware
+
+
+def make_web3_provider(
+    url: str,
+    account: Account,
+    session: Optional[requests.Session] = None,
+    block_cache: Optional[BlockCache] = None,
+) -> Web3:
+    w3 = Web3(SessionHTTPProvider(url, session=session))
     w3.middleware_onion.add(simple_cache_middleware)
-    if is_infura(w3):
+    # Innermost, so that raw responses are cached
+    w3.middleware_onion.inject(
+        construct_block_cache_middleware(block_cache or BlockCache()), layer=0
+    )
+    if is_infura(w3) and not getattr(Eth.getBlock, "retries_block_not_found", False):
         # Infura sometimes erroneously returns `null` for existing (but very recent) blocks.
         # Work around this by retrying those requests.
         # See docstring for details.
@@ -35,7 +411,7 @@ def make_web3_provider(url: str, account: Account) -> Web3:
         # FIXME: This is a temporary fix to speed up gas price generation
         # by fetching from eth_gas_station if possible.
         # Once we have a reliable gas price calculation this can be removed
-        if int(web3.net.version) == 1:
+        if get_chain_context(web3).chain_id == 1:
             try:
                 response = requests.get(ETH_GAS_STATION_API)
                 if response and response.status_code == 200:
@@ -54,12 +430,129 @@ def make_web3_provider(url: str, account: Account) -> Web3:
     w3.eth.setGasPriceStrategy(gas_price_strategy_eth_gas_station_or_with_margin)
 
     if account.passphrase is not None:
-        w3.middleware_onion.add(construct_sign_and_send_raw_middleware(account.private_key))
+        set_signing_account(w3, account)
     w3.middleware_onion.inject(make_sane_poa_middleware, layer=0)
 
     return w3
 
 
+def set_signing_account(w3: Web3, account: Account, middleware=None):
+    """ Sign the transactions sent through ``w3`` with the key of ``account``
+
+    Replaces the signer of a previous call. ``middleware`` can be built
+    beforehand, since unlocking the private key is slow.
+    """
+    if middleware is None:
+        middleware = construct_sign_and_send_raw_middleware(account.private_key)
+    if SIGNING_MIDDLEWARE in w3.middleware_onion:
+        w3.middleware_onion.replace(SIGNING_MIDDLEWARE, middleware)
+    else:
+        w3.middleware_onion.add(middleware, name=SIGNING_MIDDLEWARE)
+
+
+class _RegistryEntry:
+    def __init__(self, w3: Web3):
+        self.w3 = w3
+        # Digest of the passphrase that unlocked the key of the signer, if there is one
+        self.passphrase_digest: Optional[bytes] = None
+        self.lock = threading.Lock()
+
+
+class Web3ProviderRegistry:
+    """ Process-wide, size bounded LRU of ready-to-use ``Web3`` instances
+
+    Entries are keyed by ``(endpoint, account address)``. Whether the account
+    is unlocked doesn't matter for the key: the signer of an entry is added,
+    or replaced when the passphrase changes, as soon as an unlocked account is
+    passed, and kept for locked ones. All entries for one endpoint share the
+    same keep-alive HTTP session and ``BlockCache``.
+    """
+
+    def __init__(self, max_size: int = WEB3_PROVIDER_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Tuple[str, bytes], _RegistryEntry]" = OrderedDict()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._block_caches: Dict[str, BlockCache] = {}
+        self._digest_key = os.urandom(32)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_passphrase_digest(self, passphrase: str) -> bytes:
+        return hmac.new(self._digest_key, passphrase.encode(), hashlib.sha256).digest()
+
+    def get(self, url: str, account: Account) -> Web3:
+        key = (url, account.address)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            else:
+                session = self._sessions.get(url) or make_http_session()
+                block_cache = self._block_caches.get(url) or BlockCache()
+
+        if entry is None:
+            # Built without holding the lock, unlocking the key takes a while
+            w3 = make_web3_provider(url, account, session=session, block_cache=block_cache)
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._entries[key] = _RegistryEntry(w3)
+                    if account.passphrase is not None:
+                        entry.passphrase_digest = self._get_passphrase_digest(account.passphrase)
+                    self._sessions.setdefault(url, session)
+                    self._block_caches.setdefault(url, block_cache)
+                self._entries.move_to_end(key)
+
+                while len(self._entries) > self.max_size:
+                    (evicted_url, _), _ = self._entries.popitem(last=False)
+                    self._release_endpoint(evicted_url)
+
+        if account.passphrase is not None:
+            self._update_signer(entry, account)
+        return entry.w3
+
+    def _update_signer(self, entry: _RegistryEntry, account: Account):
+        passphrase_digest = self._get_passphrase_digest(account.passphrase)
+        if entry.passphrase_digest == passphrase_digest:
+            return
+
+        middleware = construct_sign_and_send_raw_middleware(account.private_key)
+        with entry.lock:
+            if entry.passphrase_digest != passphrase_digest:
+                set_signing_account(entry.w3, account, middleware)
+                entry.passphrase_digest = passphrase_digest
+
+    def get_block_cache(self, url: str) -> Optional[BlockCache]:
+        return self._block_caches.get(url)
+
+    def _release_endpoint(self, url: str):
+        if any(entry_url == url for entry_url, _ in self._entries):
+            return
+
+        self._block_caches.pop(url, None)
+        session = self._sessions.pop(url, None)
+        if session is not None:
+            session.close()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+            self._block_caches.clear()
+
+
+WEB3_PROVIDER_REGISTRY = Web3ProviderRegistry()
+
+
+def get_web3_provider(url: str, account: Account) -> Web3:
+    return WEB3_PROVIDER_REGISTRY.get(url, account)
+
+
 class EthereumRPCProvider:
     def __init__(self, url):
         self.url = url
@@ -157,6 +650,7 @@ def make_patched_web3_get_block(original_func):
         if last_ex is not None:
             raise last_ex
 
+    patched_web3_get_block.retries_block_not_found = True  # type: ignore
     return patched_web3_get_block
 
 
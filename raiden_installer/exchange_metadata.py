@@ -0,0 +1,104 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from xdg import XDG_DATA_HOME
+
+from raiden_installer import log
+from raiden_installer.constants import EXCHANGE_METADATA_TTL
+from raiden_installer.downloads import atomic_write
+
+
+class ExchangeMetadataCache:
+    """ On-disk cache of exchange contract values, like addresses and parameters, per chain
+
+    These values change rarely if ever. An entry older than ``ttl`` seconds is
+    still returned right away and refreshed in a background thread. Values
+    that never change can be stored with ``set`` and read with ``lookup``,
+    which ignores their age. Values have to be serializable as JSON.
+    """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard")
+    FILE_NAME = "exchange-metadata.json"
+
+    def __init__(self, ttl: float = EXCHANGE_METADATA_TTL):
+        self.ttl = ttl
+        self._entries: Optional[Dict[Tuple[int, str], Tuple[Any, float]]] = None
+        self._refreshing: Set[Tuple[int, str]] = set()
+        self._lock = threading.Lock()
+
+    @property
+    def path(self) -> Path:
+        return self.FOLDER_PATH.joinpath(self.FILE_NAME)
+
+    def _load(self) -> Dict[Tuple[int, str], Tuple[Any, float]]:
+        if self._entries is None:
+            entries = {}
+            try:
+                data = json.loads(self.path.read_text())
+                for chain_id, chain_entries in data.items():
+                    for key, (value, fetched_at) in chain_entries.items():
+                        entries[(int(chain_id), key)] = (value, fetched_at)
+            except (OSError, ValueError, TypeError):
+                pass
+            self._entries = entries
+        return self._entries
+
+    def _save(self):
+        data: Dict[str, dict] = {}
+        for (chain_id, key), entry in self._load().items():
+            data.setdefault(str(chain_id), {})[key] = entry
+        try:
+            self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+            with atomic_write(self.path) as metadata_file:
+                metadata_file.write(json.dumps(data).encode())
+        except OSError as exc:
+            log.warning("Could not store exchange metadata", error=str(exc))
+
+    def set(self, chain_id: int, key: str, value: Any):
+        with self._lock:
+            self._load()[(chain_id, key)] = (value, time.time())
+            self._save()
+
+    def lookup(self, chain_id: int, key: str) -> Any:
+        """ Cached value of ``key`` regardless of its age, None if there is none """
+        with self._lock:
+            entry = self._load().get((chain_id, key))
+        return entry and entry[0]
+
+    def get(self, chain_id: int, key: str, fetch: Callable[[], Any]) -> Any:
+        """ Cached value of ``key``, calls ``fetch`` only if nothing is cached yet """
+        with self._lock:
+            entry = self._load().get((chain_id, key))
+
+        if entry is None:
+            value = fetch()
+            self.set(chain_id, key, value)
+            return value
+
+        value, fetched_at = entry
+        if time.time() - fetched_at > self.ttl:
+            self._refresh_in_background(chain_id, key, fetch)
+        return value
+
+    def _refresh_in_background(self, chain_id: int, key: str, fetch: Callable[[], Any]):
+        with self._lock:
+            if (chain_id, key) in self._refreshing:
+                return
+            self._refreshing.add((chain_id, key))
+
+        def refresh():
+            try:
+                self.set(chain_id, key, fetch())
+            except Exception as exc:
+                log.warning(f"Could not refresh {key}, keeping the cached value", error=str(exc))
+            finally:
+                with self._lock:
+                    self._refreshing.discard((chain_id, key))
+
+        threading.Thread(target=refresh, name="exchange-metadata", daemon=True).start()
+
+
+EXCHANGE_METADATA = ExchangeMetadataCache()
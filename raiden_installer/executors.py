@@ -0,0 +1,142 @@
+import functools
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict
+
+from tornado.ioloop import IOLoop
+
+from raiden_installer import log
+
+# Work classes
+RPC = "rpc"
+TRANSACTIONS = "transactions"
+FILE_IO = "files"
+QUOTES = "quotes"
+
+DEFAULT_POOL_SIZES = {RPC: 8, TRANSACTIONS: 4, FILE_IO: 2, QUOTES: 4}
+
+
+class InstrumentedThreadPoolExecutor(ThreadPoolExecutor):
+    """ ThreadPoolExecutor that keeps track of queueing and running times """
+
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f"wizard-{name}")
+        self.name = name
+        self.max_workers = max_workers
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.active = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    def submit(self, fn: Callable, *args, **kw) -> Future:  # type: ignore
+        submitted_at = time.monotonic()
+
+        def instrumented():
+            started_at = time.monotonic()
+            wait_time = started_at - submitted_at
+            with self._stats_lock:
+                self.active += 1
+                self.total_wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+
+            failed = False
+            try:
+                return fn(*args, **kw)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._stats_lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.failed += int(failed)
+                    self.total_run_time += time.monotonic() - started_at
+
+        with self._stats_lock:
+            self.submitted += 1
+        future = super().submit(instrumented)
+        future.add_done_callback(self._count_cancelled)
+        return future
+
+    def _count_cancelled(self, future: Future):
+        # Cancelled jobs never run, so they would be counted as queued forever
+        if future.cancelled():
+            with self._stats_lock:
+                self.cancelled += 1
+
+    @property
+    def queued(self) -> int:
+        return self.submitted - self.completed - self.cancelled - self.active
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            completed = self.completed or 1
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "active": self.active,
+                "queued": self.submitted - self.completed - self.cancelled - self.active,
+                "mean_wait_time": self.total_wait_time / completed,
+                "max_wait_time": self.max_wait_time,
+                "mean_run_time": self.total_run_time / completed,
+            }
+
+
+_executors: Dict[str, InstrumentedThreadPoolExecutor] = {}
+_pool_sizes: Dict[str, int] = {}
+_executors_lock = threading.Lock()
+
+
+def get_pool_size(work_class: str) -> int:
+    environment_variable = f"RAIDEN_INSTALLER_{work_class.upper()}_WORKERS"
+    if work_class in _pool_sizes:
+        return _pool_sizes[work_class]
+    if environment_variable in os.environ:
+        return int(os.environ[environment_variable])
+    return DEFAULT_POOL_SIZES[work_class]
+
+
+def configure_executors(**pool_sizes: int):
+    """ Set the number of workers per work class, e.g. ``configure_executors(rpc=16)``
+
+    Has to be called before the first job of a work class is submitted.
+    """
+    with _executors_lock:
+        for work_class, pool_size in pool_sizes.items():
+            if work_class in _executors:
+                raise RuntimeError(f"Executor for {work_class} work is already running")
+            _pool_sizes[work_class] = pool_size
+
+
+def get_executor(work_class: str) -> InstrumentedThreadPoolExecutor:
+    with _executors_lock:
+        executor = _executors.get(work_class)
+        if executor is None:
+            executor = InstrumentedThreadPoolExecutor(work_class, get_pool_size(work_class))
+            _executors[work_class] = executor
+            log.debug(f"Started {work_class} executor with {executor.max_workers} workers")
+        return executor
+
+
+def get_executor_stats() -> Dict[str, dict]:
+    with _executors_lock:
+        executors = list(_executors.values())
+    return {executor.name: executor.stats() for executor in executors}
+
+
+async def run_blocking(work_class: str, fn: Callable, *args, **kw):
+    """ Run ``fn`` on the pool of ``work_class`` without blocking the IOLoop """
+    return await IOLoop.current().run_in_executor(
+        get_executor(work_class), functools.partial(fn, *args, **kw)
+    )
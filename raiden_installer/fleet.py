@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from eth_utils import to_checksum_address
+from xdg import XDG_DATA_HOME
+
+from raiden_installer import load_settings, log
+from raiden_installer.base import RaidenConfigurationFile
+from raiden_installer.constants import (
+    FLEET_BASE_PORT,
+    FLEET_MAX_RESTART_BACKOFF,
+    FLEET_MAX_RESTARTS,
+    FLEET_MONITOR_INTERVAL,
+    FLEET_READY_TIMEOUT,
+    FLEET_RESTART_BACKOFF,
+)
+from raiden_installer.downloads import atomic_write
+from raiden_installer.raiden import RaidenClient, RaidenClientError
+from raiden_installer.readiness import SyncProgress
+
+
+def is_port_free(port: int, host: str = "127.0.0.1") -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind((host, port))
+        except OSError:
+            return False
+    return True
+
+
+class FleetInstance:
+    """ One client of the fleet and what is known about its state """
+
+    STARTING = "starting"
+    SYNCING = "syncing"
+    READY = "ready"
+    RESTARTING = "restarting"
+    FAILED = "failed"
+    STOPPED = "stopped"
+
+    def __init__(self, configuration_file, passphrase_file: Path, client):
+        self.configuration_file = configuration_file
+        self.passphrase_file = passphrase_file
+        self.client = client
+        self.address = to_checksum_address(configuration_file.account.address)
+        # The process of the client is looked up by its instance name
+        self.client.instance_name = self.address
+        self.state = self.STARTING
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.progress: Optional[SyncProgress] = None
+        self.time_to_ready: Optional[float] = None
+        self.ready_since: Optional[float] = None
+        # Set once the instance is ready or gave up
+        self.settled = threading.Event()
+
+    @property
+    def api_port(self) -> int:
+        return self.client.api_port
+
+    @api_port.setter
+    def api_port(self, port: int):
+        self.client.api_port = port
+
+    def set_progress(self, progress: SyncProgress):
+        self.progress = progress
+        if progress.status == "syncing":
+            self.state = self.SYNCING
+
+    def to_dict(self) -> dict:
+        return {
+            "address": self.address,
+            "api_url": self.client.web_ui_index_url,
+            "pid": self.client.get_process_id(),
+            "state": self.state,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "progress": self.progress and self.progress.to_dict(),
+            "time_to_ready": self.time_to_ready,
+        }
+
+
+class RaidenFleet:
+    """ Runs one Raiden client per configuration file on this host
+
+    Every client gets its own API port; ports are remembered per address, so a
+    client keeps its URL across restarts of the fleet. Clients are started and
+    waited for concurrently, at most ``max_concurrent_starts`` at a time, and
+    restarted with exponential backoff when they crash.
+    """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard", "run")
+    PORTS_FILE_NAME = "fleet-ports.json"
+
+    def __init__(
+        self,
+        client_factory: Optional[Callable[[RaidenConfigurationFile], RaidenClient]] = None,
+        base_port: int = FLEET_BASE_PORT,
+        max_concurrent_starts: Optional[int] = None,
+        max_restarts: int = FLEET_MAX_RESTARTS,
+        restart_backoff: float = FLEET_RESTART_BACKOFF,
+        max_restart_backoff: float = FLEET_MAX_RESTART_BACKOFF,
+        monitor_interval: float = FLEET_MONITOR_INTERVAL,
+        ready_timeout: float = FLEET_READY_TIMEOUT,
+    ):
+        self.client_factory = client_factory or (
+            lambda configuration_file: RaidenClient.get_client(configuration_file.settings)
+        )
+        self.base_port = base_port
+        self.max_restarts = max_restarts
+        self.restart_backoff = restart_backoff
+        self.max_restart_backoff = max_restart_backoff
+        self.monitor_interval = monitor_interval
+        self.ready_timeout = ready_timeout
+        self.instances: List[FleetInstance] = []
+        self._start_slots = threading.Semaphore(max_concurrent_starts or os.cpu_count() or 1)
+        self._install_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def ports_path(self) -> Path:
+        return self.FOLDER_PATH.joinpath(self.PORTS_FILE_NAME)
+
+    def start(self, instances: Iterable[Tuple[RaidenConfigurationFile, Path]]):
+        """ Launch a client for every pair of configuration file and passphrase file """
+        fleet_instances = [
+            FleetInstance(
+                configuration_file, passphrase_file, self.client_factory(configuration_file)
+            )
+            for configuration_file, passphrase_file in instances
+        ]
+        self._allocate_ports(fleet_instances)
+
+        for instance in fleet_instances:
+            self.instances.append(instance)
+            thread = threading.Thread(
+                target=self._supervise,
+                args=(instance,),
+                name=f"fleet-{instance.address}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def wait_until_settled(self, timeout: Optional[float] = None) -> dict:
+        """ Block until every client is ready or failed for good, return the fleet status """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for instance in self.instances:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            instance.settled.wait(remaining)
+        return self.status()
+
+    def status(self) -> dict:
+        instances = [instance.to_dict() for instance in self.instances]
+        states = Counter(instance["state"] for instance in instances)
+        return {
+            "total": len(instances),
+            "ready": states[FleetInstance.READY],
+            "states": dict(states),
+            "instances": instances,
+        }
+
+    def stop(self):
+        self._stopped.set()
+        for instance in self.instances:
+            instance.client.kill()
+            instance.state = FleetInstance.STOPPED
+        for thread in self._threads:
+            thread.join()
+
+    def _allocate_ports(self, instances: List[FleetInstance]):
+        try:
+            known_ports = json.loads(self.ports_path.read_text())
+        except (OSError, ValueError):
+            known_ports = {}
+
+        ports: Dict[str, int] = {}
+        for instance in instances:
+            port = known_ports.get(instance.address)
+            # A running client still holds its port
+            if port is None or not (instance.client.is_running or is_port_free(port)):
+                port = self._find_free_port(set(ports.values()) | set(known_ports.values()))
+            ports[instance.address] = port
+            instance.api_port = port
+
+        known_ports.update(ports)
+        self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        with atomic_write(self.ports_path) as ports_file:
+            ports_file.write(json.dumps(known_ports).encode())
+
+    def _find_free_port(self, reserved_ports) -> int:
+        for port in range(self.base_port, 2 ** 16):
+            if port not in reserved_ports and is_port_free(port):
+                return port
+        raise RuntimeError("No free port left for the Raiden API")
+
+    def _supervise(self, instance: FleetInstance):
+        while not self._stopped.is_set():
+            try:
+                self._run(instance)
+                if self._stopped.is_set():
+                    return
+                error = "client process exited"
+            except Exception as exc:
+                # Failed installs raise all kinds of errors, none may end the supervision
+                if self._stopped.is_set():
+                    return
+                error = str(exc) or exc.__class__.__name__
+
+            # A client that was up for a while starts over with a short backoff
+            uptime = time.monotonic() - instance.ready_since if instance.ready_since else 0
+            if uptime > self.max_restart_backoff:
+                instance.restarts = 0
+            instance.ready_since = None
+            instance.restarts += 1
+            instance.last_error = error
+            if instance.restarts > self.max_restarts:
+                log.error(f"Giving up on Raiden for {instance.address}", error=error)
+                instance.state = FleetInstance.FAILED
+                instance.settled.set()
+                return
+
+            backoff = min(
+                self.restart_backoff * 2 ** (instance.restarts - 1), self.max_restart_backoff
+            )
+            log.warning(
+                f"Restarting Raiden for {instance.address} in {backoff}s",
+                error=error,
+                restarts=instance.restarts,
+            )
+            instance.state = FleetInstance.RESTARTING
+            self._stopped.wait(backoff)
+
+    def _run(self, instance: FleetInstance):
+        client = instance.client
+        with self._start_slots:
+            if not client.is_installed:
+                with self._install_lock:
+                    if not client.is_installed:
+                        client.install()
+            if not client.is_running:
+                instance.state = FleetInstance.STARTING
+                client.launch(instance.configuration_file, instance.passphrase_file)
+            try:
+                instance.time_to_ready = client.wait_for_web_ui_ready(
+                    status_callback=instance.set_progress, timeout=self.ready_timeout
+                )
+            except TimeoutError:
+                # Free the start slot, the client is launched again on restart
+                client.kill()
+                raise RaidenClientError(f"Raiden was not ready after {self.ready_timeout}s")
+
+        instance.state = FleetInstance.READY
+        instance.ready_since = time.monotonic()
+        instance.settled.set()
+        log.info(f"Raiden for {instance.address} is ready at {client.web_ui_index_url}")
+        while not self._stopped.wait(self.monitor_interval) and client.is_running:
+            pass
+
+
+def main():  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description="Run a Raiden client for every configuration file of the given settings"
+    )
+    parser.add_argument("--settings", default="mainnet")
+    parser.add_argument("--password-file", type=Path, required=True)
+    parser.add_argument("--status-interval", type=float, default=30)
+    args = parser.parse_args()
+
+    settings = load_settings(args.settings)
+    configuration_files = RaidenConfigurationFile.get_available_configurations(settings)
+    fleet = RaidenFleet()
+    fleet.start(
+        (configuration_file, args.password_file) for configuration_file in configuration_files
+    )
+    try:
+        print(json.dumps(fleet.wait_until_settled(), indent=2))
+        while True:
+            time.sleep(args.status_interval)
+            print(json.dumps(fleet.status(), indent=2))
+    except KeyboardInterrupt:
+        fleet.stop()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+import websockets
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from raiden_installer import log
+from raiden_installer.constants import (
+    HEAD_WATCHER_POLL_INTERVAL,
+    REQUIRED_BLOCK_CONFIRMATIONS,
+    WEB3_TIMEOUT,
+)
+
+# Called with every new head, returns something other than None once the wait is over
+Condition = Callable[[int], Any]
+
+
+def get_websocket_url(endpoint_uri: str) -> Optional[str]:
+    """ Websocket endpoint serving the same chain as ``endpoint_uri``, if one is known """
+    uri = urlparse(endpoint_uri)
+    if uri.scheme in ("ws", "wss"):
+        return endpoint_uri
+    if uri.hostname and uri.hostname.endswith("infura.io") and "/v3/" in uri.path:
+        return uri._replace(scheme="wss", path=uri.path.replace("/v3/", "/ws/v3/")).geturl()
+    return None
+
+
+class _Waiter:
+    def __init__(self, condition: Condition):
+        self.condition = condition
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[Exception] = None
+
+    def check(self, head: int) -> bool:
+        try:
+            self.result = self.condition(head)
+        except Exception as exc:
+            self.error = exc
+        if self.result is not None or self.error is not None:
+            self.done.set()
+        return self.done.is_set()
+
+
+class HeadWatcher:
+    """ Follows the chain head of one endpoint on behalf of any number of waiters
+
+    A background thread is running while there are waiters or subscribers. It subscribes to
+    ``newHeads`` over websocket when the endpoint offers one, and otherwise
+    polls a block filter (or ``eth_blockNumber`` if the node has no filter
+    support). The conditions of all waiters are checked once per new head.
+    """
+
+    def __init__(self, w3: Web3, poll_interval: float = HEAD_WATCHER_POLL_INTERVAL):
+        self.w3 = w3
+        self.poll_interval = poll_interval
+        self.websocket_url = get_websocket_url(w3.provider.endpoint_uri)
+        self.head: Optional[int] = None
+        self._waiters: List[_Waiter] = []
+        self._subscribers: List[Callable[[int], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def waiter_count(self) -> int:
+        return len(self._waiters)
+
+    def wait_until(self, condition: Condition, timeout: float = WEB3_TIMEOUT) -> Any:
+        """ Block until ``condition`` returns something other than None and return it
+
+        Raises ``TimeoutError`` if that does not happen within ``timeout`` seconds.
+        """
+        waiter = _Waiter(condition)
+        if waiter.check(self.w3.eth.blockNumber):
+            return self._get_result(waiter)
+
+        with self._lock:
+            self._waiters.append(waiter)
+            self._ensure_running()
+
+        try:
+            if not waiter.done.wait(timeout):
+                raise TimeoutError(f"Condition not met after {timeout} seconds")
+        finally:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        return self._get_result(waiter)
+
+    def subscribe(self, callback: Callable[[int], None]) -> Callable[[], None]:
+        """ Call ``callback`` with every new head until the returned function is called """
+        with self._lock:
+            self._subscribers.append(callback)
+            self._ensure_running()
+
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers:
+                    self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _ensure_running(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="head-watcher", daemon=True)
+            self._thread.start()
+
+    @staticmethod
+    def _get_result(waiter: _Waiter) -> Any:
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.result
+
+    def _has_waiters(self) -> bool:
+        with self._lock:
+            if not self._waiters and not self._subscribers:
+                self._thread = None
+                return False
+            return True
+
+    def _on_new_head(self, head: int):
+        if head == self.head:
+            return
+        self.head = head
+        with self._lock:
+            waiters = list(self._waiters)
+            subscribers = list(self._subscribers)
+        done = [waiter for waiter in waiters if waiter.check(head)]
+        with self._lock:
+            self._waiters = [waiter for waiter in self._waiters if waiter not in done]
+
+        for callback in subscribers:
+            try:
+                callback(head)
+            except Exception:
+                log.exception("New head subscriber failed")
+
+    def _run(self):
+        if self.websocket_url is not None:
+            loop = asyncio.new_event_loop()
+            try:
+                loop.run_until_complete(self._follow_subscription())
+                return
+            except Exception as exc:
+                log.warning("newHeads subscription failed, polling instead", error=str(exc))
+            finally:
+                loop.close()
+        self._follow_polling()
+
+    async def _follow_subscription(self):
+        async with websockets.connect(self.websocket_url) as websocket:
+            await websocket.send(
+                json.dumps(
+                    {"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}
+                )
+            )
+            response = json.loads(await websocket.recv())
+            if "error" in response:
+                raise ValueError(response["error"])
+
+            while self._has_waiters():
+                try:
+                    message = json.loads(
+                        await asyncio.wait_for(websocket.recv(), timeout=self.poll_interval)
+                    )
+                except asyncio.TimeoutError:
+                    continue
+                new_head = message.get("params", {}).get("result", {})
+                if "number" in new_head:
+                    self._on_new_head(int(new_head["number"], 16))
+
+    def _follow_polling(self):
+        block_filter = self._make_block_filter()
+        while self._has_waiters():
+            try:
+                if block_filter is None:
+                    self._on_new_head(self.w3.eth.blockNumber)
+                else:
+                    block_hashes = block_filter.get_new_entries()
+                    if block_hashes:
+                        self._on_new_head(self.w3.eth.getBlock(block_hashes[-1])["number"])
+            except ValueError:
+                # The node dropped the filter
+                block_filter = self._make_block_filter()
+            except Exception as exc:
+                log.warning("Failed to fetch new head", error=str(exc))
+            time.sleep(self.poll_interval)
+
+    def _make_block_filter(self):
+        try:
+            return self.w3.eth.filter("latest")
+        except ValueError:
+            log.debug("Endpoint does not support block filters, polling eth_blockNumber")
+            return None
+
+
+_watchers: Dict[str, HeadWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_head_watcher(w3: Web3) -> HeadWatcher:
+    """ The watcher shared by all waiters on the endpoint of ``w3`` """
+    endpoint_uri = w3.provider.endpoint_uri
+    with _watchers_lock:
+        watcher = _watchers.get(endpoint_uri)
+        if watcher is None:
+            watcher = _watchers[endpoint_uri] = HeadWatcher(w3)
+        return watcher
+
+
+def transaction_confirmed(
+    w3: Web3, transaction_hash, confirmations: int = REQUIRED_BLOCK_CONFIRMATIONS
+) -> Condition:
+    def condition(head: int):
+        try:
+            receipt = w3.eth.getTransactionReceipt(transaction_hash)
+        except TransactionNotFound:
+            return None
+        if receipt is not None and head >= receipt["blockNumber"] + confirmations:
+            return receipt
+        return None
+
+    return condition
+
+
+def balance_confirmed(
+    get_balance: Callable[[], Any],
+    expected_amount: Any,
+    confirmations: int = REQUIRED_BLOCK_CONFIRMATIONS,
+) -> Condition:
+    """ Met once the balance stayed at or above ``expected_amount`` for ``confirmations`` """
+    first_block_with_balance: Optional[int] = None
+
+    def condition(head: int):
+        nonlocal first_block_with_balance
+        balance = get_balance()
+        if balance < expected_amount:
+            first_block_with_balance = None
+            return None
+        if first_block_with_balance is None:
+            first_block_with_balance = head
+        if head >= first_block_with_balance + confirmations:
+            return balance
+        return None
+
+    return condition
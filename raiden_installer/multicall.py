@@ -0,0 +1,85 @@
+from typing import List, Optional, Sequence, Tuple
+
+from eth_typing import Address
+from eth_utils import to_canonical_address
+from web3 import Web3
+from web3.types import BlockIdentifier
+
+# Multicall (https://github.com/makerdao/multicall) deployments
+MULTICALL_ADDRESSES = {
+    1: to_canonical_address("0xeefba1e63905ef1d7acba5a8513c70307c1ce441"),
+    3: to_canonical_address("0x53c43764255c17bd724f74c4ef150724ac50a3ed"),
+    4: to_canonical_address("0x42ad527de7d4e9d9d011ac45b31d8551f8fe9821"),
+    5: to_canonical_address("0x77dca2c955b15e9de4dbbcf1246b4b85b651e50e"),
+    42: to_canonical_address("0x2cc8688c5f75e365aaeeb4ea8d6a480405a48d2a"),
+}
+
+MULTICALL_ABI = [
+    {
+        "constant": False,
+        "inputs": [
+            {
+                "components": [
+                    {"name": "target", "type": "address"},
+                    {"name": "callData", "type": "bytes"},
+                ],
+                "name": "calls",
+                "type": "tuple[]",
+            }
+        ],
+        "name": "aggregate",
+        "outputs": [
+            {"name": "blockNumber", "type": "uint256"},
+            {"name": "returnData", "type": "bytes[]"},
+        ],
+        "payable": False,
+        "stateMutability": "nonpayable",
+        "type": "function",
+    },
+    {
+        "constant": True,
+        "inputs": [{"name": "addr", "type": "address"}],
+        "name": "getEthBalance",
+        "outputs": [{"name": "balance", "type": "uint256"}],
+        "payable": False,
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+# (target address, encoded call data, output types)
+Call = Tuple[Address, str, Sequence[str]]
+
+
+def get_multicall_address(chain_id: int) -> Optional[Address]:
+    return MULTICALL_ADDRESSES.get(chain_id)
+
+
+def get_multicall_proxy(w3: Web3, chain_id: int):
+    multicall_address = get_multicall_address(chain_id)
+    return multicall_address and w3.eth.contract(address=multicall_address, abi=MULTICALL_ABI)
+
+
+def make_call(contract, function_name: str, *args) -> Call:
+    function_abi = contract.get_function_by_name(function_name).abi
+    output_types = [output["type"] for output in function_abi["outputs"]]
+    return (
+        contract.address,
+        contract.encodeABI(fn_name=function_name, args=args),
+        output_types,
+    )
+
+
+def aggregate(
+    w3: Web3, multicall_proxy, calls: Sequence[Call], block_identifier: BlockIdentifier = "latest"
+) -> Tuple[int, List[tuple]]:
+    """ Execute ``calls`` in a single ``eth_call`` and return the block number and the results """
+    block_number, return_data = multicall_proxy.functions.aggregate(
+        [(target, call_data) for target, call_data, _ in calls]
+    ).call(block_identifier=block_identifier)
+
+    results = [
+        w3.codec.decode_abi(output_types, data)
+        for (_, _, output_types), data in zip(calls, return_data)
+    ]
+    return block_number, results
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
 import hashlib
+import threading
 import uuid
+from dataclasses import dataclass
+from typing import Dict
 
 import requests
 from eth_utils import to_checksum_address
+from web3 import Web3
 
 
 class FundingError(Exception):
@@ -38,14 +42,11 @@ class Network:
 
     @staticmethod
     def get_by_chain_id(chain_id: int) -> Network:
-        return Network.get_by_name(
-            [name for name, cid in Network.CHAIN_ID_MAPPING.items() if cid == chain_id].pop()
-        )
+        return NETWORKS_BY_CHAIN_ID[chain_id]
 
     @staticmethod
     def get_by_name(name: str) -> Network:
-        network_class = NETWORK_CLASSES.get(name, Network)
-        return network_class()
+        return NETWORKS_BY_NAME[name]
 
 
 class Mainnet(Network):
@@ -96,3 +97,38 @@ NETWORK_CLASSES = {
     "goerli": Goerli,
     "kovan": Kovan,
 }
+
+# Networks have no state of their own, so there is one instance of each
+NETWORKS_BY_NAME: Dict[str, Network] = {
+    name: network_class() for name, network_class in NETWORK_CLASSES.items()
+}
+NETWORKS_BY_CHAIN_ID: Dict[int, Network] = {
+    network.chain_id: network for network in NETWORKS_BY_NAME.values()
+}
+
+
+@dataclass(frozen=True)
+class ChainContext:
+    """ Identity of the chain served by an endpoint, which can't change """
+
+    chain_id: int
+
+    @property
+    def network(self) -> Network:
+        return Network.get_by_chain_id(self.chain_id)
+
+
+_chain_contexts: Dict[str, ChainContext] = {}
+_chain_contexts_lock = threading.Lock()
+
+
+def get_chain_context(w3: Web3) -> ChainContext:
+    """ Chain of the endpoint of ``w3``, asking the node only the first time """
+    endpoint_uri = getattr(w3.provider, "endpoint_uri", None)
+    chain_context = _chain_contexts.get(endpoint_uri) if endpoint_uri else None
+    if chain_context is None:
+        chain_context = ChainContext(chain_id=int(w3.eth.chainId))
+        if endpoint_uri:
+            with _chain_contexts_lock:
+                _chain_contexts[endpoint_uri] = chain_context
+    return chain_context
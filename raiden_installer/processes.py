@@ -0,0 +1,149 @@
+import json
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import psutil
+from xdg import XDG_DATA_HOME
+
+from raiden_installer import log
+from raiden_installer.downloads import atomic_write
+
+
+class ProcessSupervisor:
+    """ Keeps track of the client processes of the wizard, by binary name
+
+    Processes launched here are followed through their ``Popen`` handle. Each
+    one also gets a pidfile with its start time, so a restarted wizard can
+    adopt it without going through the process table, and a reused pid is
+    not mistaken for the client. The process table is only scanned once per
+    name, to adopt a client that was started without a pidfile.
+    """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard", "run")
+
+    def __init__(self):
+        self._handles: Dict[str, subprocess.Popen] = {}
+        self._processes: Dict[str, psutil.Process] = {}
+        self._adopted: Set[str] = set()
+        self._lock = threading.RLock()
+
+    def _get_pidfile_path(self, name: str) -> Path:
+        return self.FOLDER_PATH.joinpath(f"{name}.pid")
+
+    def get_log_path(self, name: str) -> Path:
+        """ File receiving the output of the process of ``name`` launched last """
+        return self.FOLDER_PATH.joinpath(f"{name}.log")
+
+    def launch(self, name: str, args: List[str]) -> int:
+        self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        with self.get_log_path(name).open("wb") as log_file:
+            handle = subprocess.Popen(args, stdout=log_file, stderr=subprocess.STDOUT)
+        process = psutil.Process(handle.pid)
+        with self._lock:
+            self._handles[name] = handle
+            self._processes[name] = process
+            self._adopted.add(name)
+            self._write_pidfile(name, process)
+        return handle.pid
+
+    def get_pid(self, name: str) -> Optional[int]:
+        """ Pid of the running process of ``name``, if there is one """
+        with self._lock:
+            if name not in self._adopted:
+                self._adopt(name)
+
+            process = self._processes.get(name)
+            if process is None:
+                return None
+            if self._is_alive(name, process):
+                return process.pid
+
+            self._forget(name)
+            return None
+
+    def is_running(self, name: str) -> bool:
+        return self.get_pid(name) is not None
+
+    def kill(self, name: str):
+        with self._lock:
+            if self.get_pid(name) is None:
+                return
+
+            process = self._processes[name]
+            handle = self._handles.get(name)
+            log.info(f"Killing process {process.pid}")
+            try:
+                process.kill()
+                if handle is not None:
+                    handle.wait()
+                else:
+                    process.wait()
+            except psutil.NoSuchProcess:
+                pass
+            self._forget(name)
+
+    def _is_alive(self, name: str, process: psutil.Process) -> bool:
+        handle = self._handles.get(name)
+        if handle is not None:
+            # Also reaps the process once it exited
+            return handle.poll() is None
+
+        try:
+            # is_running compares the start time too, so a reused pid doesn't count
+            return process.is_running() and process.status() != psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return False
+
+    def _adopt(self, name: str):
+        self._adopted.add(name)
+        pidfile_path = self._get_pidfile_path(name)
+        if pidfile_path.exists():
+            process = self._read_pidfile(name)
+            if process is None:
+                pidfile_path.unlink()
+        else:
+            process = self._find_process(name)
+            if process is not None:
+                self._write_pidfile(name, process)
+
+        if process is not None:
+            log.info(f"Adopted running {name} process {process.pid}")
+            self._processes[name] = process
+
+    def _forget(self, name: str):
+        self._handles.pop(name, None)
+        self._processes.pop(name, None)
+        pidfile_path = self._get_pidfile_path(name)
+        if pidfile_path.exists():
+            pidfile_path.unlink()
+
+    def _read_pidfile(self, name: str) -> Optional[psutil.Process]:
+        try:
+            pidfile = json.loads(self._get_pidfile_path(name).read_text())
+            process = psutil.Process(pidfile["pid"])
+            if abs(process.create_time() - pidfile["create_time"]) < 1:
+                return process
+        except (OSError, ValueError, KeyError, psutil.Error):
+            pass
+        return None
+
+    def _write_pidfile(self, name: str, process: psutil.Process):
+        self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        pidfile = {"pid": process.pid, "create_time": process.create_time()}
+        with atomic_write(self._get_pidfile_path(name)) as pidfile_file:
+            pidfile_file.write(json.dumps(pidfile).encode())
+
+    @staticmethod
+    def _find_process(name: str) -> Optional[psutil.Process]:
+        processes = [
+            process
+            for process in psutil.process_iter(attrs=["name", "status"])
+            if (process.info["name"] or "").lower() == name.lower()
+            and process.info["status"] not in (psutil.STATUS_DEAD, psutil.STATUS_ZOMBIE)
+        ]
+        return max(processes, key=lambda process: process.pid, default=None)
+
+
+PROCESS_SUPERVISOR = ProcessSupervisor()
@@ -1,27 +1,40 @@
+import bisect
 import functools
+import json
+import operator
 import os
 import re
-import socket
-import subprocess
 import sys
 import tarfile
 import tempfile
 import time
 import zipfile
-from contextlib import closing, contextmanager
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from io import BytesIO
 from pathlib import Path
-from typing import Callable, Optional, Tuple, Type, Union
-from urllib.parse import urlparse
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Type, Union
 from xml.etree import ElementTree
 
-import psutil
 import requests
-from requests.exceptions import ConnectionError
+from xdg import XDG_DATA_HOME
 
 from raiden_installer import Settings, log
+from raiden_installer.constants import DOWNLOAD_CONNECTIONS, DOWNLOAD_TIMEOUT
+from raiden_installer.downloads import (
+    ARTIFACT_CACHE,
+    RELEASE_INDEX_CACHE,
+    ProgressCallback,
+    atomic_write,
+    copy_stream,
+)
+from raiden_installer.processes import PROCESS_SUPERVISOR
+from raiden_installer.readiness import (
+    LAUNCH_METRICS,
+    RaidenClientExited,
+    ReadinessProbe,
+    SyncProgress,
+)
 
 
 @contextmanager
@@ -45,7 +58,7 @@ def extract_version_modifier(release_name):
     if not release_name:
         return None
 
-    pattern = r"(?P<release>(a|alpha|b|beta|rc))-?(?P<number>\d+)"
+    pattern = r"(?P<release>(a|alpha|b|beta|rc|dev))-?(?P<number>\d+)"
     match = re.search(pattern, release_name)
 
     if not match:
@@ -63,14 +76,6 @@ def extract_version_modifier(release_name):
     return (release, match.groupdict()["number"])
 
 
-def order_version_modifier(version_modifier):
-    types = ["dev", "alpha", "beta", "rc"]
-    try:
-        return types.index(version_modifier)
-    except (ValueError, IndexError):
-        return -1
-
-
 class RaidenClientError(Exception):
     pass
 
@@ -83,70 +88,158 @@ class VersionData:
     extra: Optional[str] = None
 
 
-class RaidenClient:
-    BINARY_FOLDER_PATH = Path.home().joinpath(".local", "bin")
-    BINARY_NAME_FORMAT = "raiden-{release}"
-    WEB_UI_INDEX_URL = "http://127.0.0.1:5001"
-    RAIDEN_API_STATUS_ENDPOINT = "/api/v1/status"
+@functools.total_ordering
+class VersionKey:
+    """ Immutable sort key of a release, parsed once from its version data
 
-    RELEASE_INDEX_URL = "https://api.github.com/repos/raiden-network/raiden/releases"
-    FILE_NAME_SUFFIX = "macOS-x86_64.zip" if sys.platform == "darwin" else "linux-x86_64.tar.gz"
+    Pre-releases sort before the final release, in the order dev, alpha,
+    beta, rc. Builds of the same version are ordered by their build number.
+    """
 
-    def __init__(self, download_url: str, version_data: VersionData):
-        self.download_url = download_url
-        self.version_data = version_data
-        self._process_id = self.get_process_id()
+    __slots__ = ("major", "minor", "revision", "modifier", "modifier_number", "build", "_key")
 
-    def __eq__(self, other):
-        return all(
-            [
-                self.version_data.major == other.version_data.major,
-                self.version_data.minor == other.version_data.minor,
-                self.version_data.revision == other.version_data.revision,
-                self.version_modifier == other.version_modifier,
-                self.version_modifier_number == other.version_modifier_number,
-            ]
+    MODIFIERS = ("dev", "alpha", "beta", "rc")
+    VERSION_PATTERN = re.compile(
+        r"v?(?P<major>\d+)\.(?P<minor>\d+)\.(?P<revision>\d+)(?P<extra>.*)"
+    )
+
+    def __init__(
+        self,
+        major: int,
+        minor: int,
+        revision: int,
+        modifier: Optional[str] = None,
+        modifier_number: Optional[int] = None,
+        build: int = 0,
+    ):
+        modifier_rank = (
+            self.MODIFIERS.index(modifier) if modifier in self.MODIFIERS else len(self.MODIFIERS)
+        )
+        for name, value in (
+            ("major", int(major)),
+            ("minor", int(minor)),
+            ("revision", int(revision)),
+            ("modifier", modifier),
+            ("modifier_number", modifier_number),
+            ("build", build),
+        ):
+            object.__setattr__(self, name, value)
+        object.__setattr__(
+            self,
+            "_key",
+            (self.major, self.minor, self.revision, modifier_rank, modifier_number or 0, build),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self.__class__.__name__} is immutable")
+
+    @classmethod
+    def from_version_data(cls, version_data: VersionData, build: int = 0) -> "VersionKey":
+        version_modifier = extract_version_modifier(version_data.extra)
+        return cls(
+            version_data.major,
+            version_data.minor,
+            version_data.revision,
+            modifier=version_modifier and version_modifier[0],
+            modifier_number=version_modifier and int(version_modifier[1]),
+            build=build,
         )
 
+    @classmethod
+    def parse(cls, version: str) -> "VersionKey":
+        """ Key of a version string like ``1.1.0`` or ``v0.200.0-rc9`` """
+        match = cls.VERSION_PATTERN.fullmatch(version)
+        if not match:
+            raise ValueError(f"Not a version: {version}")
+        return cls.from_version_data(VersionData(**match.groupdict()))
+
+    def __eq__(self, other):
+        if not isinstance(other, VersionKey):
+            return NotImplemented
+        return self._key == other._key
+
     def __lt__(self, other):
-        if self.version_data.major != other.version_data.major:
-            return self.version_data.major < other.version_data.major
+        if not isinstance(other, VersionKey):
+            return NotImplemented
+        return self._key < other._key
 
-        if self.version_data.minor != other.version_data.minor:
-            return self.version_data.minor < other.version_data.minor
+    def __hash__(self):
+        return hash(self._key)
 
-        if self.version_data.revision != other.version_data.revision:
-            return self.version_data.revision < other.version_data.revision
+    def __repr__(self):
+        modifier = f"{self.modifier}{self.modifier_number or ''}" if self.modifier else ""
+        build = f"+{self.build}" if self.build else ""
+        return f"VersionKey({self.major}.{self.minor}.{self.revision}{modifier}{build})"
 
-        if self.version_modifier != other.version_modifier:
-            return order_version_modifier(self.version_modifier) < order_version_modifier(
-                other.version_modifier_number
-            )
 
-        if self.version_modifier_number and other.version_modifier_number:
-            return self.version_modifier_number < other.version_modifier_number
+class ReleaseIndex:
+    """ Releases sorted by version key, with bisect lookups by version range and by tag """
 
-        return False
+    def __init__(self, releases: Iterable["RaidenClient"]):
+        self._releases = sorted(releases, key=operator.attrgetter("version_key"))
+        self._keys = [release.version_key for release in self._releases]
+        self._by_tag: Dict[str, "RaidenClient"] = {}
+        for release in self._releases:
+            # The first build of a tag wins
+            self._by_tag.setdefault(release.release, release)
 
-    def __gt__(self, other):
-        if self.version_data.major != other.version_data.major:
-            return self.version_data.major > other.version_data.major
+    def __len__(self):
+        return len(self._releases)
 
-        if self.version_data.minor != other.version_data.minor:
-            return self.version_data.minor > other.version_data.minor
+    def __iter__(self):
+        return iter(self._releases)
 
-        if self.version_data.revision != other.version_data.revision:
-            return self.version_data.revision > other.version_data.revision
+    def __reversed__(self):
+        return reversed(self._releases)
 
-        if self.version_modifier != other.version_modifier:
-            return order_version_modifier(self.version_modifier) > order_version_modifier(
-                other.version_modifier
-            )
+    def latest(self) -> Optional["RaidenClient"]:
+        return self._releases[-1] if self._releases else None
+
+    def get(self, release_tag: str) -> Optional["RaidenClient"]:
+        return self._by_tag.get(release_tag)
+
+    def find(self, version_key: VersionKey) -> Optional["RaidenClient"]:
+        position = bisect.bisect_left(self._keys, version_key)
+        if position < len(self._keys) and self._keys[position] == version_key:
+            return self._releases[position]
+        return None
 
-        if self.version_modifier_number and other.version_modifier_number:
-            return self.version_modifier_number > other.version_modifier_number
+    def between(
+        self, lower: Optional[VersionKey] = None, upper: Optional[VersionKey] = None
+    ) -> List["RaidenClient"]:
+        """ Releases with ``lower <= version_key < upper``, oldest first """
+        start = 0 if lower is None else bisect.bisect_left(self._keys, lower)
+        end = len(self._keys) if upper is None else bisect.bisect_left(self._keys, upper)
+        return self._releases[start:end]
 
-        return False
+
+@functools.total_ordering
+class RaidenClient:
+    BINARY_FOLDER_PATH = Path.home().joinpath(".local", "bin")
+    BINARY_NAME_FORMAT = "raiden-{release}"
+    WEB_UI_INDEX_URL = "http://127.0.0.1:5001"
+    RAIDEN_API_STATUS_ENDPOINT = "/api/v1/status"
+
+    RELEASE_INDEX_URL = "https://api.github.com/repos/raiden-network/raiden/releases"
+    FILE_NAME_SUFFIX = "macOS-x86_64.zip" if sys.platform == "darwin" else "linux-x86_64.tar.gz"
+
+    def __init__(self, download_url: str, version_data: VersionData):
+        self.download_url = download_url
+        self.version_data = version_data
+        self.version_key = self._make_version_key()
+        # Set to run more than one client per host, each with its own API port
+        self.instance_name: Optional[str] = None
+        self.api_port: Optional[int] = None
+        self._launched_at: Optional[float] = None
+
+    def __eq__(self, other):
+        return self.version_key == other.version_key
+
+    def __lt__(self, other):
+        return self.version_key < other.version_key
+
+    def __hash__(self):
+        return hash(self.version_key)
 
     @property
     def FILE_NAME_PATTERN(self):  # pragma: no cover
@@ -165,168 +258,148 @@ class RaidenClient:
 
     @property
     def version_modifier(self):
-        version_modifier = extract_version_modifier(self.version_data.extra)
-        return version_modifier and version_modifier[0]
+        return self.version_key.modifier
 
     @property
     def version_modifier_number(self):
-        version_modifier = extract_version_modifier(self.version_data.extra)
-        return version_modifier and version_modifier[1]
+        modifier_number = self.version_key.modifier_number
+        return None if modifier_number is None else str(modifier_number)
+
+    def _make_version_key(self) -> VersionKey:
+        return VersionKey.from_version_data(self.version_data)
 
     @property
     def version(self):  # pragma: no cover
         raise NotImplementedError
 
-    def install(self, force=False):
+    def install(
+        self,
+        force=False,
+        progress_callback: Optional[ProgressCallback] = None,
+        connections: int = DOWNLOAD_CONNECTIONS,
+    ):
         if self.install_path.exists() and not force:
             raise RuntimeError(f"{self.install_path} already exists")
 
         self.BINARY_FOLDER_PATH.mkdir(parents=True, exist_ok=True)
 
-        download = requests.get(self.download_url)
-        download.raise_for_status()
-
         action = self._extract_gzip if self.download_url.endswith("gz") else self._extract_zip
 
-        action(BytesIO(download.content), self.install_path)
-        os.chmod(self.install_path, 0o770)
+        with ARTIFACT_CACHE.open(
+            self.download_url, progress_callback, connections=connections
+        ) as download:
+            with atomic_write(self.install_path, mode=0o770) as binary_file:
+                action(download, binary_file)
 
     def launch(self, configuration_file, passphrase_file):
-        proc = subprocess.Popen(
-            [
-                str(self.install_path),
-                "--config-file",
-                str(configuration_file.path),
-                "--password-file",
-                str(passphrase_file),
-            ]
-        )
-        self._process_id = proc.pid
+        args = [
+            str(self.install_path),
+            "--config-file",
+            str(configuration_file.path),
+            "--password-file",
+            str(passphrase_file),
+        ]
+        if self.api_port is not None:
+            args.extend(["--api-address", f"127.0.0.1:{self.api_port}"])
+
+        self._launched_at = time.monotonic()
+        PROCESS_SUPERVISOR.launch(self.process_name, args)
 
     def kill(self):
-        process = self._process_id and psutil.Process(self._process_id)
-        if process is not None:
-            log.info(f"Killing process {self._process_id}")
-            process.kill()
-            process.wait()
-            self._process_id = self.get_process_id()
-            assert self._process_id is None
-
-    def check_status_api(self, status_callback: Callable = None):
-        """
-        Params:
-            status_callback:  A function, that will receive the /status API responses before the
-                              status is `ready`.
-        """
-        log.info("Checking /status endpoint")
-        try:
-            response = requests.get(
-                RaidenClient.WEB_UI_INDEX_URL + RaidenClient.RAIDEN_API_STATUS_ENDPOINT
-            )
-            if response and response.status_code == 200:
-                result = response.json()
-                if result.get("status") == "ready":
-                    return True
-                else:
-                    if status_callback is not None:
-                        status_callback(result)
-        except ConnectionError:
-            pass
-        return False
-
-    def wait_for_web_ui_ready(self, status_callback: Callable = None):
+        PROCESS_SUPERVISOR.kill(self.process_name)
+        assert not self.is_running
+
+    def wait_for_web_ui_ready(
+        self,
+        status_callback: Optional[Callable[[SyncProgress], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> float:
         """
         Params:
-            status_callback:  A function, that will receive the /status API responses before the
-                              status is `ready`.
+            status_callback:  A function, that will receive the sync progress reported by
+                              the /status API before the status is `ready`.
+            timeout:          Seconds to wait at most, raises `TimeoutError` after that.
         """
         if not self.is_running:
             raise RuntimeError("Raiden is not running")
 
-        uri = urlparse(self.WEB_UI_INDEX_URL)
-
-        while True:
-            self._process_id = self.get_process_id()
-            if not self.is_running or self.is_zombie:
-                raise RaidenClientError("client process terminated while waiting for web ui")
-
-            log.info("Waiting for raiden to start...")
-
-            while not self.check_status_api(status_callback=status_callback):
-                time.sleep(1)
+        log.info("Waiting for raiden to start...")
+        probe = ReadinessProbe(
+            self.web_ui_index_url + self.RAIDEN_API_STATUS_ENDPOINT,
+            is_running=lambda: self.is_running,
+            log_path=PROCESS_SUPERVISOR.get_log_path(self.process_name),
+            follow_log_from_start=self._launched_at is not None,
+        )
+        try:
+            time_to_ready = probe.wait(status_callback, timeout=timeout)
+        except RaidenClientExited as exc:
+            raise RaidenClientError(str(exc)) from exc
 
-            with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
-                try:
-                    connected = sock.connect_ex((uri.hostname, uri.port)) == 0
-                    if connected:
-                        return
-                except socket.gaierror:
-                    pass
-                time.sleep(1)
+        if self._launched_at is not None:
+            LAUNCH_METRICS.record(self.release, time.monotonic() - self._launched_at)
+            self._launched_at = None
+        return time_to_ready
 
     def get_process_id(self):
-        def is_running_raiden(process):
-            try:
-                is_raiden = self.binary_name.lower() == process.name().lower()
-                is_dead = process.status() is [psutil.STATUS_DEAD, psutil.STATUS_ZOMBIE]
-
-                return is_raiden and not is_dead
-            except psutil.ZombieProcess:
-                return False
-
-        processes = [p for p in psutil.process_iter() if is_running_raiden(p)]
-
-        try:
-            return max(p.pid for p in processes)
-        except ValueError:
-            return None
+        return PROCESS_SUPERVISOR.get_pid(self.process_name)
 
     @property
     def binary_name(self):
         return self.BINARY_NAME_FORMAT.format(release=self.release)
 
     @property
-    def is_installed(self):
-        return self.install_path.exists()
+    def process_name(self):
+        if self.instance_name is None:
+            return self.binary_name
+        return f"{self.binary_name}@{self.instance_name}"
 
     @property
-    def is_running(self):
-        return self.get_process_id() is not None
+    def web_ui_index_url(self):
+        if self.api_port is None:
+            return self.WEB_UI_INDEX_URL
+        return f"http://127.0.0.1:{self.api_port}"
 
     @property
-    def is_zombie(self):
-        if not self._process_id:
-            return False
+    def is_installed(self):
+        return self.install_path.exists()
 
-        return psutil.Process(self._process_id).status() == psutil.STATUS_ZOMBIE
+    @property
+    def is_running(self):
+        return PROCESS_SUPERVISOR.is_running(self.process_name)
 
     @property
     def install_path(self):
         return Path(self.BINARY_FOLDER_PATH).joinpath(self.binary_name)
 
-    def _extract_zip(self, compressed_data, destination_path):
-        with zipfile.ZipFile(compressed_data) as zipped:
-            with destination_path.open("wb") as binary_file:
-                binary_file.write(zipped.read(zipped.filelist[0]))
-
-    def _extract_gzip(self, compressed_data, destination_path):
-        with tarfile.open(mode="r:*", fileobj=compressed_data) as tar:
-            with destination_path.open("wb") as binary_file:
-                compressed_data = tar.extractfile(tar.getmembers()[0])
-                if compressed_data:
-                    binary_file.write(compressed_data.read())
+    def _extract_zip(self, compressed_data, binary_file):
+        # The zip directory is at the end of the archive, so it has to be spooled to disk first
+        with tempfile.TemporaryFile(dir=self.BINARY_FOLDER_PATH) as archive:
+            copy_stream(compressed_data, archive)
+            archive.seek(0)
+            with zipfile.ZipFile(archive) as zipped:
+                with zipped.open(zipped.filelist[0]) as member:
+                    copy_stream(member, binary_file)
+
+    def _extract_gzip(self, compressed_data, binary_file):
+        # Stream mode decompresses while downloading, without seeking back
+        with tarfile.open(mode="r|*", fileobj=compressed_data) as tar:
+            member = tar.next()
+            member_data = member and tar.extractfile(member)
+            if not member_data:
+                raise RaidenClientError(f"No binary found in {self.download_url}")
+            copy_stream(member_data, binary_file)
 
     @classmethod
     def get_file_pattern(cls):
         return fr"{cls.FILE_NAME_PATTERN}-{cls.FILE_NAME_SUFFIX}"
 
     @classmethod
-    @functools.lru_cache()
-    def get_available_releases(cls):
-        response = requests.get(cls.RELEASE_INDEX_URL)
-        response.raise_for_status()
+    def get_release_index(cls) -> ReleaseIndex:
+        return ReleaseIndex(cls._make_releases(RELEASE_INDEX_CACHE.get(cls.RELEASE_INDEX_URL)))
 
-        return sorted(cls._make_releases(response), reverse=True)
+    @classmethod
+    def get_available_releases(cls):
+        return list(reversed(cls.get_release_index()))
 
     @classmethod
     def _make_release(cls, release_data):
@@ -357,9 +430,7 @@ class RaidenClient:
     @classmethod
     def make_by_tag(cls, release_tag):
         tag_url = f"{cls.RELEASE_INDEX_URL}/tags/{release_tag}"
-        response = requests.get(tag_url)
-        response.raise_for_status()
-        return cls._make_release(response.json())
+        return cls._make_release(RELEASE_INDEX_CACHE.get(tag_url).json())
 
     @staticmethod
     def get_client(settings: Settings):
@@ -392,9 +463,72 @@ class RaidenTestnetRelease(RaidenClient):
         )
 
 
+class NightlyIndex:
+    """ Bucket keys of the nightly builds seen so far, kept on disk between runs
+
+    Listing the bucket only has to cover what was uploaded after the last
+    complete listing, and known builds are found without any request. Keys
+    found by a tag lookup are known, but do not move where the next listing
+    starts, so older builds uploaded before them are still listed.
+    """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard")
+    FILE_NAME = "nightly-index.json"
+
+    @property
+    def path(self) -> Path:
+        return self.FOLDER_PATH.joinpath(self.FILE_NAME)
+
+    def _read(self) -> Tuple[List[str], Optional[str]]:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return [], None
+
+        # Indexes written before the listing marker existed were plain key lists
+        if isinstance(data, list):
+            return sorted(data), None
+        return sorted(data.get("keys", [])), data.get("listed_up_to")
+
+    def load(self) -> List[str]:
+        return self._read()[0]
+
+    def get_listed_up_to(self) -> Optional[str]:
+        """ Last key of the most recent complete listing of the bucket """
+        return self._read()[1]
+
+    def find(self, prefix: str) -> List[str]:
+        keys = self.load()
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + "\uffff", start)
+        return keys[start:end]
+
+    def add(self, keys: Iterable[str], listed_up_to: Optional[str] = None) -> List[str]:
+        """ Adds ``keys`` to the index
+
+        ``listed_up_to`` is only passed after listing every key of the bucket
+        up to it, that is where the next listing picks up.
+        """
+        known_keys, known_listed_up_to = self._read()
+        new_keys = set(keys).difference(known_keys)
+        listed_up_to = max(filter(None, [listed_up_to, known_listed_up_to]), default=None)
+        if new_keys or listed_up_to != known_listed_up_to:
+            known_keys = sorted(new_keys.union(known_keys))
+            self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+            with atomic_write(self.path) as index_file:
+                index_file.write(
+                    json.dumps({"keys": known_keys, "listed_up_to": listed_up_to}).encode()
+                )
+        return known_keys
+
+
+NIGHTLY_INDEX = NightlyIndex()
+
+
 class RaidenNightly(RaidenClient):
     BINARY_NAME_FORMAT = "raiden-nightly-{release}"
     RELEASE_INDEX_URL = "https://raiden-nightlies.ams3.digitaloceanspaces.com"
+    KEY_PREFIX = "NIGHTLY/raiden-nightly-"
     FILE_NAME_PATTERN = (
         r"raiden-nightly-(?P<year>\d+)-(?P<month>\d+)-(?P<day>\d+)"
         r"T(?P<hour>\d+)-(?P<minute>\d+)-(?P<second>\d+)-"
@@ -418,38 +552,42 @@ class RaidenNightly(RaidenClient):
             f"{self.version_data.extra}-{formatted_date}"
         )
 
-    def __eq__(self, other):
-        return self.release_datetime == other.release_datetime
-
-    def __lt__(self, other):
-        return self.release_datetime < other.release_datetime
+    def _make_version_key(self) -> VersionKey:
+        build = int(self.release_datetime.strftime("%Y%m%d%H%M%S"))
+        return VersionKey.from_version_data(self.version_data, build=build)
 
-    def __gt__(self, other):
-        return self.release_datetime > other.release_datetime
+    @classmethod
+    def get_release_index(cls) -> ReleaseIndex:
+        listed_up_to = NIGHTLY_INDEX.get_listed_up_to()
+        new_keys = list(cls._list_keys(cls.KEY_PREFIX, start_after=listed_up_to))
+        all_keys = NIGHTLY_INDEX.add(
+            (key for key in new_keys if cls._get_release_data(key)),
+            listed_up_to=new_keys[-1] if new_keys else None,
+        )
+        return ReleaseIndex(cls._make_releases(all_keys))
 
     @classmethod
     def make_by_tag(cls, release_tag):
-        log.info("Getting list of all nightly releases")
-        return {r.release: r for r in cls.get_available_releases()}.get(release_tag)
+        # The tag ends with the build date, which is also part of the key
+        build_date = release_tag.rpartition("-")[2]
+        if not re.fullmatch(r"\d{8}", build_date):
+            return None
+        prefix = f"{cls.KEY_PREFIX}{build_date[:4]}-{build_date[4:6]}-{build_date[6:]}"
+
+        release = cls._find_release(NIGHTLY_INDEX.find(prefix), release_tag)
+        if release is None:
+            log.info(f"Looking up nightly release {release_tag}")
+            release = cls._find_release(cls._list_keys(prefix), release_tag)
+        return release
 
     @staticmethod
     def _make_release():  # pragma: no cover
         raise NotImplementedError
 
     @classmethod
-    def _make_releases(cls, index_response):
-        xmlns = "http://s3.amazonaws.com/doc/2006-03-01/"
-
-        def get_children_by_tag(node, tag):
-            return node.findall(f"{{{xmlns}}}{tag}", namespaces={"xmlns": xmlns})
-
-        tree = ElementTree.fromstring(index_response.content)
-
-        content_nodes = get_children_by_tag(tree, "Contents")
-        all_keys = [get_children_by_tag(node, "Key")[0].text for node in content_nodes]
-
+    def _make_releases(cls, file_keys: Iterable[str]) -> List["RaidenNightly"]:
         releases = []
-        for file_key in all_keys:
+        for file_key in file_keys:
             release_data = cls._get_release_data(file_key)
             if release_data:
                 version_data, release_datetime = release_data
@@ -457,6 +595,46 @@ class RaidenNightly(RaidenClient):
 
         return releases
 
+    @classmethod
+    def _find_release(cls, file_keys: Iterable[str], release_tag) -> Optional["RaidenNightly"]:
+        # Keys come in upload order, so the first build of the day wins
+        for file_key in file_keys:
+            for release in cls._make_releases([file_key]):
+                if release.release == release_tag:
+                    NIGHTLY_INDEX.add([file_key])
+                    return release
+        return None
+
+    @classmethod
+    def _list_keys(cls, prefix: str, start_after: Optional[str] = None) -> Iterator[str]:
+        """ Keys in the bucket starting with ``prefix``, yielded while the listing is parsed
+
+        Follows continuation tokens as long as the caller keeps consuming keys.
+        """
+        params = {"list-type": "2", "prefix": prefix}
+        if start_after is not None:
+            params["start-after"] = start_after
+
+        while True:
+            continuation_token = None
+            with requests.get(
+                cls.RELEASE_INDEX_URL, params=params, stream=True, timeout=DOWNLOAD_TIMEOUT
+            ) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                for _, node in ElementTree.iterparse(response.raw):
+                    tag = node.tag.rpartition("}")[2]
+                    if tag == "Key":
+                        yield node.text
+                    elif tag == "NextContinuationToken":
+                        continuation_token = node.text
+                    elif tag == "Contents":
+                        node.clear()
+
+            if continuation_token is None:
+                return
+            params["continuation-token"] = continuation_token
+
     @classmethod
     def _get_release_data(cls, file_key) -> Optional[Tuple[VersionData, datetime]]:
         result = re.search(cls.get_file_pattern(), file_key)
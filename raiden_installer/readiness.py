@@ -0,0 +1,221 @@
+import json
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import requests
+from xdg import XDG_DATA_HOME
+
+from raiden_installer import log
+from raiden_installer.constants import (
+    READINESS_MAX_INTERVAL,
+    READINESS_MIN_INTERVAL,
+    READINESS_REQUEST_TIMEOUT,
+)
+
+
+class RaidenClientExited(Exception):
+    pass
+
+
+@dataclass
+class SyncProgress:
+    status: str
+    blocks_to_sync: Optional[int] = None
+    blocks_synced: int = 0
+    eta: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class LogTail:
+    """ Follows a log file in a background thread and calls ``on_line`` for every new line """
+
+    POLL_INTERVAL = 0.1
+
+    def __init__(self, path: Path, on_line: Callable[[str], None], from_start: bool = True):
+        self.path = path
+        self.on_line = on_line
+        self.from_start = from_start
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-tail", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        with self.path.open("r", errors="replace") as log_file:
+            if not self.from_start:
+                log_file.seek(0, 2)
+            partial_line = ""
+            while not self._stopped.is_set():
+                line = log_file.readline()
+                if not line:
+                    self._stopped.wait(self.POLL_INTERVAL)
+                    continue
+                partial_line += line
+                if partial_line.endswith("\n"):
+                    self.on_line(partial_line.rstrip("\n"))
+                    partial_line = ""
+
+
+class ReadinessProbe:
+    """ Waits for the status API of a starting Raiden client to report ``ready``
+
+    The status endpoint is polled over a keep-alive session. Polling starts
+    every ``min_interval`` seconds and backs off up to ``max_interval`` while
+    nothing changes. If the output of the client is available, the probe
+    checks right away once the client announces that its API is up.
+    """
+
+    READY_LOG_PATTERN = re.compile(r"Raiden API RPC server is now running")
+
+    def __init__(
+        self,
+        status_url: str,
+        is_running: Callable[[], bool],
+        log_path: Optional[Path] = None,
+        follow_log_from_start: bool = True,
+        min_interval: float = READINESS_MIN_INTERVAL,
+        max_interval: float = READINESS_MAX_INTERVAL,
+    ):
+        self.status_url = status_url
+        self.is_running = is_running
+        self.log_path = log_path
+        self.follow_log_from_start = follow_log_from_start
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.session = requests.Session()
+        self._wake_up = threading.Event()
+        self._sync_started: Optional[tuple] = None
+
+    def wait(
+        self,
+        progress_callback: Optional[Callable[[SyncProgress], None]] = None,
+        timeout: Optional[float] = None,
+    ) -> float:
+        """ Block until the client is ready and return how many seconds that took
+
+        Raises ``RaidenClientExited`` if the client process is gone, and
+        ``TimeoutError`` if it isn't ready after ``timeout`` seconds.
+        """
+        started_at = time.monotonic()
+        log_tail = None
+        if self.log_path is not None and self.log_path.exists():
+            log_tail = LogTail(self.log_path, self._on_log_line, self.follow_log_from_start)
+            log_tail.start()
+
+        try:
+            interval = self.min_interval
+            last_progress = None
+            while True:
+                if not self.is_running():
+                    raise RaidenClientExited("client process terminated while starting")
+
+                progress = self.check()
+                if progress.status == "ready":
+                    return time.monotonic() - started_at
+
+                if progress != last_progress:
+                    interval = self.min_interval
+                    if progress_callback is not None:
+                        progress_callback(progress)
+                else:
+                    interval = min(interval * 2, self.max_interval)
+                last_progress = progress
+
+                if timeout is not None and time.monotonic() - started_at > timeout:
+                    raise TimeoutError(f"Raiden not ready after {timeout} seconds")
+                if self._wake_up.wait(interval):
+                    self._wake_up.clear()
+        finally:
+            if log_tail is not None:
+                log_tail.stop()
+            self.session.close()
+
+    def check(self) -> SyncProgress:
+        """ Ask the status API once """
+        try:
+            response = self.session.get(self.status_url, timeout=READINESS_REQUEST_TIMEOUT)
+            result = response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError):
+            return SyncProgress(status="unavailable")
+
+        status = result.get("status", "unavailable")
+        if status != "syncing" or result.get("blocks_to_sync") is None:
+            return SyncProgress(status=status)
+        return self._get_sync_progress(int(result["blocks_to_sync"]))
+
+    def _get_sync_progress(self, blocks_to_sync: int) -> SyncProgress:
+        now = time.monotonic()
+        if self._sync_started is None:
+            self._sync_started = (now, blocks_to_sync)
+
+        started_at, initial_blocks_to_sync = self._sync_started
+        blocks_synced = max(initial_blocks_to_sync - blocks_to_sync, 0)
+        elapsed = now - started_at
+        eta = None
+        if blocks_synced and elapsed:
+            eta = round(blocks_to_sync / (blocks_synced / elapsed), 1)
+        return SyncProgress(
+            status="syncing", blocks_to_sync=blocks_to_sync, blocks_synced=blocks_synced, eta=eta
+        )
+
+    def _on_log_line(self, line: str):
+        if self.READY_LOG_PATTERN.search(line):
+            log.debug("Raiden announced its API, checking status")
+            self._wake_up.set()
+
+
+class LaunchMetrics:
+    """ Time from launching a client until it was ready, kept on disk per release """
+
+    FOLDER_PATH = XDG_DATA_HOME.joinpath("raiden-wizard")
+    FILE_NAME = "launch-metrics.jsonl"
+
+    @property
+    def path(self) -> Path:
+        return self.FOLDER_PATH.joinpath(self.FILE_NAME)
+
+    def record(self, release: str, time_to_ready: float):
+        log.info("Raiden is ready", release=release, time_to_ready=round(time_to_ready, 2))
+        self.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        entry = {"release": release, "time_to_ready": time_to_ready, "timestamp": time.time()}
+        with self.path.open("a") as metrics_file:
+            metrics_file.write(json.dumps(entry) + "\n")
+
+    def summary(self) -> Dict[str, dict]:
+        """ Number of launches and time to ready statistics by release """
+        times: Dict[str, list] = {}
+        try:
+            with self.path.open() as metrics_file:
+                for line in metrics_file:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    times.setdefault(entry["release"], []).append(entry["time_to_ready"])
+        except FileNotFoundError:
+            pass
+
+        return {
+            release: {
+                "launches": len(values),
+                "mean": sum(values) / len(values),
+                "min": min(values),
+                "max": max(values),
+                "last": values[-1],
+            }
+            for release, values in times.items()
+        }
+
+
+LAUNCH_METRICS = LaunchMetrics()
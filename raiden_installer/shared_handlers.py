@@ -1,19 +1,21 @@
 import json
 import os
 import sys
+import threading
 import time
 import webbrowser
 from glob import glob
 from pathlib import Path
 from re import search
-from typing import Optional
+from typing import Callable, Optional
 
 import tornado.ioloop
 import wtforms
 from eth_utils import to_canonical_address, to_checksum_address
+from tornado.ioloop import IOLoop
 from tornado.netutil import bind_sockets
 from tornado.web import Application, HTTPServer, RequestHandler, url
-from tornado.websocket import WebSocketHandler
+from tornado.websocket import WebSocketClosedError, WebSocketHandler
 from wtforms.validators import EqualTo
 from wtforms_tornado import Form
 
@@ -21,15 +23,16 @@ from raiden_contracts.contract_manager import ContractManager, contracts_precomp
 from raiden_installer import get_resource_folder_path, load_settings, log
 from raiden_installer.account import Account, find_keystore_folder_path
 from raiden_installer.base import RaidenConfigurationFile
-from raiden_installer.ethereum_rpc import Infura, make_web3_provider
+from raiden_installer.ethereum_rpc import Infura, get_web3_provider
+from raiden_installer.executors import FILE_IO, RPC, get_executor, run_blocking
+from raiden_installer.head_watcher import get_head_watcher
 from raiden_installer.network import Network
 from raiden_installer.raiden import RaidenClient, RaidenClientError, temporary_passphrase_file
-from raiden_installer.tokens import Erc20Token, RequiredAmounts
+from raiden_installer.tasks import TASKS, raise_if_cancelled
+from raiden_installer.tokens import RequiredAmounts
 from raiden_installer.transactions import (
     deposit_service_tokens,
-    get_token_balance,
-    get_token_deposit,
-    get_total_token_owned,
+    get_account_snapshot,
 )
 from raiden_installer.utils import (
     check_eth_node_responsivity,
@@ -61,6 +64,32 @@ def try_unlock(account):
         account.passphrase = passphrase
 
 
+def serialize_balance(balance_amount):
+    return (
+        {"as_wei": balance_amount.as_wei, "formatted": balance_amount.formatted}
+        if balance_amount
+        else None
+    )
+
+
+def get_balances(w3, configuration_file) -> dict:
+    required = RequiredAmounts.from_settings(configuration_file.settings)
+    service_token = required.service_token.currency
+    transfer_token = required.transfer_token.currency
+
+    snapshot = get_account_snapshot(
+        w3=w3,
+        account=configuration_file.account,
+        service_token=service_token,
+        transfer_token=transfer_token,
+    )
+    return {
+        "ETH": serialize_balance(snapshot.ethereum_balance),
+        "service_token": serialize_balance(snapshot.total_service_token_owned),
+        "transfer_token": serialize_balance(snapshot.transfer_token_balance),
+    }
+
+
 class QuickSetupForm(Form):
     endpoint = wtforms.StringField("Infura Project ID / URL")
 
@@ -83,18 +112,140 @@ class PasswordForm(Form):
 class AsyncTaskHandler(WebSocketHandler):
     def initialize(self):
         self.installer_settings = self.settings.get("installer_settings")
+        self.io_loop = IOLoop.current()
         self.actions = {
             "launch": self._run_launch,
             "setup": self._run_setup,
             "unlock": self._run_unlock,
             "create_wallet": self._run_create_wallet,
         }
+        self.commands = {
+            "task_status": self._get_task_status,
+            "cancel_task": self._cancel_task,
+            "subscribe_balances": self._subscribe_balances,
+            "unsubscribe_balances": self._unsubscribe_balances,
+        }
+        self._balance_subscription: Optional[Callable[[], None]] = None
+        self._balance_generation = 0
 
     def on_message(self, message):
         data = json.loads(message)
         method = data.pop("method", None)
+        command = method and self.commands.get(method)
+        if command:
+            return command(**data)
+
         action = method and self.actions.get(method)
-        return action and action(**data)
+        if action:
+            TASKS.submit(
+                method,
+                action,
+                key=self._get_task_key(data),
+                on_update=self._send_task_status,
+                **data,
+            )
+
+    @staticmethod
+    def _get_task_key(data) -> Optional[str]:
+        """ Tasks acting on the same account get the same key and never run concurrently """
+        configuration_file_name = data.get("configuration_file_name")
+        if configuration_file_name:
+            # config-<checksum address>-<settings name>.toml
+            parts = configuration_file_name.split("-")
+            return parts[1] if len(parts) == 3 else configuration_file_name
+        return data.get("account_file") or data.get("keystore_file_path")
+
+    def _get_task_status(self, task_id=None, **kw):
+        if task_id is None:
+            tasks = TASKS.list()
+        else:
+            task = TASKS.get(task_id)
+            tasks = [task] if task else []
+        self._write_message(
+            json.dumps({"type": "task-list", "tasks": [task.to_dict() for task in tasks]})
+        )
+
+    def _cancel_task(self, task_id=None, **kw):
+        if not TASKS.cancel(task_id):
+            log.info(f"Task {task_id} not found or already finished")
+        self._get_task_status(task_id)
+
+    def on_close(self):
+        self._unsubscribe_balances()
+
+    def _subscribe_balances(self, configuration_file_name=None, **kw):
+        """ Push the balances of an account, and again whenever they change at a new block """
+        self._unsubscribe_balances()
+        get_executor(RPC).submit(
+            self._start_balance_updates, configuration_file_name, self._balance_generation
+        )
+
+    def _unsubscribe_balances(self, **kw):
+        # Subscriptions still being set up for an older generation are dropped
+        self._balance_generation += 1
+        if self._balance_subscription is not None:
+            self._balance_subscription()
+            self._balance_subscription = None
+
+    def _start_balance_updates(self, configuration_file_name, generation):
+        try:
+            configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
+            account = configuration_file.account
+            try_unlock(account)
+            w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+        except Exception as exc:
+            log.error("Could not subscribe to balances", exc_info=exc)
+            return
+
+        last_balances = None
+        lock = threading.Lock()
+
+        def send_balances_if_changed(head=None):
+            nonlocal last_balances
+            # Heads can arrive faster than the balances are fetched, skip instead of queueing up
+            if not lock.acquire(blocking=False):
+                return
+            try:
+                balances = get_balances(w3, configuration_file)
+                if balances != last_balances:
+                    last_balances = balances
+                    self._write_message(
+                        json.dumps(
+                            {
+                                "type": "balance-update",
+                                "configuration_file_name": configuration_file_name,
+                                "balance": balances,
+                            }
+                        )
+                    )
+            except Exception as exc:
+                log.warning("Failed to fetch balances", error=str(exc))
+            finally:
+                lock.release()
+
+        def on_new_head(head):
+            get_executor(RPC).submit(send_balances_if_changed, head)
+
+        unsubscribe = get_head_watcher(w3).subscribe(on_new_head)
+        send_balances_if_changed()
+        self.io_loop.add_callback(self._set_balance_subscription, unsubscribe, generation)
+
+    def _set_balance_subscription(self, unsubscribe, generation):
+        # Runs on the IOLoop, like on_close and the subscribe/unsubscribe commands
+        if generation != self._balance_generation or self.ws_connection is None:
+            unsubscribe()
+        else:
+            self._balance_subscription = unsubscribe
+
+    def _write_message(self, message):
+        # Actions run on worker threads, the websocket may only be written from the IOLoop
+        self.io_loop.add_callback(self._write_message_from_io_loop, message)
+
+    def _write_message_from_io_loop(self, message):
+        try:
+            self.write_message(message)
+        except WebSocketClosedError:
+            log.debug("Websocket closed, dropping message", message=message)
 
     def _send_status_update(self, message_text, icon=None):
         if not isinstance(message_text, list):
@@ -102,27 +253,39 @@ class AsyncTaskHandler(WebSocketHandler):
         body = {"type": "status-update", "text": message_text}
         if icon:
             body["icon"] = icon
-        self.write_message(json.dumps(body))
+        self._write_message(json.dumps(body))
         log.info(" ".join(message_text))
 
     def _send_error_message(self, error_message):
-        self.write_message(json.dumps({"type": "error-message", "text": [error_message]}))
+        self._write_message(json.dumps({"type": "error-message", "text": [error_message]}))
         log.error(error_message)
 
     def _send_task_complete(self, message_text):
-        self.write_message(json.dumps({"type": "task-complete", "text": [message_text]}))
+        self._write_message(json.dumps({"type": "task-complete", "text": [message_text]}))
         log.info(message_text)
 
     def _send_redirect(self, redirect_url):
-        self.write_message(json.dumps({"type": "redirect", "redirect_url": redirect_url}))
+        self._write_message(json.dumps({"type": "redirect", "redirect_url": redirect_url}))
         log.info(f"Redirecting to {redirect_url}")
 
+    def _call_later(self, delay, callback, *args):
+        # Waiting in the action would hold a worker, and call_later is only safe on the IOLoop
+        self.io_loop.add_callback(self.io_loop.call_later, delay, callback, *args)
+
+    def _send_task_status(self, task):
+        self._write_message(json.dumps({"type": "task-status", **task.to_dict()}))
+
+    def _send_sync_progress(self, progress):
+        self._write_message(json.dumps({"type": "sync-progress", **progress.to_dict()}))
+        log.info("Raiden is starting", **progress.to_dict())
+
     def _deposit_to_udc(self, w3, account, service_token, deposit_amount):
         self._send_status_update(
             f"Making deposit of {deposit_amount.formatted} to the "
             "User Deposit Contract"
         )
         self._send_status_update(f"This might take a few minutes")
+        raise_if_cancelled()
         tx_hash = deposit_service_tokens(
             w3=w3,
             account=account,
@@ -130,13 +293,36 @@ class AsyncTaskHandler(WebSocketHandler):
             amount=deposit_amount.as_wei,
         )
         wait_for_transaction(w3, tx_hash)
-        service_token_deposited = get_token_deposit(
-            w3=w3, account=account, token=service_token
+        required = RequiredAmounts.from_settings(self.installer_settings)
+        snapshot = get_account_snapshot(
+            w3=w3,
+            account=account,
+            service_token=service_token,
+            transfer_token=required.transfer_token.currency,
         )
         self._send_status_update(
-            f"Total amount deposited at UDC: {service_token_deposited.formatted}"
+            f"Total amount deposited at UDC: {snapshot.service_token_deposit.formatted}"
         )
 
+    def _make_download_progress_callback(self):
+        reported_bytes = 0
+
+        def send_download_progress(downloaded_bytes, total_bytes):
+            nonlocal reported_bytes
+            raise_if_cancelled()
+            # Report every 10 percent, or every 10 MiB if the size is unknown
+            step = total_bytes // 10 if total_bytes else 10 * 2 ** 20
+            progress = downloaded_bytes - reported_bytes
+            if progress == 0 or (progress < step and downloaded_bytes != total_bytes):
+                return
+            reported_bytes = downloaded_bytes
+            downloaded = f"{downloaded_bytes / 2 ** 20:.1f} MiB"
+            if total_bytes:
+                downloaded += f" of {total_bytes / 2 ** 20:.1f} MiB"
+            self._send_status_update(f"Downloaded {downloaded}")
+
+        return send_download_progress
+
     def _run_unlock(self, **kw):
         passphrase = kw.get("passphrase")
         keystore_file_path = kw.get("keystore_file_path")
@@ -202,10 +388,12 @@ class AsyncTaskHandler(WebSocketHandler):
             return
 
         raiden_client = RaidenClient.get_client(self.installer_settings)
+        raise_if_cancelled()
         if not raiden_client.is_installed:
             self._send_status_update(f"Downloading and installing raiden {raiden_client.release}")
-            raiden_client.install()
+            raiden_client.install(progress_callback=self._make_download_progress_callback())
             self._send_status_update("Installation complete")
+            raise_if_cancelled()
 
         self._send_status_update(
             "Launching Raiden, this might take a couple of minutes, do not close the browser"
@@ -216,11 +404,9 @@ class AsyncTaskHandler(WebSocketHandler):
                 raiden_client.launch(configuration_file, passphrase_file)
 
             try:
-                raiden_client.wait_for_web_ui_ready(
-                    status_callback=lambda stat: log.info(str(stat))
-                )
+                raiden_client.wait_for_web_ui_ready(status_callback=self._send_sync_progress)
                 self._send_task_complete("Raiden is ready!")
-                self._send_redirect(RaidenClient.WEB_UI_INDEX_URL)
+                self._send_redirect(raiden_client.web_ui_index_url)
             except (RaidenClientError, RuntimeError) as exc:
                 self._send_error_message(f"Raiden process failed to start: {exc}")
                 raiden_client.kill()
@@ -247,15 +433,17 @@ class BaseRequestHandler(RequestHandler):
 
 
 class IndexHandler(BaseRequestHandler):
-    def get(self):
+    async def get(self):
+        configuration_file = await run_blocking(FILE_IO, self._get_configuration_file)
+        self.render("index.html", configuration_file=configuration_file)
+
+    def _get_configuration_file(self):
         try:
-            configuration_file = RaidenConfigurationFile.get_available_configurations(
+            return RaidenConfigurationFile.get_available_configurations(
                 self.installer_settings
             ).pop()
         except IndexError:
-            configuration_file = None
-
-        self.render("index.html", configuration_file=configuration_file)
+            return None
 
 
 class SetupHandler(BaseRequestHandler):
@@ -269,8 +457,10 @@ class WalletCreationHandler(BaseRequestHandler):
 
 
 class AccountDetailHandler(BaseRequestHandler):
-    def get(self, configuration_file_name):
-        configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
+    async def get(self, configuration_file_name):
+        configuration_file = await run_blocking(
+            FILE_IO, RaidenConfigurationFile.get_by_filename, configuration_file_name
+        )
         if get_passphrase() is None:
             self.render(
                 "account_unlock.html",
@@ -279,8 +469,13 @@ class AccountDetailHandler(BaseRequestHandler):
             )
             return
 
+        filename = await run_blocking(FILE_IO, self._get_keystore_filename, configuration_file)
+        await run_blocking(RPC, self._check_initial_funding, configuration_file)
+
+        self.render("account.html", configuration_file=configuration_file, keystore=filename)
+
+    def _get_keystore_filename(self, configuration_file):
         keystore_path = configuration_file.configuration_data["keystore-path"]
-        filename = ""
         for file in glob(f"{keystore_path}/UTC--*"):
             file_path = Path(file)
             if file_path.is_file():
@@ -289,26 +484,33 @@ class AccountDetailHandler(BaseRequestHandler):
                     to_canonical_address(keystore_content["address"])
                     == configuration_file.account.address
                 ):
-                    filename = os.path.basename(file)
-                    break
+                    return os.path.basename(file)
+        return ""
 
-        w3 = make_web3_provider(
+    def _check_initial_funding(self, configuration_file):
+        w3 = get_web3_provider(
             configuration_file.ethereum_client_rpc_endpoint, configuration_file.account
         )
         required = RequiredAmounts.from_settings(self.installer_settings)
-        eth_balance = configuration_file.account.get_ethereum_balance(w3)
+        snapshot = get_account_snapshot(
+            w3=w3,
+            account=configuration_file.account,
+            service_token=required.service_token.currency,
+            transfer_token=required.transfer_token.currency,
+        )
+        eth_balance = snapshot.ethereum_balance
         log.info(f"funding tx {configuration_file._initial_funding_txhash}")
         log.info(f"Checking balance {eth_balance} >= {required.eth}")
         if eth_balance >= required.eth:
             configuration_file._initial_funding_txhash = None
             configuration_file.save()
 
-        self.render("account.html", configuration_file=configuration_file, keystore=filename)
-
 
 class LaunchHandler(BaseRequestHandler):
-    def get(self, configuration_file_name):
-        configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
+    async def get(self, configuration_file_name):
+        configuration_file = await run_blocking(
+            FILE_IO, RaidenConfigurationFile.get_by_filename, configuration_file_name
+        )
         if get_passphrase() is None:
             self.render(
                 "account_unlock.html",
@@ -317,15 +519,19 @@ class LaunchHandler(BaseRequestHandler):
             )
             return
 
-        w3 = make_web3_provider(
-            configuration_file.ethereum_client_rpc_endpoint, configuration_file.account
-        )
-        current_balance = configuration_file.account.get_ethereum_balance(w3)
+        current_balance = await run_blocking(RPC, self._get_balance, configuration_file)
 
         self.render(
             "launch.html", configuration_file=configuration_file, balance=current_balance
         )
 
+    @staticmethod
+    def _get_balance(configuration_file):
+        w3 = get_web3_provider(
+            configuration_file.ethereum_client_rpc_endpoint, configuration_file.account
+        )
+        return configuration_file.account.get_ethereum_balance(w3)
+
 
 class APIHandler(RequestHandler):
     def initialize(self):
@@ -341,70 +547,52 @@ class APIHandler(RequestHandler):
 
 
 class KeystoreHandler(APIHandler):
-    def get(self, configuration_file_name, keystore_filename):
-        configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
+    async def get(self, configuration_file_name, keystore_filename):
+        configuration_file = await run_blocking(
+            FILE_IO, RaidenConfigurationFile.get_by_filename, configuration_file_name
+        )
         keystore_path = configuration_file.configuration_data["keystore-path"]
         self.render(f"{keystore_path}/{keystore_filename}")
 
 
 class GasPriceHandler(APIHandler):
-    def get(self, configuration_file_name):
+    async def get(self, configuration_file_name):
+        self.render_json(await run_blocking(RPC, self._get_gas_price, configuration_file_name))
+
+    def _get_gas_price(self, configuration_file_name):
         configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
         account = configuration_file.account
         try_unlock(account)
-        web3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
-        self.render_json(
-            {
-                "gas_price": web3.eth.generateGasPrice(),
-                "block_number": web3.eth.blockNumber,
-                "utc_seconds": int(time.time()),
-            }
-        )
+        web3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+        return {
+            "gas_price": web3.eth.generateGasPrice(),
+            "block_number": web3.eth.blockNumber,
+            "utc_seconds": int(time.time()),
+        }
 
 
 class ConfigurationItemAPIHandler(APIHandler):
-    def get(self, configuration_file_name):
-        configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
-        network = configuration_file.network.name
+    async def get(self, configuration_file_name):
+        self.render_json(
+            await run_blocking(RPC, self._get_configuration_data, configuration_file_name)
+        )
 
+    def _get_configuration_data(self, configuration_file_name):
+        configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
         account = configuration_file.account
 
         try_unlock(account)
-        w3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+        w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
 
-        settings = configuration_file.settings
-        required = RequiredAmounts.from_settings(settings)
-        service_token = Erc20Token.find_by_ticker(required.service_token.ticker, network)
-        transfer_token = Erc20Token.find_by_ticker(required.transfer_token.ticker, network)
+        balances = get_balances(w3, configuration_file)
 
-        service_token_balance = get_total_token_owned(
-            w3=w3, account=configuration_file.account, token=service_token
-        )
-        transfer_token_balance = get_token_balance(
-            w3=w3, account=configuration_file.account, token=transfer_token
-        )
-        eth_balance = configuration_file.account.get_ethereum_balance(w3)
-
-        def serialize_balance(balance_amount):
-            return (
-                {"as_wei": balance_amount.as_wei, "formatted": balance_amount.formatted}
-                if balance_amount
-                else None
-            )
-
-        self.render_json(
-            {
-                "file_name": configuration_file.file_name,
-                "account": to_checksum_address(configuration_file.account.address),
-                "network": configuration_file.network.name,
-                "balance": {
-                    "ETH": serialize_balance(eth_balance),
-                    "service_token": serialize_balance(service_token_balance),
-                    "transfer_token": serialize_balance(transfer_token_balance),
-                },
-                "_initial_funding_txhash": configuration_file._initial_funding_txhash,
-            }
-        )
+        return {
+            "file_name": configuration_file.file_name,
+            "account": to_checksum_address(configuration_file.account.address),
+            "network": configuration_file.network.name,
+            "balance": balances,
+            "_initial_funding_txhash": configuration_file._initial_funding_txhash,
+        }
 
 
 def create_app(settings_name: str, additional_handlers: list) -> Application:
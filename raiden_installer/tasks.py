@@ -0,0 +1,223 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from raiden_installer import log
+from raiden_installer.constants import TASK_HISTORY_SIZE
+from raiden_installer.executors import TRANSACTIONS, get_executor
+
+
+class TaskCancelled(BaseException):
+    """ Raised inside of a running task once it has been cancelled
+
+    Derives from BaseException so that the ``except Exception`` blocks of the
+    websocket actions do not swallow it.
+    """
+
+
+class TaskState:
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class Task:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        kw: dict,
+        key: Optional[str] = None,
+        on_update: Optional[Callable[["Task"], None]] = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.name = name
+        self.key = key
+        self.state = TaskState.PENDING
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._fn = fn
+        self._kw = kw
+        self._on_update = on_update
+        self._cancel_requested = threading.Event()
+
+    @property
+    def is_finished(self) -> bool:
+        return self.state in TaskState.FINISHED
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested.is_set()
+
+    def to_dict(self) -> dict:
+        return {
+            "task_id": self.id,
+            "name": self.name,
+            "key": self.key,
+            "state": self.state,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+    def _notify(self):
+        if self._on_update is None:
+            return
+        try:
+            self._on_update(self)
+        except Exception:
+            log.exception("Failed to notify about task update", task_id=self.id)
+
+    def __repr__(self):
+        return f"<Task {self.name} {self.id} {self.state}>"
+
+
+_current = threading.local()
+
+
+def get_current_task() -> Optional[Task]:
+    return getattr(_current, "task", None)
+
+
+def raise_if_cancelled():
+    """ Checkpoint for long running actions, a no-op when not running as a task """
+    task = get_current_task()
+    if task is not None and task.cancel_requested:
+        raise TaskCancelled(f"Task {task.id} was cancelled")
+
+
+class TaskManager:
+    """ Runs websocket actions in the background
+
+    Tasks sharing a ``key`` (the account they act on) are run one after
+    another in submission order, so that two of them never race on the
+    account nonce. Tasks for different keys run in parallel on the
+    transactions executor. Running tasks are cancelled cooperatively, see
+    ``raise_if_cancelled``.
+    """
+
+    def __init__(self, work_class: str = TRANSACTIONS, history_size: int = TASK_HISTORY_SIZE):
+        self.work_class = work_class
+        self.history_size = history_size
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, Task] = OrderedDict()
+        # Keys with a running task, mapped to the tasks waiting for it to finish
+        self._queues: Dict[str, Deque[Task]] = {}
+
+    def submit(
+        self,
+        name: str,
+        fn: Callable,
+        key: Optional[str] = None,
+        on_update: Optional[Callable[[Task], None]] = None,
+        **kw,
+    ) -> Task:
+        task = Task(name, fn, kw, key=key, on_update=on_update)
+        with self._lock:
+            self._tasks[task.id] = task
+            if key is not None and key in self._queues:
+                self._queues[key].append(task)
+                start = False
+            else:
+                if key is not None:
+                    self._queues[key] = deque()
+                start = True
+            self._prune()
+
+        task._notify()
+        if start:
+            self._start(task)
+        return task
+
+    def get(self, task_id: str) -> Optional[Task]:
+        with self._lock:
+            return self._tasks.get(task_id)
+
+    def list(self, key: Optional[str] = None) -> List[Task]:
+        with self._lock:
+            return [task for task in self._tasks.values() if key is None or task.key == key]
+
+    def cancel(self, task_id: str) -> bool:
+        """ Cancel a task, returns False if it does not exist or is already finished """
+        with self._lock:
+            task = self._tasks.get(task_id)
+            if task is None or task.is_finished:
+                return False
+
+            task._cancel_requested.set()
+            queue = self._queues.get(task.key) if task.key is not None else None
+            if queue is None or task not in queue:
+                # Already handed to the executor, _run picks up the request
+                return True
+
+            queue.remove(task)
+            task.state = TaskState.CANCELLED
+            task.finished_at = time.time()
+
+        task._notify()
+        return True
+
+    def _start(self, task: Task):
+        get_executor(self.work_class).submit(self._run, task)
+
+    def _run(self, task: Task):
+        try:
+            if task.cancel_requested:
+                task.state = TaskState.CANCELLED
+                return
+
+            task.state = TaskState.RUNNING
+            task.started_at = time.time()
+            task._notify()
+            _current.task = task
+            try:
+                task._fn(**task._kw)
+                task.state = TaskState.COMPLETED
+            except TaskCancelled:
+                task.state = TaskState.CANCELLED
+            except Exception as exc:
+                log.exception(f"Task {task.name} failed", task_id=task.id)
+                task.error = str(exc)
+                task.state = TaskState.FAILED
+            except BaseException as exc:
+                # SystemExit and the like would only end this worker thread, not the process
+                log.exception(f"Task {task.name} aborted", task_id=task.id)
+                task.error = repr(exc)
+                task.state = TaskState.FAILED
+            finally:
+                _current.task = None
+        finally:
+            # Always let the next task for the key run, or it would wait forever
+            task.finished_at = time.time()
+            task._notify()
+            self._start_next(task.key)
+
+    def _start_next(self, key: Optional[str]):
+        if key is None:
+            return
+
+        with self._lock:
+            queue = self._queues[key]
+            next_task = queue.popleft() if queue else None
+            if next_task is None:
+                del self._queues[key]
+
+        if next_task is not None:
+            self._start(next_task)
+
+    def _prune(self):
+        finished = [task_id for task_id, task in self._tasks.items() if task.is_finished]
+        for task_id in finished[: max(0, len(finished) - self.history_size)]:
+            del self._tasks[task_id]
+
+
+TASKS = TaskManager()
@@ -1,5 +1,9 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from dataclasses import dataclass
 from decimal import Decimal
-from typing import List
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Type
 
 import structlog
 from eth_typing import Address
@@ -9,13 +13,18 @@ from web3 import Web3
 from raiden_installer.account import Account
 from raiden_installer.constants import (
     EXCHANGE_PRICE_MARGIN,
+    EXCHANGE_QUOTE_DEADLINE,
     GAS_LIMIT_MARGIN,
     NULL_ADDRESS,
     WEB3_TIMEOUT,
 )
+from raiden_installer.ethereum_rpc import run_call_graph
+from raiden_installer.exchange_metadata import EXCHANGE_METADATA
+from raiden_installer.executors import QUOTES, get_executor
 from raiden_installer.kyber.web3 import contracts as kyber_contracts, tokens as kyber_tokens
-from raiden_installer.network import Network
+from raiden_installer.network import get_chain_context
 from raiden_installer.tokens import Erc20Token, EthereumAmount, TokenAmount, TokenTicker, Wei
+from raiden_installer.uniswap.pricing import UNISWAP_PAIRS, UniswapError
 from raiden_installer.uniswap.web3 import contracts as uniswap_contracts
 from raiden_installer.utils import estimate_gas, send_raw_transaction
 
@@ -29,14 +38,15 @@ class ExchangeError(Exception):
 class Exchange:
     def __init__(self, w3: Web3):
         self.w3 = w3
+        self.chain_context = get_chain_context(w3)
 
     @property
     def chain_id(self):
-        return self.w3.eth.chainId
+        return self.chain_context.chain_id
 
     @property
     def network(self):
-        return Network.get_by_chain_id(self.chain_id)
+        return self.chain_context.network
 
     @property
     def name(self):
@@ -53,44 +63,67 @@ class Exchange:
         if token_amount.as_wei <= 0:
             raise ExchangeError(f"Cannot calculate costs for a swap of {token_amount.formatted}")
 
-        log.debug("calculating exchange rate")
-        exchange_rate = self.get_current_rate(token_amount)
-        eth_sold = EthereumAmount(
-            token_amount.value * exchange_rate.value * Decimal(EXCHANGE_PRICE_MARGIN)
-        )
-
-        log.debug("calculating gas price")
-        gas_price = self._get_gas_price()
+        def estimate(exchange_rate, gas_price, latest_block, nonce):
+            transaction_params = {
+                "from": account.address,
+                "value": self._get_eth_sold(token_amount, exchange_rate).as_wei,
+                "gasPrice": gas_price.as_wei,
+                "nonce": nonce,
+            }
+            return self._estimate_gas(
+                token_amount,
+                account,
+                transaction_params,
+                exchange_rate=exchange_rate,
+                latest_block=latest_block,
+            )
 
-        transaction_params = {
-            "from": account.address,
-            "value": eth_sold.as_wei,
-            "gasPrice": gas_price.as_wei,
-        }
-        log.debug("estimating gas")
-        gas = self._estimate_gas(
-            token_amount,
-            account,
-            transaction_params,
-            exchange_rate=exchange_rate
+        # The rate, gas price, block and nonce don't depend on each other and
+        # are fetched together; only the gas estimate has to wait for them
+        log.debug("calculating transaction costs")
+        started_at = time.monotonic()
+        results, latencies = run_call_graph(
+            self.w3,
+            {
+                "exchange_rate": (lambda: self.get_current_rate(token_amount), ()),
+                "gas_price": (self._get_gas_price, ()),
+                "latest_block": (lambda: self.w3.eth.getBlock("latest"), ()),
+                "nonce": (
+                    lambda: self.w3.eth.getTransactionCount(account.address, "pending"),
+                    (),
+                ),
+                "gas": (estimate, ("exchange_rate", "gas_price", "latest_block", "nonce")),
+            },
         )
+        latencies["total"] = time.monotonic() - started_at
 
-        block = self.w3.eth.getBlock(self.w3.eth.blockNumber)
-        max_gas_limit = Wei(int(block["gasLimit"] * 0.9))
-        gas_with_margin = Wei(int(gas * GAS_LIMIT_MARGIN))
+        exchange_rate = results["exchange_rate"]
+        gas_price = results["gas_price"]
+        eth_sold = self._get_eth_sold(token_amount, exchange_rate)
+        max_gas_limit = Wei(int(results["latest_block"]["gasLimit"] * 0.9))
+        gas_with_margin = Wei(int(results["gas"] * GAS_LIMIT_MARGIN))
         gas = min(gas_with_margin, max_gas_limit)
         gas_cost = EthereumAmount(Wei(gas * gas_price.as_wei))
         total = EthereumAmount(gas_cost.value + eth_sold.value)
 
-        log.debug("transaction cost", gas_price=gas_price, gas=gas, eth=eth_sold)
+        log.debug(
+            "transaction cost", gas_price=gas_price, gas=gas, eth=eth_sold, latencies=latencies
+        )
         return {
             "gas_price": gas_price,
             "gas": gas,
             "eth_sold": eth_sold,
             "total": total,
             "exchange_rate": exchange_rate,
+            "latencies": latencies,
         }
 
+    @staticmethod
+    def _get_eth_sold(token_amount: TokenAmount, exchange_rate: EthereumAmount) -> EthereumAmount:
+        return EthereumAmount(
+            token_amount.value * exchange_rate.value * Decimal(EXCHANGE_PRICE_MARGIN)
+        )
+
     def buy_tokens(self, account: Account, token_amount: TokenAmount, transaction_costs=None):
         if not transaction_costs:
             try:
@@ -142,10 +175,18 @@ class Exchange:
         return {"kyber": Kyber, "uniswap": Uniswap}[name.lower()]
 
 
+@lru_cache()
+def _get_kyber_token_address(chain_id: int, ticker: TokenTicker) -> Address:
+    return to_canonical_address(kyber_tokens.get_token_network_address(chain_id, ticker))
+
+
 class Kyber(Exchange):
     def __init__(self, w3: Web3):
         super().__init__(w3=w3)
-        self.network_contract_proxy = kyber_contracts.get_network_contract_proxy(self.w3)
+        self.network_contract_proxy = self.w3.eth.contract(
+            address=kyber_contracts.get_network_proxy_address(self.chain_id),
+            abi=kyber_contracts.KYBER_NETWORK_PROXY_ABI,
+        )
 
     def is_listing_token(self, ticker: TokenTicker):
         try:
@@ -156,10 +197,7 @@ class Kyber(Exchange):
 
     def get_token_network_address(self, ticker: TokenTicker) -> Address:
         try:
-            token_network_address = to_canonical_address(
-                kyber_tokens.get_token_network_address(self.chain_id, ticker)
-            )
-            return token_network_address
+            return _get_kyber_token_address(self.chain_id, ticker)
         except (KeyError, TypeError) as exc:
             raise ExchangeError(f"{self.name} is not listing {ticker}") from exc
 
@@ -178,7 +216,11 @@ class Kyber(Exchange):
 
     def _get_gas_price(self):
         web3_gas_price = self.w3.eth.generateGasPrice()
-        kyber_max_gas_price = self.network_contract_proxy.functions.maxGasPrice().call()
+        kyber_max_gas_price = EXCHANGE_METADATA.get(
+            self.chain_id,
+            f"kyber:{self.network_contract_proxy.address}:maxGasPrice",
+            self.network_contract_proxy.functions.maxGasPrice().call,
+        )
         max_gas_price = min(web3_gas_price, kyber_max_gas_price)
         return EthereumAmount(Wei(max_gas_price))
 
@@ -243,20 +285,14 @@ class Uniswap(Exchange):
             abi=uniswap_contracts.UNISWAP_ROUTER02_ABI,
             address=self.ROUTER02_ADDRESS,
         )
-        self.weth_address = to_canonical_address(self.router_proxy.functions.WETH().call())
-
-    def _get_factory_proxy(self):
-        factory_address = to_canonical_address(self.router_proxy.functions.factory().call())
-        return self.w3.eth.contract(
-            abi=uniswap_contracts.UNISWAP_FACTORY_ABI,
-            address=factory_address,
+        self.weth_address, self.factory_address = UNISWAP_PAIRS.get_router_addresses(
+            self.chain_id, self.router_proxy
         )
 
     def is_listing_token(self, token_ticker: TokenTicker):
-        factory_proxy = self._get_factory_proxy()
         token = Erc20Token.find_by_ticker(token_ticker, self.network.name)
-        pair_address = to_canonical_address(
-            factory_proxy.functions.getPair(self.weth_address, token.address).call()
+        pair_address = UNISWAP_PAIRS.get_pair_address(
+            self.w3, self.chain_id, self.factory_address, self.weth_address, token.address
         )
         return pair_address != NULL_ADDRESS
 
@@ -270,7 +306,7 @@ class Uniswap(Exchange):
         transaction_params: dict,
         **kw
     ):
-        latest_block = self.w3.eth.getBlock("latest")
+        latest_block = kw.get("latest_block") or self.w3.eth.getBlock("latest")
         deadline = latest_block.timestamp + WEB3_TIMEOUT
         return estimate_gas(
             self.w3,
@@ -298,9 +334,117 @@ class Uniswap(Exchange):
         )
 
     def get_current_rate(self, token_amount: TokenAmount) -> EthereumAmount:
-        amounts_in = self.router_proxy.functions.getAmountsIn(
-            token_amount.as_wei, [self.weth_address, token_amount.address]
-        ).call()
+        try:
+            amounts_in = UNISWAP_PAIRS.get_amounts_in(
+                self.w3,
+                self.chain_id,
+                self.factory_address,
+                token_amount.as_wei,
+                [self.weth_address, token_amount.address],
+                self.w3.eth.blockNumber,
+            )
+        except UniswapError as exc:
+            raise ExchangeError(f"Cannot get a quote from {self.name}: {exc}") from exc
 
         eth_to_sell = EthereumAmount(Wei(amounts_in[0]))
         return EthereumAmount(eth_to_sell.value / token_amount.value)
+
+
+@dataclass
+class ExchangeQuote:
+    exchange: str
+    latency: float
+    costs: Optional[dict] = None
+    error: Optional[str] = None
+
+    @property
+    def total(self) -> Optional[EthereumAmount]:
+        return self.costs and self.costs["total"]
+
+    def sort_key(self):
+        # Cheapest quote first, venues without a quote last
+        return (self.total is None, self.total.as_wei if self.total else 0, self.latency)
+
+    def to_dict(self) -> dict:
+        return {
+            "exchange": self.exchange,
+            "as_wei": self.total and self.total.as_wei,
+            "formatted": self.total and self.total.formatted,
+            "latency": round(self.latency, 3),
+            "error": self.error,
+        }
+
+
+def _get_quote(exchange_class: Type[Exchange], w3: Web3, token_amount: TokenAmount, account):
+    started_at = time.monotonic()
+    try:
+        exchange = exchange_class(w3=w3)
+        costs = exchange.calculate_transaction_costs(token_amount, account)
+    except Exception as exc:
+        # Any failure of a venue only means that it has no quote to offer
+        log.warning(f"No quote from {exchange_class.__name__}", error=str(exc))
+        return ExchangeQuote(
+            exchange_class.__name__, time.monotonic() - started_at, error=str(exc) or repr(exc)
+        )
+    return ExchangeQuote(exchange_class.__name__, time.monotonic() - started_at, costs=costs)
+
+
+def get_quotes(
+    w3: Web3,
+    token_amount: TokenAmount,
+    account: Account,
+    deadline: float = EXCHANGE_QUOTE_DEADLINE,
+    exchange_classes: Optional[Iterable[Type[Exchange]]] = None,
+) -> List[ExchangeQuote]:
+    """ Ask all exchanges for the costs of buying ``token_amount`` at the same time
+
+    Returns one quote per exchange, cheapest first. Exchanges that fail or do
+    not answer within ``deadline`` seconds get a quote with an ``error``. The
+    deadline of an exchange starts once its job runs: running jobs can't be
+    stopped, so jobs of earlier requests may still hold the workers. A job
+    that isn't started within ``deadline`` is dropped.
+    """
+    exchange_classes = list(exchange_classes or Exchange.__subclasses__())
+    executor = get_executor(QUOTES)
+    submitted_at = time.monotonic()
+    started_at: Dict[Type[Exchange], float] = {}
+
+    def get_quote(exchange_class):
+        started_at[exchange_class] = time.monotonic()
+        return _get_quote(exchange_class, w3, token_amount, account)
+
+    futures = {
+        executor.submit(get_quote, exchange_class): exchange_class
+        for exchange_class in exchange_classes
+    }
+    quotes = []
+    pending = set(futures)
+    while pending:
+        expires_at = [
+            started_at.get(futures[future], submitted_at) + deadline for future in pending
+        ]
+        done, pending = wait(
+            pending,
+            timeout=max(min(expires_at) - time.monotonic(), 0.01),
+            return_when=FIRST_COMPLETED,
+        )
+        quotes.extend(future.result() for future in done)
+
+        now = time.monotonic()
+        for future in list(pending):
+            exchange_class = futures[future]
+            job_started_at = started_at.get(exchange_class)
+            if job_started_at is None:
+                if now - submitted_at < deadline or not future.cancel():
+                    continue
+                error = "Too many quote requests at the moment"
+                latency = now - submitted_at
+            elif now - job_started_at >= deadline:
+                error = f"No quote within {deadline} seconds"
+                latency = now - job_started_at
+            else:
+                continue
+
+            pending.discard(future)
+            quotes.append(ExchangeQuote(exchange_class.__name__, latency, error=error))
+    return sorted(quotes, key=ExchangeQuote.sort_key)
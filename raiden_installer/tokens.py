@@ -1,7 +1,9 @@
 from dataclasses import dataclass, field, replace
-from decimal import Decimal, getcontext
+from decimal import ROUND_DOWN, Context, Decimal
 from enum import Enum
-from typing import Dict, Generic, NewType, Optional, TypeVar
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Generic, Mapping, NewType, Optional, Tuple, Type, TypeVar
 
 from eth_typing import Address
 from eth_utils import to_canonical_address
@@ -12,6 +14,9 @@ Eth_T = TypeVar("Eth_T", int, Decimal, float, str, "Wei")
 Token_T = TypeVar("Token_T")
 TokenTicker = NewType("TokenTicker", str)
 
+# Enough digits for any uint256, so converting between units never rounds
+_WEI_CONTEXT = Context(prec=80, rounding=ROUND_DOWN)
+
 
 class TokenError(Exception):
     pass
@@ -65,36 +70,51 @@ class Erc20Token(Currency):
 
     @staticmethod
     def find_by_ticker(ticker, network_name):
-        major, minor, _ = CONTRACTS_VERSION.split(".", 2)
-        version_string = f"{major}.{minor}"
-        token_list_version = {
-            "0.25": TokensV25,
-            "0.33": TokensV33,
-            "0.36": TokensV36,
-            "0.37": TokensV37,
-        }.get(version_string, Tokens)
-        try:
-            token_data = token_list_version[ticker].value
-            address = token_data.addresses[network_name]
-        except KeyError as exc:
-            raise TokenError(f"{ticker} is not deployed on {network_name}") from exc
+        return TOKEN_REGISTRY.get(ticker, network_name)
 
-        return Erc20Token(
-            ticker=token_data.ticker,
-            wei_ticker=token_data.wei_ticker,
-            address=to_canonical_address(address)
-        )
+    @staticmethod
+    def find_by_address(address, network_name):
+        return TOKEN_REGISTRY.get_by_address(address, network_name)
 
 
 class CurrencyAmount(Generic[Eth_T]):
+    """ Amount of a currency, kept as an exact integer number of wei
+
+    Plain numbers, strings and decimals are taken in units of the currency,
+    ``Wei`` values in its smallest unit. Arithmetic and comparisons work on
+    the integers; ``value`` converts back to a ``Decimal`` when asked for.
+    """
+
+    __slots__ = ("wei", "currency", "_formatted")
+
     def __init__(self, value: Eth_T, currency: Currency):
-        context = getcontext()
-        context.prec = currency.decimals
-        self.value = Decimal(str(value), context=context)
         if type(value) is Wei:
-            self.value /= 10 ** currency.decimals
-
+            self.wei = int(value)
+        elif isinstance(value, int):
+            self.wei = value * 10 ** currency.decimals
+        else:
+            if not isinstance(value, Decimal):
+                value = Decimal(str(value))
+            self.wei = int(_WEI_CONTEXT.scaleb(value, currency.decimals))
         self.currency = currency
+        self._formatted: Optional[str] = None
+
+    @classmethod
+    def _from_wei(cls, wei: int, currency: Currency):
+        amount = cls.__new__(cls)
+        amount.wei = wei
+        amount.currency = currency
+        amount._formatted = None
+        return amount
+
+    @property
+    def value(self) -> Decimal:
+        units, remainder = divmod(self.wei, 10 ** self.currency.decimals)
+        if not remainder:
+            return Decimal(units)
+        return _WEI_CONTEXT.scaleb(Decimal(self.wei), -self.currency.decimals).normalize(
+            _WEI_CONTEXT
+        )
 
     @property
     def ticker(self) -> TokenTicker:
@@ -102,64 +122,71 @@ class CurrencyAmount(Generic[Eth_T]):
         return TokenTicker(ticker)
 
     @property
-    def formatted(self):
-        return self.currency.format_value(Decimal(self.as_wei))
+    def formatted(self) -> str:
+        if self._formatted is None:
+            self._formatted = self.currency.format_value(Decimal(self.wei))
+        return self._formatted
 
     @property
     def as_wei(self) -> Wei:
-        return Wei(self.value * (10 ** self.currency.decimals))
+        return Wei(self.wei)
 
     def __repr__(self):
         return f"{self.value} {self.ticker}"
 
-    def __add__(self, other):
-        if not self.currency == other.currency:
-            raise ValueError(f"Cannot add {self.formatted} and {other.formatted}")
+    def _check_currency(self, other, operation: str):
+        if other.currency is not self.currency and other.currency != self.currency:
+            raise ValueError(f"Cannot {operation} {self.formatted} and {other.formatted}")
 
-        return CurrencyAmount(Wei(self.as_wei + other.as_wei), self.currency)
+    def __add__(self, other):
+        self._check_currency(other, "add")
+        return self._from_wei(self.wei + other.wei, self.currency)
 
     def __sub__(self, other):
-        if not self.currency == other.currency:
-            raise ValueError(f"Cannot sub {self.formatted} and {other.formatted}")
-
-        return CurrencyAmount(Wei(self.as_wei - other.as_wei), self.currency)
+        self._check_currency(other, "sub")
+        return self._from_wei(self.wei - other.wei, self.currency)
 
     def __eq__(self, other):
-        return self.currency == other.currency and self.as_wei == other.as_wei
+        if not isinstance(other, CurrencyAmount):
+            return NotImplemented
+        return self.wei == other.wei and (
+            other.currency is self.currency or other.currency == self.currency
+        )
 
     def __lt__(self, other):
-        if not self.currency == other.currency:
-            raise ValueError(f"Cannot compare {self.currency} with {other.currency}")
-        return self.as_wei < other.as_wei
+        self._check_currency(other, "compare")
+        return self.wei < other.wei
 
     def __le__(self, other):
-        if not self.currency == other.currency:
-            raise ValueError(f"Cannot compare {self.currency} with {other.currency}")
-
-        return self.as_wei <= other.as_wei
+        self._check_currency(other, "compare")
+        return self.wei <= other.wei
 
     def __gt__(self, other):
-        if not self.currency == other.currency:
-            raise ValueError(f"Cannot compare {self.currency} with {other.currency}")
-        return self.as_wei > other.as_wei
+        self._check_currency(other, "compare")
+        return self.wei > other.wei
 
     def __ge__(self, other):
-        if not self.currency == other.currency:
-            raise ValueError(f"Cannot compare {self.currency} with {other.currency}")
-
-        return self.as_wei >= other.as_wei
+        self._check_currency(other, "compare")
+        return self.wei >= other.wei
 
 
 class TokenAmount(CurrencyAmount):
+    __slots__ = ()
+
     def __init__(self, value: Eth_T, currency: Erc20Token):
         super().__init__(value, currency)
-        self.address = currency.address
+
+    @property
+    def address(self) -> Address:
+        return self.currency.address
 
 
 ETH = Currency(ticker="ETH", wei_ticker="WEI")
 
 
 class EthereumAmount(CurrencyAmount):
+    __slots__ = ()
+
     def __init__(self, value: Eth_T):
         super().__init__(value, ETH)
 
@@ -250,7 +277,68 @@ class TokensV37(Enum):
     WIZ = _WizardToken
 
 
-@dataclass
+class TokenRegistry:
+    """ Every deployed token, indexed once by token list version, network and ticker
+
+    Token lists are chosen by the major and minor version of the contracts,
+    releases without a list of their own use ``Tokens``.
+    """
+
+    DEFAULT_VERSION = "default"
+
+    def __init__(self, token_lists: Dict[str, Type[Enum]], contracts_version: str):
+        tokens: Dict[Tuple[str, str, str], Erc20Token] = {}
+        tokens_by_address: Dict[Tuple[str, str, Address], Erc20Token] = {}
+        for version, token_list in token_lists.items():
+            for ticker, member in token_list.__members__.items():
+                token_data = member.value
+                for network_name, address in token_data.addresses.items():
+                    token = Erc20Token(
+                        ticker=token_data.ticker,
+                        wei_ticker=token_data.wei_ticker,
+                        address=to_canonical_address(address),
+                    )
+                    tokens[(version, network_name, ticker)] = token
+                    tokens_by_address[(version, network_name, token.address)] = token
+
+        self._tokens: Mapping[Tuple[str, str, str], Erc20Token] = MappingProxyType(tokens)
+        self._tokens_by_address: Mapping[Tuple[str, str, Address], Erc20Token] = (
+            MappingProxyType(tokens_by_address)
+        )
+        major, minor, _ = contracts_version.split(".", 2)
+        version = f"{major}.{minor}"
+        self.version = version if version in token_lists else self.DEFAULT_VERSION
+
+    def get(self, ticker: str, network_name: str, version: Optional[str] = None) -> Erc20Token:
+        try:
+            return self._tokens[(version or self.version, network_name, ticker)]
+        except KeyError as exc:
+            raise TokenError(f"{ticker} is not deployed on {network_name}") from exc
+
+    def get_by_address(
+        self, address, network_name: str, version: Optional[str] = None
+    ) -> Erc20Token:
+        if not isinstance(address, bytes):
+            address = to_canonical_address(address)
+        try:
+            return self._tokens_by_address[(version or self.version, network_name, address)]
+        except KeyError as exc:
+            raise TokenError(f"No known token at {address.hex()} on {network_name}") from exc
+
+
+TOKEN_REGISTRY = TokenRegistry(
+    {
+        "0.25": TokensV25,
+        "0.33": TokensV33,
+        "0.36": TokensV36,
+        "0.37": TokensV37,
+        TokenRegistry.DEFAULT_VERSION: Tokens,
+    },
+    CONTRACTS_VERSION,
+)
+
+
+@dataclass(frozen=True)
 class RequiredAmounts:
     eth: EthereumAmount
     eth_after_swap: EthereumAmount
@@ -258,6 +346,7 @@ class RequiredAmounts:
     transfer_token: TokenAmount
 
     @staticmethod
+    @lru_cache()
     def from_settings(settings):
         return RequiredAmounts(
             eth=EthereumAmount(Wei(settings.ethereum_amount_required)),
@@ -273,12 +362,13 @@ class RequiredAmounts:
         )
 
 
-@dataclass
+@dataclass(frozen=True)
 class SwapAmounts:
     service_token: TokenAmount
     transfer_token: TokenAmount
 
     @staticmethod
+    @lru_cache()
     def from_settings(settings):
         return SwapAmounts(
             service_token=TokenAmount(
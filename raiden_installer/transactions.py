@@ -1,10 +1,17 @@
+from dataclasses import dataclass
+from typing import Optional
+
 from eth_utils import to_canonical_address, to_checksum_address
 from web3 import Web3
+from web3.types import BlockIdentifier
 
 from raiden_contracts.constants import CONTRACT_CUSTOM_TOKEN, CONTRACT_USER_DEPOSIT
 from raiden_contracts.contract_manager import ContractManager, contracts_precompiled_path
+from raiden_installer import multicall
 from raiden_installer.account import Account
-from raiden_installer.tokens import Erc20Token, TokenAmount, Wei
+from raiden_installer.ethereum_rpc import batch_requests
+from raiden_installer.network import get_chain_context
+from raiden_installer.tokens import Erc20Token, EthereumAmount, TokenAmount, Wei
 from raiden_installer.utils import get_contract_address, send_raw_transaction, wait_for_transaction
 
 EIP20_ABI = ContractManager(contracts_precompiled_path()).get_contract_abi("StandardToken")
@@ -14,22 +21,26 @@ GAS_REQUIRED_FOR_APPROVE: int = 70_000
 GAS_REQUIRED_FOR_MINT: int = 100_000
 
 
-def _make_deposit_proxy(w3: Web3, token: Erc20Token):
+def _make_unchecked_deposit_proxy(w3: Web3, chain_id: int):
     contract_manager = ContractManager(contracts_precompiled_path())
-    contract_address = to_canonical_address(
-        get_contract_address(w3.eth.chainId, CONTRACT_USER_DEPOSIT)
-    )
-    proxy = w3.eth.contract(
+    contract_address = to_canonical_address(get_contract_address(chain_id, CONTRACT_USER_DEPOSIT))
+    return w3.eth.contract(
         address=contract_address, abi=contract_manager.get_contract_abi(CONTRACT_USER_DEPOSIT)
     )
 
-    service_token_address = to_canonical_address(proxy.functions.token().call())
 
+def _check_deposit_token(service_token_address, token: Erc20Token):
     if service_token_address != token.address:
         raise ValueError(
             f"{token.ticker} is at {to_checksum_address(token.address)}, "
             f"expected {service_token_address}"
         )
+
+
+def _make_deposit_proxy(w3: Web3, token: Erc20Token):
+    proxy = _make_unchecked_deposit_proxy(w3, get_chain_context(w3).chain_id)
+    service_token_address = to_canonical_address(proxy.functions.token().call())
+    _check_deposit_token(service_token_address, token)
     return proxy
 
 
@@ -111,3 +122,119 @@ def get_token_deposit(w3: Web3, account: Account, token: Erc20Token) -> TokenAmo
 
 def get_total_token_owned(w3: Web3, account: Account, token: Erc20Token) -> TokenAmount:
     return get_token_balance(w3, account, token) + get_token_deposit(w3, account, token)
+
+
+@dataclass(frozen=True)
+class AccountSnapshot:
+    """ Balances of an account, all read at the same block """
+
+    block_number: int
+    ethereum_balance: EthereumAmount
+    service_token_balance: TokenAmount
+    service_token_deposit: TokenAmount
+    service_token_total_deposit: TokenAmount
+    service_token_allowance: TokenAmount
+    transfer_token_balance: TokenAmount
+
+    @property
+    def total_service_token_owned(self) -> TokenAmount:
+        return self.service_token_balance + self.service_token_deposit
+
+    def get_token_balance(self, token: Erc20Token) -> TokenAmount:
+        if token.address == self.service_token_balance.address:
+            return self.service_token_balance
+        if token.address == self.transfer_token_balance.address:
+            return self.transfer_token_balance
+        raise ValueError(f"{token.ticker} is not part of the account snapshot")
+
+
+def get_account_snapshot(
+    w3: Web3,
+    account: Account,
+    service_token: Erc20Token,
+    transfer_token: Erc20Token,
+    block_identifier: Optional[BlockIdentifier] = None,
+) -> AccountSnapshot:
+    """ Read all balances of ``account`` at one block
+
+    All reads are aggregated into a single ``eth_call`` to the Multicall
+    contract. On chains without a Multicall deployment the reads are sent as
+    one JSON-RPC batch, pinned to the same block number.
+    """
+    chain_id = get_chain_context(w3).chain_id
+    deposit_proxy = _make_unchecked_deposit_proxy(w3, chain_id)
+    service_token_proxy = _make_token_proxy(w3, service_token)
+    transfer_token_proxy = _make_token_proxy(w3, transfer_token)
+    multicall_proxy = multicall.get_multicall_proxy(w3, chain_id)
+
+    if multicall_proxy:
+        calls = [
+            multicall.make_call(multicall_proxy, "getEthBalance", account.address),
+            multicall.make_call(service_token_proxy, "balanceOf", account.address),
+            multicall.make_call(deposit_proxy, "token"),
+            multicall.make_call(deposit_proxy, "effectiveBalance", account.address),
+            multicall.make_call(deposit_proxy, "total_deposit", account.address),
+            multicall.make_call(
+                service_token_proxy, "allowance", account.address, deposit_proxy.address
+            ),
+            multicall.make_call(transfer_token_proxy, "balanceOf", account.address),
+        ]
+        block_number, results = multicall.aggregate(
+            w3, multicall_proxy, calls, block_identifier=block_identifier or "latest"
+        )
+        values = [result[0] for result in results]
+    else:
+        if isinstance(block_identifier, int):
+            block_number = block_identifier
+        else:
+            block_number = w3.eth.getBlock(block_identifier or "latest")["number"]
+
+        with batch_requests(w3) as batch:
+            calls = [
+                batch.call(w3.eth.getBalance, account.address, block_number),
+                batch.call(
+                    service_token_proxy.functions.balanceOf(account.address).call,
+                    block_identifier=block_number,
+                ),
+                batch.call(deposit_proxy.functions.token().call, block_identifier=block_number),
+                batch.call(
+                    deposit_proxy.functions.effectiveBalance(account.address).call,
+                    block_identifier=block_number,
+                ),
+                batch.call(
+                    deposit_proxy.functions.total_deposit(account.address).call,
+                    block_identifier=block_number,
+                ),
+                batch.call(
+                    service_token_proxy.functions.allowance(
+                        account.address, deposit_proxy.address
+                    ).call,
+                    block_identifier=block_number,
+                ),
+                batch.call(
+                    transfer_token_proxy.functions.balanceOf(account.address).call,
+                    block_identifier=block_number,
+                ),
+            ]
+        values = [call.result() for call in calls]
+
+    (
+        ethereum_balance,
+        service_token_balance,
+        deposit_token_address,
+        service_token_deposit,
+        service_token_total_deposit,
+        service_token_allowance,
+        transfer_token_balance,
+    ) = values
+    _check_deposit_token(to_canonical_address(deposit_token_address), service_token)
+
+    return AccountSnapshot(
+        block_number=block_number,
+        ethereum_balance=EthereumAmount(Wei(ethereum_balance)),
+        service_token_balance=TokenAmount(Wei(service_token_balance), service_token),
+        service_token_deposit=TokenAmount(Wei(service_token_deposit), service_token),
+        service_token_total_deposit=TokenAmount(Wei(service_token_total_deposit), service_token),
+        service_token_allowance=TokenAmount(Wei(service_token_allowance), service_token),
+        transfer_token_balance=TokenAmount(Wei(transfer_token_balance), transfer_token),
+    )
@@ -0,0 +1,192 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+from eth_typing import Address
+from eth_utils import encode_hex, to_canonical_address
+from web3 import Web3
+
+from raiden_installer.constants import NULL_ADDRESS
+from raiden_installer.exchange_metadata import EXCHANGE_METADATA
+from raiden_installer.uniswap.web3 import contracts as uniswap_contracts
+
+# Uniswap V2 charges 0.3% on the input amount
+FEE_DENOMINATOR = 1000
+FEE_FACTOR = 997
+
+
+class UniswapError(Exception):
+    pass
+
+
+def sort_tokens(token_a: Address, token_b: Address) -> Tuple[Address, Address]:
+    """ Same order as ``UniswapV2Library.sortTokens``, which defines token0 of a pair """
+    if token_a == token_b:
+        raise UniswapError("Identical addresses")
+    return (token_a, token_b) if token_a < token_b else (token_b, token_a)
+
+
+def get_amount_in(amount_out: int, reserve_in: int, reserve_out: int) -> int:
+    """ Input needed to get ``amount_out``, as ``UniswapV2Library.getAmountIn`` computes it """
+    if amount_out <= 0:
+        raise UniswapError("Insufficient output amount")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise UniswapError("Insufficient liquidity")
+    if amount_out >= reserve_out:
+        # The contract reverts with a subtraction underflow
+        raise UniswapError("Insufficient liquidity")
+
+    numerator = reserve_in * amount_out * FEE_DENOMINATOR
+    denominator = (reserve_out - amount_out) * FEE_FACTOR
+    return numerator // denominator + 1
+
+
+def get_amount_out(amount_in: int, reserve_in: int, reserve_out: int) -> int:
+    """ Output for ``amount_in``, as ``UniswapV2Library.getAmountOut`` computes it """
+    if amount_in <= 0:
+        raise UniswapError("Insufficient input amount")
+    if reserve_in <= 0 or reserve_out <= 0:
+        raise UniswapError("Insufficient liquidity")
+
+    amount_in_with_fee = amount_in * FEE_FACTOR
+    numerator = amount_in_with_fee * reserve_out
+    denominator = reserve_in * FEE_DENOMINATOR + amount_in_with_fee
+    return numerator // denominator
+
+
+@dataclass(frozen=True)
+class PairReserves:
+    block_number: int
+    token0: Address
+    reserve0: int
+    reserve1: int
+
+    def get_reserves(self, token_in: Address) -> Tuple[int, int]:
+        """ Reserves of the input and output side for a swap selling ``token_in`` """
+        if token_in == self.token0:
+            return self.reserve0, self.reserve1
+        return self.reserve1, self.reserve0
+
+
+class UniswapPairs:
+    """ Pair addresses and reserve snapshots, shared by all Uniswap exchanges
+
+    Pairs can't be moved or removed, so their addresses are kept in the
+    exchange metadata cache for good. Reserves are read once per pair and block; quotes
+    for any amount are then computed locally with the same integer math as
+    the router.
+    """
+
+    def __init__(self):
+        self._reserves: Dict[Tuple[int, Address], PairReserves] = {}
+        # Reads in flight, so concurrent quotes wait for them instead of reading again
+        self._reading: Dict[Tuple[int, Address, int], threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def get_router_addresses(self, chain_id: int, router_proxy) -> Tuple[Address, Address]:
+        """ WETH and factory addresses of a router, both fixed at its deployment """
+
+        def fetch():
+            return [router_proxy.functions.WETH().call(), router_proxy.functions.factory().call()]
+
+        weth_address, factory_address = EXCHANGE_METADATA.get(
+            chain_id, f"uniswap:{router_proxy.address}", fetch
+        )
+        return to_canonical_address(weth_address), to_canonical_address(factory_address)
+
+    def get_pair_address(
+        self, w3: Web3, chain_id: int, factory_address: Address, token_a: Address, token_b: Address
+    ) -> Address:
+        """ Address of the pair, ``NULL_ADDRESS`` if nobody created it yet """
+        token0, token1 = sort_tokens(token_a, token_b)
+        key = f"uniswap:{encode_hex(factory_address)}:{encode_hex(token0)}:{encode_hex(token1)}"
+        pair_address = EXCHANGE_METADATA.lookup(chain_id, key)
+        if pair_address is None:
+            factory_proxy = w3.eth.contract(
+                abi=uniswap_contracts.UNISWAP_FACTORY_ABI, address=factory_address
+            )
+            pair_address = to_canonical_address(
+                factory_proxy.functions.getPair(token0, token1).call()
+            )
+            # A missing pair may still be created, so only existing ones are kept
+            if pair_address == NULL_ADDRESS:
+                return pair_address
+            EXCHANGE_METADATA.set(chain_id, key, encode_hex(pair_address))
+            return pair_address
+        return to_canonical_address(pair_address)
+
+    def get_pair_reserves(
+        self,
+        w3: Web3,
+        chain_id: int,
+        factory_address: Address,
+        token_a: Address,
+        token_b: Address,
+        block_number: int,
+    ) -> PairReserves:
+        pair_address = self.get_pair_address(w3, chain_id, factory_address, token_a, token_b)
+        if pair_address == NULL_ADDRESS:
+            raise UniswapError("No Uniswap pair for the tokens")
+
+        key = (chain_id, pair_address)
+        while True:
+            with self._lock:
+                reserves = self._reserves.get(key)
+                if reserves is not None and reserves.block_number == block_number:
+                    return reserves
+                reading = self._reading.get((*key, block_number))
+                if reading is None:
+                    reading = self._reading[(*key, block_number)] = threading.Event()
+                    break
+            # Check again once the other read is done, it may have failed
+            reading.wait()
+
+        try:
+            pair_proxy = w3.eth.contract(
+                abi=uniswap_contracts.UNISWAP_PAIR_ABI, address=pair_address
+            )
+            reserve0, reserve1, _ = pair_proxy.functions.getReserves().call(
+                block_identifier=block_number
+            )
+            reserves = PairReserves(
+                block_number=block_number,
+                token0=sort_tokens(token_a, token_b)[0],
+                reserve0=reserve0,
+                reserve1=reserve1,
+            )
+            with self._lock:
+                current = self._reserves.get(key)
+                if current is None or current.block_number <= block_number:
+                    self._reserves[key] = reserves
+            return reserves
+        finally:
+            with self._lock:
+                del self._reading[(*key, block_number)]
+            reading.set()
+
+    def get_amounts_in(
+        self,
+        w3: Web3,
+        chain_id: int,
+        factory_address: Address,
+        amount_out: int,
+        path: Sequence[Address],
+        block_number: int,
+    ) -> List[int]:
+        """ Local equivalent of the router's ``getAmountsIn`` at ``block_number`` """
+        if len(path) < 2:
+            raise UniswapError("Invalid path")
+
+        amounts = [0] * len(path)
+        amounts[-1] = amount_out
+        for index in range(len(path) - 1, 0, -1):
+            token_in, token_out = path[index - 1], path[index]
+            reserves = self.get_pair_reserves(
+                w3, chain_id, factory_address, token_in, token_out, block_number
+            )
+            reserve_in, reserve_out = reserves.get_reserves(token_in)
+            amounts[index - 1] = get_amount_in(amounts[index], reserve_in, reserve_out)
+        return amounts
+
+
+UNISWAP_PAIRS = UniswapPairs()
@@ -1,16 +1,15 @@
-import math
 import os
-import time
 
 import requests
 from eth_typing import Address
 from eth_utils import to_canonical_address, to_checksum_address
 from web3 import Web3
-from web3.exceptions import TransactionNotFound
 
 from raiden_contracts.contract_manager import get_contracts_deployment_info
 from raiden_installer import log
-from raiden_installer.constants import REQUIRED_BLOCK_CONFIRMATIONS, WEB3_TIMEOUT
+from raiden_installer.constants import WEB3_TIMEOUT
+from raiden_installer.head_watcher import get_head_watcher, transaction_confirmed
+from raiden_installer.network import get_chain_context
 from raiden_installer.tokens import EthereumAmount, Wei
 
 
@@ -44,10 +43,9 @@ def get_contract_address(chain_id, contract_name) -> Address:
 
 
 def estimate_gas(w3, account, contract_function, *args, **kw):
-    transaction_params = {
-        "chainId": w3.eth.chainId,
-        "nonce": w3.eth.getTransactionCount(account.address, "pending"),
-    }
+    transaction_params = {"chainId": get_chain_context(w3).chain_id}
+    if "nonce" not in kw:
+        transaction_params["nonce"] = w3.eth.getTransactionCount(account.address, "pending")
     transaction_params.update(**kw)
     result = contract_function(*args)
     transaction = result.buildTransaction(transaction_params)
@@ -56,7 +54,7 @@ def estimate_gas(w3, account, contract_function, *args, **kw):
 
 def send_raw_transaction(w3, account, contract_function, *args, **kw):
     transaction_params = {
-        "chainId": w3.eth.chainId,
+        "chainId": get_chain_context(w3).chain_id,
         "nonce": w3.eth.getTransactionCount(account.address, "pending"),
         "gasPrice": kw.pop("gas_price", (w3.eth.generateGasPrice())),
         "gas": kw.pop("gas", None),
@@ -85,23 +83,14 @@ def send_raw_transaction(w3, account, contract_function, *args, **kw):
 
 def wait_for_transaction(w3: Web3, transaction_hash) -> None:
     log.debug("wait for block with transaction to be fetched")
-    time_start = time.time()
-    block_with_transaction = math.inf
-    current_block = w3.eth.blockNumber
-
-    while current_block < block_with_transaction + REQUIRED_BLOCK_CONFIRMATIONS:
-        if time.time() - time_start >= WEB3_TIMEOUT:
-            raise TransactionTimeoutError(
-                f"Tx with hash {transaction_hash} was not found after {WEB3_TIMEOUT} seconds"
-            )
-        try:
-            tx_receipt = w3.eth.getTransactionReceipt(transaction_hash)
-            block_with_transaction = tx_receipt["blockNumber"]
-        except TransactionNotFound:
-            pass
-
-        current_block = w3.eth.blockNumber
-        time.sleep(1)
+    try:
+        get_head_watcher(w3).wait_until(
+            transaction_confirmed(w3, transaction_hash), timeout=WEB3_TIMEOUT
+        )
+    except TimeoutError:
+        raise TransactionTimeoutError(
+            f"Tx with hash {transaction_hash} was not found after {WEB3_TIMEOUT} seconds"
+        )
 
 
 def check_eth_node_responsivity(url):
@@ -1,5 +1,4 @@
 import json
-import sys
 import time
 
 import wtforms
@@ -11,7 +10,8 @@ from wtforms_tornado import Form
 from raiden_installer import log
 from raiden_installer.base import RaidenConfigurationFile
 from raiden_installer.constants import WEB3_TIMEOUT
-from raiden_installer.ethereum_rpc import make_web3_provider
+from raiden_installer.ethereum_rpc import get_web3_provider
+from raiden_installer.executors import FILE_IO, RPC, run_blocking
 from raiden_installer.network import Network
 from raiden_installer.shared_handlers import (
     APIHandler,
@@ -22,20 +22,18 @@ from raiden_installer.shared_handlers import (
     run_server,
     try_unlock,
 )
-from raiden_installer.token_exchange import Exchange, ExchangeError, Kyber, Uniswap
+from raiden_installer.tasks import raise_if_cancelled
+from raiden_installer.token_exchange import Exchange, ExchangeError, get_quotes
 from raiden_installer.tokens import (
     Erc20Token,
     EthereumAmount,
     RequiredAmounts,
     SwapAmounts,
     TokenAmount,
+    TokenError,
     Wei,
 )
-from raiden_installer.transactions import (
-    get_token_balance,
-    get_token_deposit,
-    get_total_token_owned,
-)
+from raiden_installer.transactions import get_account_snapshot
 from raiden_installer.utils import TransactionTimeoutError, wait_for_transaction
 
 SETTINGS = "mainnet"
@@ -68,14 +66,14 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
         icon = kw.get("icon")
         if icon:
             message["icon"] = icon
-        self.write_message(message)
+        self._write_message(message)
         log.info(" ".join(text))
 
     def _send_txhash_message(self, text, tx_hash):
         if not isinstance(text, list):
             text = [text]
         message = {"type": "hash", "text": text, "tx_hash": tx_hash}
-        self.write_message(message)
+        self._write_message(message)
         log.info(f"{''.join(text)} {tx_hash}")
 
     def _run_swap(self, **kw):
@@ -103,7 +101,7 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
             if form.validate():
                 account = configuration_file.account
                 try_unlock(account)
-                w3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+                w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
                 token = Erc20Token.find_by_ticker(form.data["token_ticker"], network_name)
 
                 token_amount = TokenAmount(Wei(form.data["token_amount"]), token)
@@ -131,26 +129,24 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
                 )
                 self._send_status_update(f"Trying to acquire {token_amount} at this rate")
 
+                raise_if_cancelled()
                 tx_hash = exchange.buy_tokens(account, token_amount, costs)
                 wait_for_transaction(w3, tx_hash)
 
-                token_balance = get_token_balance(w3, account, token)
-                balance_after_swap = account.get_ethereum_balance(w3)
-                actual_total_costs = balance_before_swap - balance_after_swap
+                required = RequiredAmounts.from_settings(self.installer_settings)
+                service_token = required.service_token.currency
+                transfer_token = required.transfer_token.currency
+
+                snapshot = get_account_snapshot(w3, account, service_token, transfer_token)
+                token_balance = snapshot.get_token_balance(token)
+                actual_total_costs = balance_before_swap - snapshot.ethereum_balance
 
                 self._send_status_update(f"Swap complete. {token_balance.formatted} available")
                 self._send_status_update(f"Actual costs: {actual_total_costs}")
 
-                required = RequiredAmounts.from_settings(self.installer_settings)
-                service_token = Erc20Token.find_by_ticker(
-                    required.service_token.ticker, network_name
-                )
-                service_token_balance = get_token_balance(w3, account, service_token)
-                total_service_token_balance = get_total_token_owned(w3, account, service_token)
-                transfer_token = Erc20Token.find_by_ticker(
-                    required.transfer_token.ticker, network_name
-                )
-                transfer_token_balance = get_token_balance(w3, account, transfer_token)
+                service_token_balance = snapshot.service_token_balance
+                total_service_token_balance = snapshot.total_service_token_owned
+                transfer_token_balance = snapshot.transfer_token_balance
 
                 if total_service_token_balance < required.service_token:
                     raise ExchangeError("Exchange was not successful")
@@ -179,15 +175,13 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
         self._send_summary(
             ["Congratulations! Swap Successful!", next_page], icon=token_ticker
         )
-        time.sleep(5)
-        self._send_redirect(redirect_url)
+        self._call_later(5, self._send_redirect, redirect_url)
 
     def _redirect_after_swap_error(self, exc, configuration_file_name, token_ticker):
         next_page = f"Try again to exchange {token_ticker}..."
         self._send_summary(["Transaction failed", str(exc), next_page], icon="error")
-        time.sleep(5)
         redirect_url = self.reverse_url("swap", configuration_file_name, token_ticker)
-        self._send_redirect(redirect_url)
+        self._call_later(5, self._send_redirect, redirect_url)
 
     def _run_udc_deposit(self, **kw):
         try:
@@ -201,15 +195,15 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
             settings = self.installer_settings
             required = RequiredAmounts.from_settings(settings)
             swap_amounts = SwapAmounts.from_settings(settings)
-            service_token = Erc20Token.find_by_ticker(
-                required.service_token.ticker, settings.network
-            )
+            service_token = required.service_token.currency
             account = configuration_file.account
             try_unlock(account)
-            w3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+            w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
 
-            service_token_balance = get_token_balance(w3, account, service_token)
-            service_token_deposited = get_token_deposit(w3, account, service_token)
+            transfer_token = required.transfer_token.currency
+            snapshot = get_account_snapshot(w3, account, service_token, transfer_token)
+            service_token_balance = snapshot.service_token_balance
+            service_token_deposited = snapshot.service_token_deposit
 
             if service_token_deposited < required.service_token:
                 swap_amount = swap_amounts.service_token
@@ -225,12 +219,9 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
                     f"Service token deposited at UDC: {service_token_deposited.formatted} is enough"
                 )
 
-            time.sleep(5)
-            transfer_token = Erc20Token.find_by_ticker(
-                required.transfer_token.ticker, settings.network
+            self._redirect_transfer_swap(
+                configuration_file, snapshot.transfer_token_balance, required
             )
-            transfer_token_balance = get_token_balance(w3, account, transfer_token)
-            self._redirect_transfer_swap(configuration_file, transfer_token_balance, required)
 
         except (json.decoder.JSONDecodeError, KeyError, ExchangeError, ValueError) as exc:
             self._redirect_after_swap_error(
@@ -249,7 +240,7 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
         configuration_file._initial_funding_txhash = tx_hash
         configuration_file.save()
         account = configuration_file.account
-        w3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+        w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
         self._send_txhash_message(["Waiting for confirmation of transaction"], tx_hash=tx_hash)
 
         try:
@@ -264,8 +255,10 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
                 "once it was confirmed:",
                 tx_hash=tx_hash,
             )
-            time.sleep(10)
-            sys.exit(1)
+            self._send_error_message(f"Funding transaction {tx_hash} was not confirmed in time")
+            # The wizard has to be restarted, give the page time to show the link first
+            self._call_later(10, self.io_loop.stop)
+            return
         else:
             configuration_file._initial_funding_txhash = None
             configuration_file.save()
@@ -278,8 +271,10 @@ class MainAsyncTaskHandler(AsyncTaskHandler):
 
 
 class SwapHandler(BaseRequestHandler):
-    def get(self, configuration_file_name, token_ticker):
-        configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
+    async def get(self, configuration_file_name, token_ticker):
+        configuration_file = await run_blocking(
+            FILE_IO, RaidenConfigurationFile.get_by_filename, configuration_file_name
+        )
         if get_passphrase() is None:
             self.render(
                 "account_unlock.html",
@@ -288,11 +283,6 @@ class SwapHandler(BaseRequestHandler):
             )
             return
 
-        w3 = make_web3_provider(
-            configuration_file.ethereum_client_rpc_endpoint, configuration_file.account
-        )
-        kyber = Kyber(w3=w3)
-        uniswap = Uniswap(w3=w3)
         token = Erc20Token.find_by_ticker(token_ticker, configuration_file.network.name)
 
         swap_amounts = SwapAmounts.from_settings(self.installer_settings)
@@ -304,51 +294,52 @@ class SwapHandler(BaseRequestHandler):
         self.render(
             "swap.html",
             configuration_file=configuration_file,
-            kyber=kyber,
-            uniswap=uniswap,
             token=token,
             swap_amount=swap_amount,
         )
 
 
-class CostEstimationAPIHandler(APIHandler):
-    def post(self, configuration_file_name):
+class QuotesAPIHandler(APIHandler):
+    async def post(self, configuration_file_name):
+        try:
+            request_data = json_decode(self.request.body)
+            self.render_json(
+                await run_blocking(RPC, self._get_quotes, configuration_file_name, request_data)
+            )
+        except (
+            json.decoder.JSONDecodeError,
+            KeyError,
+            TypeError,
+            ValueError,
+            ExchangeError,
+            TokenError,
+        ) as exc:
+            log.error("Could not get quotes for the exchange", exc_info=exc)
+            self.set_status(status_code=409, reason=" ".join(str(exc).split()))
+
+    def _get_quotes(self, configuration_file_name, request_data):
         configuration_file = RaidenConfigurationFile.get_by_filename(configuration_file_name)
         account = configuration_file.account
         try_unlock(account)
-        w3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
-        ex_currency_amt = json_decode(self.request.body)
+        w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
         currency = Erc20Token.find_by_ticker(
-            ex_currency_amt["currency"], configuration_file.network.name
+            request_data["currency"], configuration_file.network.name
         )
-        token_amount = TokenAmount(ex_currency_amt["target_amount"], currency)
-        try:
-            exchange = Exchange.get_by_name(ex_currency_amt["exchange"])(w3=w3)
-            exchange_costs = exchange.calculate_transaction_costs(token_amount, account)
-            total_cost = exchange_costs["total"]
-            self.render_json(
-                {
-                    "exchange": exchange.name,
-                    "currency": currency.ticker,
-                    "target_amount": ex_currency_amt["target_amount"],
-                    "as_wei": total_cost.as_wei,
-                    "formatted": total_cost.formatted,
-                    "utc_seconds": int(time.time()),
-                }
-            )
-        except ExchangeError as ex:
-            log.error("There was an error preparing the exchange", exc_info=ex)
-            self.set_status(
-                status_code=409,
-                reason=str(ex),
-            )
+        token_amount = TokenAmount(request_data["target_amount"], currency)
+        quotes = get_quotes(w3, token_amount, account)
+        return {
+            "currency": currency.ticker,
+            "target_amount": request_data["target_amount"],
+            "quotes": [quote.to_dict() for quote in quotes],
+            "utc_seconds": int(time.time()),
+        }
 
 
 def get_app() -> Application:
     additional_handlers = [
         url(r"/swap/(.*)/([A-Z]{3})", SwapHandler, name="swap"),
         url(r"/ws", MainAsyncTaskHandler, name="websocket"),
-        url(r"/api/cost-estimation/(.*)", CostEstimationAPIHandler, name="api-cost-detail")
+        url(r"/api/quotes/(.*)", QuotesAPIHandler, name="api-quotes"),
     ]
     return create_app(SETTINGS, additional_handlers)
 
@@ -5,8 +5,9 @@ from tornado.web import Application, url
 
 from raiden_installer import log
 from raiden_installer.base import RaidenConfigurationFile
-from raiden_installer.ethereum_rpc import make_web3_provider
+from raiden_installer.ethereum_rpc import get_web3_provider
 from raiden_installer.shared_handlers import AsyncTaskHandler, create_app, run_server, try_unlock
+from raiden_installer.tasks import raise_if_cancelled
 from raiden_installer.tokens import Erc20Token, EthereumAmount
 from raiden_installer.transactions import get_token_balance, mint_tokens
 from raiden_installer.utils import wait_for_transaction
@@ -25,7 +26,7 @@ class TestnetAsyncTaskHandler(AsyncTaskHandler):
         if not isinstance(message_text, list):
             message_text = [message_text]
         body = {"type": "next-step", "text": message_text, "title": title, "step": step}
-        self.write_message(json.dumps(body))
+        self._write_message(json.dumps(body))
         log.info(" ".join(message_text))
         log.info(f"Update progress to step {step}: {title}")
 
@@ -50,8 +51,9 @@ class TestnetAsyncTaskHandler(AsyncTaskHandler):
             self._send_error_message("Failed to unlock account! Please reload page")
             return
 
-        w3 = make_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
+        w3 = get_web3_provider(configuration_file.ethereum_client_rpc_endpoint, account)
         self._send_status_update(f"Obtaining {network.capitalized_name} ETH through faucet")
+        raise_if_cancelled()
         network.fund(account)
         balance = account.wait_for_ethereum_funds(w3=w3, expected_amount=EthereumAmount(0.01))
         self._send_status_update(f"Account funded with {balance.formatted}")
@@ -66,6 +68,7 @@ class TestnetAsyncTaskHandler(AsyncTaskHandler):
                 f"Fund Account with {service_token.ticker}",
                 3,
             )
+            raise_if_cancelled()
             tx_hash = mint_tokens(w3, account, service_token)
             wait_for_transaction(w3, tx_hash)
 
@@ -82,6 +85,7 @@ class TestnetAsyncTaskHandler(AsyncTaskHandler):
                 f"Fund Account with {transfer_token.ticker}",
                 4,
             )
+            raise_if_cancelled()
             tx_hash = mint_tokens(w3, account, transfer_token)
             wait_for_transaction(w3, tx_hash)
 
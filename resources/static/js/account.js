@@ -128,15 +128,7 @@ function showDownloadButton(callback) {
   }
 }
 
-async function poll() {
-  let balance = await getBalances(CONFIGURATION_DETAIL_URL);
-  let config = await getConfigurationFileData(CONFIGURATION_DETAIL_URL);
-  if (!balance.ETH.as_wei && config._initial_funding_txhash) {
-    return trackTransaction(
-      config._initial_funding_txhash,
-      CONFIGURATION_FILE_NAME
-    );
-  }
+function onBalanceUpdate(balance) {
   if (balance.ETH.as_wei) {
     sendEthButtonlogic(balance);
   } else {
@@ -146,14 +138,21 @@ async function poll() {
   }
 }
 
-function main() {
-  poll();
+async function main() {
+  let config = await getConfigurationFileData(CONFIGURATION_DETAIL_URL);
+  if (!config.balance.ETH.as_wei && config._initial_funding_txhash) {
+    return trackTransaction(
+      config._initial_funding_txhash,
+      CONFIGURATION_FILE_NAME
+    );
+  }
+  onBalanceUpdate(config.balance);
+  subscribeBalances(CONFIGURATION_FILE_NAME, onBalanceUpdate);
 }
 
 window.addEventListener("DOMContentLoaded", function () {
   setProgressStep(2, "Fund Account with ETH");
   if (FAUCET_AVAILABLE !== "True") {
-    window.MAIN_VIEW_INTERVAL = 10000;
     window.runMainView();
   } else {
     showDownloadButton(() => {
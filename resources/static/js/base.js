@@ -8,6 +8,8 @@ const CHAIN_ID_MAPPING = {
 
 var MAIN_VIEW_INTERVAL;
 var RUNNING_TIMERS = new Array();
+var BACKGROUND_TASKS = {};
+var BALANCE_LISTENER = null;
 
 let video;
 
@@ -60,16 +62,37 @@ function runMainView() {
 }
 
 function stopMainView() {
+  unsubscribeBalances();
   while (RUNNING_TIMERS.length) {
     let timer = RUNNING_TIMERS.pop();
     clearInterval(timer);
   }
 }
 
-async function getSwapEstimatedCosts(api_cost_estimation_url) {
-  let request = await fetch(api_cost_estimation_url);
-  let response_data = await request.json();
-  return response_data;
+function sendWhenConnected(message) {
+  if (WEBSOCKET.readyState === WebSocket.OPEN) {
+    WEBSOCKET.send(JSON.stringify(message));
+  } else {
+    WEBSOCKET.addEventListener("open", function () {
+      WEBSOCKET.send(JSON.stringify(message));
+    });
+  }
+}
+
+function subscribeBalances(configuration_file_name, listener) {
+  // The server pushes the current balances and then every change at a new block
+  BALANCE_LISTENER = listener;
+  sendWhenConnected({
+    method: "subscribe_balances",
+    configuration_file_name: configuration_file_name,
+  });
+}
+
+function unsubscribeBalances() {
+  if (BALANCE_LISTENER) {
+    BALANCE_LISTENER = null;
+    sendWhenConnected({ method: "unsubscribe_balances" });
+  }
 }
 
 async function getGasPrice(api_gas_price) {
@@ -186,6 +209,39 @@ function trackTransaction(tx_hash, configuration_file_name) {
   toggleView();
 }
 
+function updateBackgroundTask(task) {
+  BACKGROUND_TASKS[task.task_id] = task;
+}
+
+function queryBackgroundTasks(task_id) {
+  WEBSOCKET.send(JSON.stringify({ method: "task_status", task_id: task_id }));
+}
+
+function cancelBackgroundTask(task_id) {
+  WEBSOCKET.send(JSON.stringify({ method: "cancel_task", task_id: task_id }));
+}
+
+function updateSyncProgress(progress) {
+  let message_list_elem = document.querySelector(
+    "#background-task-tracker ul.messages"
+  );
+  let li = message_list_elem.querySelector("li.sync-progress");
+  if (!li) {
+    li = document.createElement("li");
+    li.classList.add("sync-progress");
+    message_list_elem.appendChild(li);
+  }
+
+  if (progress.status !== "syncing") {
+    li.textContent = "Waiting for the Raiden API to come up";
+    return;
+  }
+  li.textContent = `Synced ${progress.blocks_synced} blocks, ${progress.blocks_to_sync} to go`;
+  if (progress.eta !== null) {
+    li.textContent += ` (about ${Math.ceil(progress.eta / 60)} min left)`;
+  }
+}
+
 function resetSpinner() {
   let spinner_elem = document.querySelector(
     "#background-task-tracker div.task-status-icon"
@@ -230,13 +286,6 @@ async function getConfigurationFileData(configuration_file_url) {
   return await request.json();
 }
 
-async function getBalances(configuration_file_url) {
-  let configuration_file_data = await getConfigurationFileData(
-    configuration_file_url
-  );
-  return configuration_file_data && configuration_file_data.balance;
-}
-
 function updateBalanceDisplay(balance, opts) {
   let eth_balance_display = opts.ethereum_element;
   let service_token_display = opts.service_token_element;
@@ -279,6 +328,24 @@ function checkAcknowledgements(check_input_elems, next_action_elem, callback) {
 
 WEBSOCKET.onmessage = function (evt) {
   let message = JSON.parse(evt.data);
+
+  switch (message.type) {
+    case "task-status":
+      updateBackgroundTask(message);
+      return;
+    case "task-list":
+      message.tasks.forEach(updateBackgroundTask);
+      return;
+    case "balance-update":
+      if (BALANCE_LISTENER) {
+        BALANCE_LISTENER(message.balance);
+      }
+      return;
+    case "sync-progress":
+      updateSyncProgress(message);
+      return;
+  }
+
   let message_list_elem = document.querySelector(
     "#background-task-tracker ul.messages"
   );
@@ -1,7 +1,8 @@
-async function main() {
-  let balance = await getBalances(CONFIGURATION_DETAIL_URL);
-
-  document.querySelector(".spinner").remove();
+function updateChecklist(balance) {
+  let spinner = document.querySelector(".info-panel .spinner");
+  if (spinner) {
+    spinner.remove();
+  }
 
   let checklist_elem = document.querySelector("ul.checklist");
   let eth_balance_check_elem = checklist_elem.querySelector(
@@ -64,6 +65,10 @@ async function main() {
   btn_launch.disabled = !can_launch;
 }
 
+function main() {
+  subscribeBalances(CONFIGURATION_FILE_NAME, updateChecklist);
+}
+
 window.addEventListener("DOMContentLoaded", async function () {
   setProgressStep(5, "Launch Raiden");
   main();
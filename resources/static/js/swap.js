@@ -5,15 +5,32 @@ function validate() {
   submitButton.disabled = selectedExchange === "";
 }
 
-function requestCostEstimation(button) {
+function addEstimation(button) {
   const estimationElement = document.createElement("div");
   estimationElement.classList.add("estimation");
-  const placeholder = document.createTextNode(`Calculating costs...`);
-  estimationElement.appendChild(placeholder);
+  estimationElement.textContent = "Calculating costs...";
   button.appendChild(estimationElement);
+  return estimationElement;
+}
+
+function disableExchange(button, estimationElement) {
+  estimationElement.textContent = "Swap not possible at the moment.";
+
+  button.disabled = true;
+  if (selectedExchange === button.value) {
+    selectedExchange = "";
+  }
+  validate();
+}
+
+function addCostsToButtons() {
+  const exchangeButtons = document.querySelectorAll(".exchange-button");
+  const estimations = new Map();
+  exchangeButtons.forEach((button) =>
+    estimations.set(button.value, addEstimation(button))
+  );
 
   const data = JSON.stringify({
-    exchange: button.value,
     currency: TOKEN_TICKER,
     target_amount: SWAP_AMOUNT / 10 ** DECIMALS,
   });
@@ -21,37 +38,29 @@ function requestCostEstimation(button) {
   const req = new XMLHttpRequest();
 
   req.onload = function () {
+    const quotes = new Map();
     if (this.status == 200) {
-      const res = JSON.parse(this.response);
-      const text = document.createTextNode(
-        `Approximately ${res.formatted} as per exchange`
+      JSON.parse(this.response).quotes.forEach((quote) =>
+        quotes.set(quote.exchange.toLowerCase(), quote)
       );
-      placeholder.remove();
-      estimationElement.appendChild(text);
-    } else {
-      const error = document.createTextNode(`Swap not possible at the moment.`);
-      placeholder.remove();
-      estimationElement.appendChild(error);
+    }
 
-      button.disabled = true;
-      if (selectedExchange === button.value) {
-        selectedExchange = "";
+    exchangeButtons.forEach((button) => {
+      const quote = quotes.get(button.value);
+      const estimationElement = estimations.get(button.value);
+      if (quote && !quote.error) {
+        estimationElement.textContent = `Approximately ${quote.formatted} as per exchange`;
+      } else {
+        disableExchange(button, estimationElement);
       }
-      validate();
-    }
+    });
   };
 
-  req.open("POST", API_COST_ESTIMATION_ENDPOINT, true);
+  req.open("POST", API_QUOTES_ENDPOINT, true);
   req.setRequestHeader("Content-Type", "application/json");
   req.send(data);
 }
 
-function addCostsToButtons() {
-  const exchangeButtons = document.querySelectorAll(".exchange-button");
-
-  exchangeButtons.forEach((button) => requestCostEstimation(button, "kyber"));
-}
-
 function setupButtons() {
   const exchangeButtons = document.querySelectorAll(".exchange-button");
 
@@ -91,9 +100,7 @@ function setupSubmit() {
   });
 }
 
-async function skipSwap() {
-  let balance = await getBalances(CONFIGURATION_DETAIL_URL);
-
+function skipSwap(balance) {
   if (TOKEN_TICKER === "RDN" && hasEnoughServiceTokenToLaunchRaiden(balance)) {
     toggleView();
     WEBSOCKET.send(
@@ -117,7 +124,7 @@ async function skipSwap() {
 }
 
 function main() {
-  skipSwap();
+  subscribeBalances(CONFIGURATION_FILE_NAME, skipSwap);
 }
 
 window.addEventListener("DOMContentLoaded", function () {
@@ -131,6 +138,5 @@ window.addEventListener("DOMContentLoaded", function () {
   setupSubmit();
   addCostsToButtons();
 
-  window.MAIN_VIEW_INTERVAL = 5000;
   window.runMainView();
 });
@@ -15,8 +15,9 @@ from raiden_installer.ethereum_rpc import Infura, make_web3_provider
 from raiden_installer.network import Network
 from raiden_installer.raiden import RaidenClient
 from raiden_installer.shared_handlers import get_passphrase, set_passphrase
+from raiden_installer.token_exchange import ExchangeError
 from raiden_installer.tokens import ETH, Erc20Token, EthereumAmount, TokenAmount, Wei
-from raiden_installer.transactions import get_token_balance, get_token_deposit
+from raiden_installer.transactions import AccountSnapshot, get_token_balance, get_token_deposit
 from raiden_installer.utils import TransactionTimeoutError
 from raiden_installer.web import get_app
 from raiden_installer.web_testnet import get_app as get_app_testnet
@@ -41,6 +42,13 @@ def successful_json_response(response):
             response.headers["Content-Type"] == "application/json")
 
 
+async def read_action_message(ws_client):
+    while True:
+        message = json.loads(await ws_client.read_message())
+        if message["type"] != "task-status":
+            return message
+
+
 def is_unlock_page(body):
     return UNLOCK_PAGE_HEADLINE in body.decode("utf-8")
 
@@ -61,6 +69,22 @@ def check_balances(w3, account, settings, check_func):
     )
 
 
+def make_account_snapshot(
+    settings, eth=0, service_token=0, service_token_deposit=0, transfer_token=0
+):
+    service = Erc20Token.find_by_ticker(settings.service_token.ticker, settings.network)
+    transfer = Erc20Token.find_by_ticker(settings.transfer_token.ticker, settings.network)
+    return AccountSnapshot(
+        block_number=1,
+        ethereum_balance=EthereumAmount(eth),
+        service_token_balance=TokenAmount(service_token, service),
+        service_token_deposit=TokenAmount(service_token_deposit, service),
+        service_token_total_deposit=TokenAmount(service_token_deposit, service),
+        service_token_allowance=TokenAmount(0, service),
+        transfer_token_balance=TokenAmount(transfer_token, transfer),
+    )
+
+
 class SharedHandlersTests:
     @pytest.fixture
     def infura(self, test_account, network_name):
@@ -194,10 +218,10 @@ class SharedHandlersTests:
             }
             ws_client.write_message(json.dumps(data))
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == f"/setup/{test_account.keystore_file_path}"
 
@@ -216,7 +240,7 @@ class SharedHandlersTests:
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "redirect"
         assert message["redirect_url"] == f"/setup/{test_account.keystore_file_path}"
         assert get_passphrase() == test_password
@@ -233,10 +257,24 @@ class SharedHandlersTests:
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
         assert get_passphrase() == None
 
+    @pytest.mark.gen_test
+    def test_subscribe_balances(self, ws_client, config, unlocked):
+        balances = {"ETH": {"as_wei": 1, "formatted": "1 WEI"}}
+        with patch(
+            "raiden_installer.shared_handlers.get_balances", return_value=balances
+        ), patch("raiden_installer.shared_handlers.get_head_watcher") as mock_get_head_watcher:
+            data = {"method": "subscribe_balances", "configuration_file_name": config.file_name}
+            ws_client.write_message(json.dumps(data))
+
+            message = (yield read_action_message(ws_client))
+            assert message["type"] == "balance-update"
+            assert message["balance"] == balances
+            mock_get_head_watcher.return_value.subscribe.assert_called_once()
+
     @pytest.mark.gen_test
     def test_setup(
         self,
@@ -254,12 +292,12 @@ class SharedHandlersTests:
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "status-update"
 
         account_address = to_checksum_address(test_account.address)
         config_file_name = f"config-{account_address}-{settings.name}.toml"
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "redirect"
         assert message["redirect_url"] == f"/account/{config_file_name}"
 
@@ -288,7 +326,7 @@ class SharedHandlersTests:
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
 
         with pytest.raises(ValueError):
@@ -311,7 +349,7 @@ class SharedHandlersTests:
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
 
         with pytest.raises(ValueError):
@@ -333,13 +371,13 @@ class SharedHandlersTests:
             ws_client.write_message(json.dumps(data))
 
             for _ in range(3):
-                message = json.loads((yield ws_client.read_message()))
+                message = (yield read_action_message(ws_client))
                 assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "task-complete"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == RaidenClient.WEB_UI_INDEX_URL
 
@@ -360,7 +398,7 @@ class SharedHandlersTests:
             }
             ws_client.write_message(json.dumps(data))
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "error-message"
 
             mock_client.install.assert_not_called()
@@ -419,28 +457,51 @@ class TestWeb(SharedHandlersTests):
         assert successful_html_response(response)
         assert is_unlock_page(response.body)
 
-    @pytest.mark.gen_test(timeout=15)
-    def test_cost_estimation_handler(self, http_client, base_url, config, settings):
-        exchange = "Kyber"
+    @pytest.mark.gen_test(timeout=30)
+    def test_quotes_handler(self, http_client, base_url, config, settings):
         currency = settings.transfer_token.ticker
         target_amount = 3
         data = {
-            "exchange": exchange,
             "currency": currency,
             "target_amount": target_amount,
         }
         request = HTTPRequest(
-            url=f"{base_url}/api/cost-estimation/{config.file_name}",
+            url=f"{base_url}/api/quotes/{config.file_name}",
             method="POST",
             body=json.dumps(data)
         )
         response = yield http_client.fetch(request)
         json_response = json.loads(response.body)
         assert successful_json_response(response)
-        assert json_response["exchange"] == exchange
         assert json_response["currency"] == currency
         assert json_response["target_amount"] == target_amount
-        assert json_response["as_wei"] > 0
+        assert any(quote["as_wei"] for quote in json_response["quotes"])
+
+    @pytest.mark.gen_test
+    def test_quotes_handler_with_invalid_request(self, http_client, base_url, config):
+        request = HTTPRequest(
+            url=f"{base_url}/api/quotes/{config.file_name}",
+            method="POST",
+            body=json.dumps({"currency": "XYZ"})
+        )
+        response = yield http_client.fetch(request, raise_error=False)
+        assert response.code == 409
+
+    @pytest.mark.gen_test
+    def test_quotes_handler_with_exchange_error(self, http_client, base_url, config, settings):
+        data = {"currency": settings.transfer_token.ticker, "target_amount": 3}
+        request = HTTPRequest(
+            url=f"{base_url}/api/quotes/{config.file_name}",
+            method="POST",
+            body=json.dumps(data)
+        )
+        with patch(
+            "raiden_installer.web.get_quotes",
+            side_effect=ExchangeError("No liquidity\nfor this pair"),
+        ):
+            response = yield http_client.fetch(request, raise_error=False)
+        assert response.code == 409
+        assert response.reason == "No liquidity for this pair"
 
     # Websocket methods tests
 
@@ -456,14 +517,14 @@ class TestWeb(SharedHandlersTests):
             }
             ws_client.write_message(json.dumps(data))
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "hash"
             assert message["tx_hash"] == tx_hash
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == (
                 f"/swap/{config.file_name}/{settings.service_token.ticker}"
@@ -487,7 +548,7 @@ class TestWeb(SharedHandlersTests):
             }
             ws_client.write_message(json.dumps(data))
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "error-message"
 
             mock_wait_for_transaction.assert_not_called()
@@ -503,31 +564,20 @@ class TestWeb(SharedHandlersTests):
         mock_deposit_service_tokens,
         mock_wait_for_transaction
     ):
-        def token_balance(w3, account, token):
-            return (
-                TokenAmount(0, token)
-                if token.ticker == settings.transfer_token.ticker
-                else TokenAmount(10, token)
-            )
-
         eth_balance_patch = patch(
             "raiden_installer.account.Account.get_ethereum_balance",
             return_value=EthereumAmount(100)
         )
-        token_balance_patch = patch(
-            "raiden_installer.web.get_token_balance",
-            side_effect=token_balance
-        )
-        total_tokens_patch = patch(
-            "raiden_installer.web.get_total_token_owned",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
+        snapshot_patch = patch(
+            "raiden_installer.web.get_account_snapshot",
+            return_value=make_account_snapshot(settings, eth=100, service_token=10),
         )
         token_deposit_patch = patch(
-            "raiden_installer.shared_handlers.get_token_deposit",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
+            "raiden_installer.shared_handlers.get_account_snapshot",
+            return_value=make_account_snapshot(settings, service_token_deposit=10),
         )
 
-        with eth_balance_patch, token_balance_patch, total_tokens_patch, token_deposit_patch:
+        with eth_balance_patch, snapshot_patch, token_deposit_patch:
             mock_exchange = mock_get_exchange()()
             mock_exchange.calculate_transaction_costs.return_value = {
                 "gas_price": EthereumAmount(Wei(1000000000)),
@@ -549,13 +599,13 @@ class TestWeb(SharedHandlersTests):
             ws_client.write_message(json.dumps(data))
 
             for _ in range(8):
-                message = json.loads((yield ws_client.read_message()))
+                message = (yield read_action_message(ws_client))
                 assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "summary"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == (
                 f"/swap/{config.file_name}/{settings.transfer_token.ticker}"
@@ -586,7 +636,7 @@ class TestWeb(SharedHandlersTests):
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
 
         mock_exchange.calculate_transaction_costs.assert_not_called()
@@ -626,13 +676,13 @@ class TestWeb(SharedHandlersTests):
             }
             ws_client.write_message(json.dumps(data))
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "summary"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == (
                 f"/swap/{config.file_name}/{settings.service_token.ticker}"
@@ -657,20 +707,18 @@ class TestWeb(SharedHandlersTests):
             "raiden_installer.account.Account.get_ethereum_balance",
             return_value=EthereumAmount(100)
         )
-        token_balance_patch = patch(
-            "raiden_installer.web.get_token_balance",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
-        )
-        total_tokens_patch = patch(
-            "raiden_installer.web.get_total_token_owned",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
+        snapshot_patch = patch(
+            "raiden_installer.web.get_account_snapshot",
+            return_value=make_account_snapshot(
+                settings, eth=100, service_token=10, transfer_token=10
+            ),
         )
         token_deposit_patch = patch(
-            "raiden_installer.shared_handlers.get_token_deposit",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
+            "raiden_installer.shared_handlers.get_account_snapshot",
+            return_value=make_account_snapshot(settings, service_token_deposit=10),
         )
 
-        with eth_balance_patch, token_balance_patch, total_tokens_patch, token_deposit_patch:
+        with eth_balance_patch, snapshot_patch, token_deposit_patch:
             mock_exchange = mock_get_exchange()()
             mock_exchange.calculate_transaction_costs.return_value = {
                 "gas_price": EthereumAmount(Wei(1000000000)),
@@ -692,13 +740,13 @@ class TestWeb(SharedHandlersTests):
             ws_client.write_message(json.dumps(data))
 
             for _ in range(8):
-                message = json.loads((yield ws_client.read_message()))
+                message = (yield read_action_message(ws_client))
                 assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "summary"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == (
                 f"/launch/{config.file_name}"
@@ -718,20 +766,16 @@ class TestWeb(SharedHandlersTests):
         mock_deposit_service_tokens,
         mock_wait_for_transaction
     ):
-        token_balance_patch = patch(
-            "raiden_installer.web.get_token_balance",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
-        )
-        token_deposit_patch_web = patch(
-            "raiden_installer.web.get_token_deposit",
-            side_effect=lambda w3, account, token: TokenAmount(0, token)
+        snapshot_patch = patch(
+            "raiden_installer.web.get_account_snapshot",
+            return_value=make_account_snapshot(settings, service_token=10, transfer_token=10),
         )
         token_deposit_patch_shared = patch(
-            "raiden_installer.shared_handlers.get_token_deposit",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
+            "raiden_installer.shared_handlers.get_account_snapshot",
+            return_value=make_account_snapshot(settings, service_token_deposit=10),
         )
 
-        with token_balance_patch, token_deposit_patch_web, token_deposit_patch_shared:
+        with snapshot_patch, token_deposit_patch_shared:
             data = {
                 "method": "udc_deposit",
                 "configuration_file_name": config.file_name,
@@ -739,13 +783,13 @@ class TestWeb(SharedHandlersTests):
             ws_client.write_message(json.dumps(data))
 
             for _ in range(3):
-                message = json.loads((yield ws_client.read_message()))
+                message = (yield read_action_message(ws_client))
                 assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "summary"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == (
                 f"/launch/{config.file_name}"
@@ -767,7 +811,7 @@ class TestWeb(SharedHandlersTests):
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
 
         mock_deposit_service_tokens.assert_not_called()
@@ -782,29 +826,30 @@ class TestWeb(SharedHandlersTests):
         mock_deposit_service_tokens
     ):
         required_deposit = Wei(settings.service_token.amount_required)
-        token_balance_patch = patch(
-            "raiden_installer.web.get_token_balance",
-            side_effect=lambda w3, account, token: TokenAmount(10, token)
-        )
-        token_deposit_patch = patch(
-            "raiden_installer.web.get_token_deposit",
-            side_effect=lambda w3, account, token: TokenAmount(required_deposit, token)
+        snapshot_patch = patch(
+            "raiden_installer.web.get_account_snapshot",
+            return_value=make_account_snapshot(
+                settings,
+                service_token=10,
+                service_token_deposit=required_deposit,
+                transfer_token=10,
+            ),
         )
 
-        with token_balance_patch, token_deposit_patch:
+        with snapshot_patch:
             data = {
                 "method": "udc_deposit",
                 "configuration_file_name": config.file_name,
             }
             ws_client.write_message(json.dumps(data))
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "status-update"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "summary"
 
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "redirect"
             assert message["redirect_url"] == (
                 f"/launch/{config.file_name}"
@@ -835,20 +880,20 @@ class TestWebTestnet(SharedHandlersTests):
         ws_client.write_message(json.dumps(data))
 
         for _ in range(2):
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "status-update"
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "next-step"
 
         for _ in range(3):
-            message = json.loads((yield ws_client.read_message()))
+            message = (yield read_action_message(ws_client))
             assert message["type"] == "status-update"
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "next-step"
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "redirect"
         assert message["redirect_url"] == f"/launch/{config.file_name}"
 
@@ -872,7 +917,7 @@ class TestWebTestnet(SharedHandlersTests):
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
 
         w3 = make_web3_provider(config.ethereum_client_rpc_endpoint, test_account)
@@ -886,7 +931,7 @@ class TestWebTestnet(SharedHandlersTests):
         }
         ws_client.write_message(json.dumps(data))
 
-        message = json.loads((yield ws_client.read_message()))
+        message = (yield read_action_message(ws_client))
         assert message["type"] == "error-message"
 
         w3 = make_web3_provider(config.ethereum_client_rpc_endpoint, test_account)
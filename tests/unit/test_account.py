@@ -1,9 +1,10 @@
 import json
 import unittest
+from unittest.mock import patch
 
 from tests.constants import TESTING_KEYSTORE_FOLDER, TESTING_TEMP_FOLDER
 
-from raiden_installer.account import Account
+from raiden_installer.account import UNLOCKED_KEYS, Account, UnlockedKeyCache
 from raiden_installer.ethereum_rpc import make_web3_provider
 from raiden_installer.network import Network
 
@@ -102,6 +103,49 @@ class LockedAccountTestCase(AccountBaseTestCase):
             self.locked_account.unlock("wrong" + self.passphrase)
 
 
+class UnlockedKeyCacheTestCase(AccountBaseTestCase):
+    def setUp(self):
+        super().setUp()
+        UNLOCKED_KEYS.clear()
+        self.locked_account = Account(self.account.keystore_file_path)
+
+    def tearDown(self):
+        UNLOCKED_KEYS.clear()
+        super().tearDown()
+
+    def test_private_key_is_decrypted_once(self):
+        self.locked_account.unlock(self.passphrase)
+        with patch("raiden_installer.account.decode_keyfile_json") as decode_keyfile_json:
+            self.locked_account.private_key
+            Account(self.account.keystore_file_path, self.passphrase).private_key
+            decode_keyfile_json.assert_not_called()
+
+    def test_check_passphrase_uses_cached_digest(self):
+        self.locked_account.unlock(self.passphrase)
+        with patch("raiden_installer.account.decode_keyfile_json") as decode_keyfile_json:
+            self.assertTrue(self.locked_account.check_passphrase(self.passphrase))
+            self.assertFalse(self.locked_account.check_passphrase("wrong" + self.passphrase))
+            decode_keyfile_json.assert_not_called()
+
+    def test_lock_evicts_cached_key(self):
+        self.locked_account.unlock(self.passphrase)
+        self.locked_account.lock()
+        self.assertEqual(len(UNLOCKED_KEYS), 0)
+        with self.assertRaises(ValueError):
+            self.locked_account.private_key
+
+    def test_expired_keys_are_wiped(self):
+        cache = UnlockedKeyCache(ttl=60)
+        cache.store(self.account.content, self.passphrase, b"\x01" * 32)
+        entry = next(iter(cache._entries.values()))
+
+        with patch("raiden_installer.account.time.monotonic", return_value=float("inf")):
+            self.assertIsNone(cache.get(self.account.content, self.passphrase))
+
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(bytes(entry.private_key), b"\x00" * 32)
+
+
 class AccountCreationTestCase(unittest.TestCase):
     def setUp(self):
         self.account = Account.create(TESTING_KEYSTORE_FOLDER)
@@ -1,6 +1,23 @@
+import json
+import threading
 import unittest
+from unittest.mock import patch
 
-from raiden_installer.ethereum_rpc import Infura
+from tests.constants import TESTING_KEYSTORE_FOLDER
+from web3 import Web3
+
+from raiden_installer import ethereum_rpc
+from raiden_installer.account import Account
+from raiden_installer.ethereum_rpc import (
+    SIGNING_MIDDLEWARE,
+    BlockCache,
+    Infura,
+    SessionHTTPProvider,
+    Web3ProviderRegistry,
+    batch_requests,
+    construct_block_cache_middleware,
+    run_call_graph,
+)
 from raiden_installer.network import Network
 
 
@@ -42,3 +59,239 @@ class EthereumRpcProviderTestCase(unittest.TestCase):
     def test_cannot_create_infura_provider_with_invalid_network(self):
         with self.assertRaises(ValueError):
             Infura("https://invalidnetwork.infura.io:443/v3/36b457de4c103495ada08dc0658db9c3")
+
+
+class Web3ProviderRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.passphrase = "test_password"
+        self.account = Account.create(TESTING_KEYSTORE_FOLDER, self.passphrase)
+        self.registry = Web3ProviderRegistry(max_size=2)
+
+    def tearDown(self):
+        self.registry.clear()
+        self.account.keystore_file_path.unlink()
+
+    def test_reuses_provider_for_same_endpoint_and_account(self):
+        w3 = self.registry.get("http://localhost:8545", self.account)
+        same_account = Account(self.account.keystore_file_path, passphrase=self.passphrase)
+        self.assertIs(self.registry.get("http://localhost:8545", same_account), w3)
+        self.assertIsInstance(w3.provider, SessionHTTPProvider)
+
+    def test_locked_and_unlocked_account_share_provider(self):
+        locked_account = Account(self.account.keystore_file_path)
+        locked_w3 = self.registry.get("http://localhost:8545", locked_account)
+        self.assertNotIn(SIGNING_MIDDLEWARE, locked_w3.middleware_onion)
+
+        unlocked_w3 = self.registry.get("http://localhost:8545", self.account)
+        self.assertIs(unlocked_w3, locked_w3)
+        self.assertIn(SIGNING_MIDDLEWARE, unlocked_w3.middleware_onion)
+
+        # Pages that pass the locked account keep the signer
+        self.assertIs(self.registry.get("http://localhost:8545", locked_account), locked_w3)
+        self.assertIn(SIGNING_MIDDLEWARE, locked_w3.middleware_onion)
+        self.assertEqual(len(self.registry), 1)
+
+    def test_signer_is_replaced_when_passphrase_changes(self):
+        w3 = self.registry.get("http://localhost:8545", self.account)
+        signer = w3.middleware_onion.get(SIGNING_MIDDLEWARE)
+        private_key = self.account.private_key
+        self.account.passphrase = "other_password"
+        with patch.object(Account, "private_key", private_key):
+            self.assertIs(self.registry.get("http://localhost:8545", self.account), w3)
+        self.assertIsNot(w3.middleware_onion.get(SIGNING_MIDDLEWARE), signer)
+
+    def test_slow_provider_setup_does_not_block_other_endpoints(self):
+        release = threading.Event()
+        make_web3_provider = ethereum_rpc.make_web3_provider
+
+        def slow_make_web3_provider(url, *args, **kw):
+            if url == "http://localhost:8546":
+                release.wait(5)
+            return make_web3_provider(url, *args, **kw)
+
+        with patch.object(ethereum_rpc, "make_web3_provider", slow_make_web3_provider):
+            slow_get = threading.Thread(
+                target=self.registry.get, args=("http://localhost:8546", self.account)
+            )
+            slow_get.start()
+            try:
+                self.registry.get("http://localhost:8545", self.account)
+                self.assertTrue(slow_get.is_alive())
+            finally:
+                release.set()
+                slow_get.join()
+        self.assertEqual(len(self.registry), 2)
+
+    def test_endpoints_share_session_per_url(self):
+        other_account = Account.create(TESTING_KEYSTORE_FOLDER, self.passphrase)
+        try:
+            w3 = self.registry.get("http://localhost:8545", self.account)
+            other_w3 = self.registry.get("http://localhost:8545", other_account)
+            self.assertIs(w3.provider.session, other_w3.provider.session)
+        finally:
+            other_account.keystore_file_path.unlink()
+
+    def test_endpoints_share_block_cache_per_url(self):
+        self.registry.get("http://localhost:8545", self.account)
+        block_cache = self.registry.get_block_cache("http://localhost:8545")
+        self.assertIsInstance(block_cache, BlockCache)
+        self.assertIsNot(self.registry.get_block_cache("http://localhost:8546"), block_cache)
+
+    def test_evicts_least_recently_used_provider(self):
+        first_w3 = self.registry.get("http://localhost:8545", self.account)
+        self.registry.get("http://localhost:8546", self.account)
+        self.registry.get("http://localhost:8547", self.account)
+        self.assertEqual(len(self.registry), 2)
+        self.assertIsNot(self.registry.get("http://localhost:8545", self.account), first_w3)
+
+
+class RecordingHTTPProvider(SessionHTTPProvider):
+    def __init__(self):
+        super().__init__("http://localhost:8545")
+        self.posts = []
+
+    def post(self, request_data):
+        payload = json.loads(request_data)
+        self.posts.append(payload)
+        requests = payload if isinstance(payload, list) else [payload]
+        responses = [
+            {"jsonrpc": "2.0", "id": request["id"], "result": hex(len(self.posts))}
+            for request in requests
+        ]
+        return json.dumps(responses if isinstance(payload, list) else responses[0]).encode()
+
+
+class BatchRequestsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.provider = RecordingHTTPProvider()
+        self.w3 = Web3(self.provider)
+
+    def test_concurrent_reads_are_sent_in_one_post(self):
+        with batch_requests(self.w3, window=1) as batch:
+            calls = [batch.call(lambda: self.w3.eth.blockNumber) for _ in range(5)]
+
+        self.assertEqual([call.result() for call in calls], [1] * 5)
+        self.assertEqual(len(self.provider.posts), 1)
+        self.assertEqual(len(self.provider.posts[0]), 5)
+        self.assertEqual(batch.round_trips, 1)
+
+    def test_sequential_reads_within_a_call_take_one_round_trip_each(self):
+        def read_twice():
+            return self.w3.eth.blockNumber + self.w3.eth.blockNumber
+
+        with batch_requests(self.w3, window=1) as batch:
+            calls = [batch.call(read_twice) for _ in range(3)]
+
+        self.assertEqual([call.result() for call in calls], [3] * 3)
+        self.assertEqual(len(self.provider.posts), 2)
+
+    def test_errors_are_raised_by_the_failing_call_only(self):
+        def fail():
+            raise ValueError("failed")
+
+        with batch_requests(self.w3, window=1) as batch:
+            failing_call = batch.call(fail)
+            call = batch.call(lambda: self.w3.eth.blockNumber)
+
+        self.assertEqual(call.result(), 1)
+        with self.assertRaises(ValueError):
+            failing_call.result()
+
+    def test_requests_outside_of_a_batch_are_sent_directly(self):
+        self.assertEqual(self.w3.eth.blockNumber, 1)
+        self.assertIsInstance(self.provider.posts[0], dict)
+
+
+class FakeChainProvider(SessionHTTPProvider):
+    def __init__(self):
+        super().__init__("http://localhost:8545")
+        self.head = 100
+        self.balance = 10
+        self.methods = []
+
+    def make_request(self, method, params):
+        self.methods.append(method)
+        results = {
+            "eth_blockNumber": hex(self.head),
+            "eth_getBalance": hex(self.balance),
+            "eth_getTransactionCount": hex(1),
+        }
+        return {"jsonrpc": "2.0", "id": 1, "result": results[method]}
+
+
+class BlockCacheTestCase(unittest.TestCase):
+    ADDRESS = "0x0000000000000000000000000000000000000001"
+
+    def setUp(self):
+        self.provider = FakeChainProvider()
+        self.block_cache = BlockCache(head_interval=0)
+        self.w3 = Web3(self.provider)
+        self.w3.middleware_onion.inject(
+            construct_block_cache_middleware(self.block_cache), layer=0
+        )
+
+    def test_reads_within_one_block_are_served_from_cache(self):
+        for _ in range(3):
+            self.assertEqual(self.w3.eth.getBalance(self.ADDRESS), 10)
+            self.assertEqual(self.w3.eth.blockNumber, 100)
+
+        self.assertEqual(self.provider.methods.count("eth_getBalance"), 1)
+        self.assertEqual(self.block_cache.misses, 1)
+        self.assertEqual(self.block_cache.hits, 5)
+
+    def test_new_head_invalidates_cache(self):
+        self.w3.eth.getBalance(self.ADDRESS)
+        self.provider.head = 101
+        self.provider.balance = 20
+
+        self.assertEqual(self.w3.eth.getBalance(self.ADDRESS), 20)
+        self.assertEqual(self.w3.eth.blockNumber, 101)
+        self.assertEqual(self.block_cache.invalidations, 1)
+
+    def test_head_is_refreshed_at_most_once_per_interval(self):
+        self.block_cache.head_interval = 60
+        for _ in range(3):
+            self.w3.eth.getBalance(self.ADDRESS)
+        self.provider.head = 101
+
+        self.assertEqual(self.w3.eth.blockNumber, 100)
+        self.assertEqual(self.provider.methods.count("eth_blockNumber"), 1)
+
+    def test_pending_reads_are_not_cached(self):
+        for _ in range(2):
+            self.w3.eth.getTransactionCount(self.ADDRESS, "pending")
+        self.assertEqual(self.provider.methods.count("eth_getTransactionCount"), 2)
+
+
+class CallGraphTestCase(unittest.TestCase):
+    def setUp(self):
+        self.provider = RecordingHTTPProvider()
+        self.w3 = Web3(self.provider)
+
+    def test_independent_steps_share_a_round_trip(self):
+        results, latencies = run_call_graph(
+            self.w3,
+            {
+                "block_number": (lambda: self.w3.eth.blockNumber, ()),
+                "gas_price": (lambda: self.w3.eth.gasPrice, ()),
+                "sum": (
+                    lambda a, b: a + b + self.w3.eth.blockNumber,
+                    ("block_number", "gas_price"),
+                ),
+            },
+        )
+
+        self.assertEqual(results, {"block_number": 1, "gas_price": 1, "sum": 4})
+        self.assertEqual([len(post) for post in self.provider.posts], [2, 1])
+        self.assertEqual(set(latencies), {"block_number", "gas_price", "sum"})
+
+    def test_errors_are_raised(self):
+        def fail():
+            raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            run_call_graph(self.w3, {"fail": (fail, ()), "next": (lambda _: 1, ("fail",))})
+
+    def test_unresolvable_dependencies(self):
+        with self.assertRaises(ValueError):
+            run_call_graph(self.w3, {"a": (lambda _: 1, ("b",)), "b": (lambda _: 1, ("a",))})
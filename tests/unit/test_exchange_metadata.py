@@ -0,0 +1,68 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.constants import TESTING_TEMP_FOLDER
+
+from raiden_installer.exchange_metadata import ExchangeMetadataCache
+
+
+class ExchangeMetadataCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(ExchangeMetadataCache, "FOLDER_PATH", folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, folder_path)
+        self.fetches = []
+
+    def _fetch(self, value):
+        def fetch():
+            self.fetches.append(value)
+            return value
+
+        return fetch
+
+    def test_values_are_fetched_once_and_kept_on_disk(self):
+        cache = ExchangeMetadataCache()
+        self.assertEqual(cache.get(1, "weth", self._fetch("0x01")), "0x01")
+        self.assertEqual(cache.get(1, "weth", self._fetch("0x02")), "0x01")
+        self.assertEqual(cache.get(5, "weth", self._fetch("0x05")), "0x05")
+
+        self.assertEqual(ExchangeMetadataCache().get(1, "weth", self._fetch("0x03")), "0x01")
+        self.assertEqual(self.fetches, ["0x01", "0x05"])
+
+    def test_stale_value_is_refreshed_in_background(self):
+        cache = ExchangeMetadataCache(ttl=0)
+        cache.get(1, "maxGasPrice", self._fetch(100))
+        refreshed = threading.Event()
+
+        def fetch():
+            refreshed.set()
+            return 200
+
+        time.sleep(0.01)
+        self.assertEqual(cache.get(1, "maxGasPrice", fetch), 100)
+        self.assertTrue(refreshed.wait(5))
+        for _ in range(100):
+            if cache.lookup(1, "maxGasPrice") == 200:
+                break
+            time.sleep(0.01)
+        self.assertEqual(cache.lookup(1, "maxGasPrice"), 200)
+
+    def test_failed_refresh_keeps_value(self):
+        cache = ExchangeMetadataCache(ttl=0)
+        cache.get(1, "maxGasPrice", self._fetch(100))
+
+        def fetch():
+            raise ValueError("node unavailable")
+
+        time.sleep(0.01)
+        self.assertEqual(cache.get(1, "maxGasPrice", fetch), 100)
+        time.sleep(0.1)
+        self.assertEqual(cache.lookup(1, "maxGasPrice"), 100)
@@ -0,0 +1,99 @@
+import os
+import threading
+import unittest
+from unittest.mock import patch
+
+from tornado.ioloop import IOLoop
+
+from raiden_installer import executors
+from raiden_installer.executors import (
+    InstrumentedThreadPoolExecutor,
+    configure_executors,
+    get_executor,
+    get_pool_size,
+    run_blocking,
+)
+
+
+class InstrumentedThreadPoolExecutorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.executor = InstrumentedThreadPoolExecutor("test", max_workers=2)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_counts_completed_and_failed_jobs(self):
+        def fail():
+            raise ValueError()
+
+        self.executor.submit(lambda: 1).result()
+        with self.assertRaises(ValueError):
+            self.executor.submit(fail).result()
+
+        stats = self.executor.stats()
+        self.assertEqual(stats["submitted"], 2)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(stats["failed"], 1)
+        self.assertEqual(stats["active"], 0)
+        self.assertEqual(stats["queued"], 0)
+
+    def test_jobs_beyond_pool_size_are_queued(self):
+        release = threading.Event()
+        futures = [self.executor.submit(release.wait) for _ in range(3)]
+        try:
+            while self.executor.stats()["active"] < 2:
+                pass
+            self.assertEqual(self.executor.queued, 1)
+        finally:
+            release.set()
+        for future in futures:
+            future.result()
+        self.assertEqual(self.executor.queued, 0)
+
+    def test_cancelled_jobs_are_not_queued(self):
+        release = threading.Event()
+        futures = [self.executor.submit(release.wait) for _ in range(3)]
+        try:
+            while self.executor.stats()["active"] < 2:
+                pass
+            self.assertTrue(futures[2].cancel())
+            self.assertEqual(self.executor.stats()["cancelled"], 1)
+            self.assertEqual(self.executor.queued, 0)
+        finally:
+            release.set()
+
+
+class ExecutorRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.executors = patch.dict(executors._executors, clear=True)
+        self.pool_sizes = patch.dict(executors._pool_sizes, clear=True)
+        self.executors.start()
+        self.pool_sizes.start()
+
+    def tearDown(self):
+        for executor in executors._executors.values():
+            executor.shutdown()
+        self.pool_sizes.stop()
+        self.executors.stop()
+
+    def test_pool_size_from_environment(self):
+        with patch.dict(os.environ, {"RAIDEN_INSTALLER_RPC_WORKERS": "3"}):
+            self.assertEqual(get_pool_size(executors.RPC), 3)
+        self.assertEqual(get_pool_size(executors.RPC), executors.DEFAULT_POOL_SIZES["rpc"])
+
+    def test_configure_executors(self):
+        configure_executors(rpc=5)
+        self.assertEqual(get_executor(executors.RPC).max_workers, 5)
+
+    def test_cannot_resize_running_executor(self):
+        get_executor(executors.FILE_IO)
+        with self.assertRaises(RuntimeError):
+            configure_executors(files=4)
+
+    def test_run_blocking_does_not_run_on_io_loop_thread(self):
+        io_loop_thread = threading.current_thread()
+        worker_thread = IOLoop.current().run_sync(
+            lambda: run_blocking(executors.RPC, threading.current_thread)
+        )
+        self.assertNotEqual(worker_thread, io_loop_thread)
+        self.assertEqual(get_executor(executors.RPC).stats()["completed"], 1)
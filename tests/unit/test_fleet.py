@@ -0,0 +1,221 @@
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from eth_utils import to_checksum_address
+from tests.constants import TESTING_TEMP_FOLDER
+
+from raiden_installer.fleet import FleetInstance, RaidenFleet
+from raiden_installer.raiden import RaidenClientError
+from raiden_installer.readiness import SyncProgress
+
+ADDRESSES = [to_checksum_address(f"0x{index:040x}") for index in range(1, 4)]
+
+
+class FakeClient:
+    """ Client that gets ready after ``startup_time`` and can be made to crash
+
+    Like the process supervisor, running processes are tracked by instance
+    name, so they outlive the client object that launched them.
+    """
+
+    processes = set()
+
+    def __init__(self, startup_time=0.2, crashes=0, install_error=None):
+        self.startup_time = startup_time
+        self.crashes = crashes
+        self.install_error = install_error
+        self.launches = 0
+        self.instance_name = None
+        self.api_port = None
+        self.is_installed = install_error is None
+
+    @property
+    def running(self):
+        return self.instance_name in self.processes
+
+    @running.setter
+    def running(self, running):
+        if running:
+            self.processes.add(self.instance_name)
+        else:
+            self.processes.discard(self.instance_name)
+
+    @property
+    def is_running(self):
+        return self.running
+
+    @property
+    def web_ui_index_url(self):
+        return f"http://127.0.0.1:{self.api_port}"
+
+    def get_process_id(self):
+        return 1000 + self.api_port if self.running else None
+
+    def install(self):
+        raise self.install_error
+
+    def launch(self, configuration_file, passphrase_file):
+        self.launches += 1
+        self.running = True
+
+    def wait_for_web_ui_ready(self, status_callback=None, timeout=None):
+        status_callback(SyncProgress(status="syncing", blocks_to_sync=10))
+        if timeout is not None and self.startup_time > timeout:
+            time.sleep(timeout)
+            raise TimeoutError()
+        time.sleep(self.startup_time)
+        if self.crashes:
+            self.crashes -= 1
+            self.running = False
+            raise RaidenClientError("client process terminated while starting")
+        return self.startup_time
+
+    def kill(self):
+        self.running = False
+
+
+def make_configuration_file(address):
+    return SimpleNamespace(account=SimpleNamespace(address=address))
+
+
+class RaidenFleetTestCase(unittest.TestCase):
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        self.folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(RaidenFleet, "FOLDER_PATH", self.folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.folder_path)
+        self.addCleanup(FakeClient.processes.clear)
+
+    def _start_fleet(self, clients, **kw):
+        clients_by_address = dict(zip(ADDRESSES, clients))
+        kw.setdefault("restart_backoff", 0.01)
+        kw.setdefault("monitor_interval", 0.01)
+        fleet = RaidenFleet(
+            client_factory=lambda configuration_file: clients_by_address[
+                configuration_file.account.address
+            ],
+            base_port=15001,
+            **kw,
+        )
+        fleet.start(
+            (make_configuration_file(address), Path("/dev/null"))
+            for address in ADDRESSES[: len(clients)]
+        )
+        self.addCleanup(fleet.stop)
+        return fleet
+
+    def test_clients_get_ready_concurrently(self):
+        clients = [FakeClient(startup_time=0.3) for _ in range(3)]
+        started_at = time.monotonic()
+        status = self._start_fleet(clients, max_concurrent_starts=3).wait_until_settled(5)
+
+        self.assertLess(time.monotonic() - started_at, 0.8)
+        self.assertEqual(status["ready"], 3)
+        self.assertEqual(len({client.api_port for client in clients}), 3)
+        self.assertEqual({client.instance_name for client in clients}, set(ADDRESSES))
+
+    def test_allocated_ports_are_kept(self):
+        fleet = self._start_fleet([FakeClient(startup_time=0)])
+        fleet.wait_until_settled(5)
+        fleet.stop()
+        port = fleet.instances[0].api_port
+
+        client = FakeClient(startup_time=0)
+        self._start_fleet([client]).wait_until_settled(5)
+        self.assertEqual(client.api_port, port)
+
+    def test_port_in_use_is_skipped(self):
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 15001))
+            client = FakeClient(startup_time=0)
+            self._start_fleet([client]).wait_until_settled(5)
+        self.assertNotEqual(client.api_port, 15001)
+
+    def test_running_client_is_adopted_on_restart(self):
+        fleet = self._start_fleet([FakeClient(startup_time=0)])
+        fleet.wait_until_settled(5)
+        port = fleet.instances[0].api_port
+
+        # The client of the previous fleet still runs and holds its port
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", port))
+            client = FakeClient(startup_time=0)
+            status = self._start_fleet([client]).wait_until_settled(5)
+
+        self.assertEqual(client.api_port, port)
+        self.assertEqual(client.launches, 0)
+        self.assertEqual(status["instances"][0]["state"], FleetInstance.READY)
+
+    def test_crashed_client_is_restarted(self):
+        client = FakeClient(startup_time=0, crashes=2)
+        status = self._start_fleet([client]).wait_until_settled(5)
+
+        self.assertEqual(status["instances"][0]["state"], FleetInstance.READY)
+        self.assertEqual(status["instances"][0]["restarts"], 2)
+        self.assertEqual(client.launches, 3)
+
+    def test_client_exit_after_ready_triggers_restart(self):
+        client = FakeClient(startup_time=0)
+        fleet = self._start_fleet([client])
+        fleet.wait_until_settled(5)
+
+        client.running = False
+        for _ in range(100):
+            if client.launches == 2 and fleet.instances[0].state == FleetInstance.READY:
+                break
+            time.sleep(0.01)
+        self.assertEqual(client.launches, 2)
+        self.assertEqual(fleet.instances[0].restarts, 1)
+
+    def test_gives_up_after_max_restarts(self):
+        status = self._start_fleet(
+            [FakeClient(startup_time=0, crashes=10), FakeClient(startup_time=0)], max_restarts=2
+        ).wait_until_settled(5)
+
+        self.assertEqual(status["states"], {FleetInstance.FAILED: 1, FleetInstance.READY: 1})
+        self.assertIn("terminated", status["instances"][0]["last_error"])
+
+    def test_concurrent_starts_are_limited(self):
+        clients = [FakeClient(startup_time=0.1) for _ in range(3)]
+        active = []
+        lock = threading.Lock()
+
+        for client in clients:
+            original_wait = client.wait_for_web_ui_ready
+
+            def tracking_wait(status_callback=None, timeout=None, original_wait=original_wait):
+                with lock:
+                    active.append(sum(c.running for c in clients))
+                return original_wait(status_callback, timeout)
+
+            client.wait_for_web_ui_ready = tracking_wait
+
+        self._start_fleet(clients, max_concurrent_starts=1).wait_until_settled(5)
+        self.assertEqual(active, [1, 2, 3])
+
+    def test_client_that_never_gets_ready_fails_its_start(self):
+        clients = [FakeClient(startup_time=60), FakeClient(startup_time=0)]
+        status = self._start_fleet(
+            clients, max_concurrent_starts=1, max_restarts=1, ready_timeout=0.1
+        ).wait_until_settled(5)
+
+        self.assertEqual(status["states"], {FleetInstance.FAILED: 1, FleetInstance.READY: 1})
+        self.assertIn("not ready", status["instances"][0]["last_error"])
+        self.assertEqual(clients[0].launches, 2)
+        self.assertFalse(clients[0].running)
+
+    def test_failed_install_settles_the_instance(self):
+        client = FakeClient(install_error=Exception("Failed to download release"))
+        status = self._start_fleet([client], max_restarts=1).wait_until_settled(5)
+
+        self.assertEqual(status["instances"][0]["state"], FleetInstance.FAILED)
+        self.assertIn("download", status["instances"][0]["last_error"])
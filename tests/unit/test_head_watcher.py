@@ -0,0 +1,142 @@
+import threading
+import unittest
+
+from web3 import Web3
+
+from raiden_installer.ethereum_rpc import SessionHTTPProvider
+from raiden_installer.head_watcher import (
+    HeadWatcher,
+    balance_confirmed,
+    get_websocket_url,
+    transaction_confirmed,
+)
+
+TX_HASH = "0x" + "ab" * 32
+
+
+class MiningProvider(SessionHTTPProvider):
+    """ Fake node that mines a block every time new blocks are polled for """
+
+    def __init__(self, supports_filters=True, receipt_block=None):
+        super().__init__("http://localhost:8545")
+        self.supports_filters = supports_filters
+        self.receipt_block = receipt_block
+        self.head = 100
+        self.methods = []
+        self._lock = threading.Lock()
+
+    def _block_hash(self, number):
+        return "0x" + format(number, "064x")
+
+    def make_request(self, method, params):
+        with self._lock:
+            self.methods.append(method)
+            if method == "eth_newBlockFilter" and not self.supports_filters:
+                return {"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": "nope"}}
+
+            if method in ("eth_getFilterChanges", "eth_blockNumber") and len(self.methods) > 1:
+                self.head += 1
+
+            if method == "eth_newBlockFilter":
+                result = "0x1"
+            elif method == "eth_getFilterChanges":
+                result = [self._block_hash(self.head)]
+            elif method == "eth_getBlockByHash":
+                result = {"number": hex(int(params[0], 16)), "hash": params[0]}
+            elif method == "eth_blockNumber":
+                result = hex(self.head)
+            elif method == "eth_getTransactionReceipt":
+                mined = self.receipt_block is not None and self.head >= self.receipt_block
+                result = {"blockNumber": hex(self.receipt_block)} if mined else None
+            else:
+                raise NotImplementedError(method)
+            return {"jsonrpc": "2.0", "id": 1, "result": result}
+
+
+class HeadWatcherTestCase(unittest.TestCase):
+    def _make_watcher(self, **kw):
+        self.provider = MiningProvider(**kw)
+        return HeadWatcher(Web3(self.provider), poll_interval=0.01)
+
+    def test_waits_for_transaction_confirmations(self):
+        watcher = self._make_watcher(receipt_block=103)
+        receipt = watcher.wait_until(
+            transaction_confirmed(watcher.w3, TX_HASH, confirmations=2), timeout=5
+        )
+        self.assertEqual(receipt["blockNumber"], 103)
+        self.assertGreaterEqual(watcher.head, 105)
+        self.assertIn("eth_getFilterChanges", self.provider.methods)
+
+    def test_falls_back_to_block_number_polling(self):
+        watcher = self._make_watcher(supports_filters=False, receipt_block=102)
+        watcher.wait_until(transaction_confirmed(watcher.w3, TX_HASH, confirmations=1), timeout=5)
+        self.assertNotIn("eth_getFilterChanges", self.provider.methods)
+
+    def test_concurrent_waiters_share_one_poller(self):
+        watcher = self._make_watcher(receipt_block=105)
+        results = []
+
+        def wait():
+            results.append(
+                watcher.wait_until(transaction_confirmed(watcher.w3, TX_HASH, 1), timeout=5)
+            )
+
+        threads = [threading.Thread(target=wait) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(results), 3)
+        self.assertEqual(self.provider.methods.count("eth_newBlockFilter"), 1)
+        self.assertEqual(watcher.waiter_count, 0)
+
+    def test_subscribers_are_called_with_new_heads(self):
+        watcher = self._make_watcher(supports_filters=False)
+        heads = []
+        enough_heads = threading.Event()
+
+        def on_new_head(head):
+            heads.append(head)
+            if len(heads) == 3:
+                enough_heads.set()
+
+        unsubscribe = watcher.subscribe(on_new_head)
+        self.assertTrue(enough_heads.wait(5))
+        unsubscribe()
+
+        self.assertEqual(heads, sorted(set(heads)))
+        watcher.wait_until(lambda head: head, timeout=5)
+        self.assertFalse(watcher._has_waiters())
+
+    def test_times_out(self):
+        watcher = self._make_watcher()
+        with self.assertRaises(TimeoutError):
+            watcher.wait_until(lambda head: None, timeout=0.1)
+        self.assertEqual(watcher.waiter_count, 0)
+
+    def test_condition_errors_are_raised_to_waiter(self):
+        watcher = self._make_watcher()
+
+        def condition(head):
+            if head > 101:
+                raise ValueError("failed")
+
+        with self.assertRaises(ValueError):
+            watcher.wait_until(condition, timeout=5)
+
+
+class ConditionsTestCase(unittest.TestCase):
+    def test_balance_needs_to_stay_for_confirmations(self):
+        balances = iter([5, 10, 4, 10, 10, 10])
+        condition = balance_confirmed(lambda: next(balances), 10, confirmations=2)
+        results = [condition(head) for head in range(100, 106)]
+        self.assertEqual(results, [None, None, None, None, None, 10])
+
+    def test_websocket_url(self):
+        self.assertEqual(
+            get_websocket_url("https://goerli.infura.io:443/v3/a7a347de4c103495a4a88dc0658db9b2"),
+            "wss://goerli.infura.io:443/ws/v3/a7a347de4c103495a4a88dc0658db9b2",
+        )
+        self.assertEqual(get_websocket_url("ws://localhost:8546"), "ws://localhost:8546")
+        self.assertIsNone(get_websocket_url("http://localhost:8545"))
@@ -1,7 +1,9 @@
 import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
 
 from raiden_installer.account import Account
-from raiden_installer.network import Network
+from raiden_installer.network import Network, get_chain_context
 
 CHAIN_ID_MAPPING = {"mainnet": 1, "ropsten": 3, "rinkeby": 4, "goerli": 5, "kovan": 42}
 
@@ -21,3 +23,48 @@ class NetworkTestCase(unittest.TestCase):
             network = Network.get_by_chain_id(cid)
             self.assertEqual(network.name, name)
             self.assertEqual(network.chain_id, cid)
+
+    def test_networks_are_singletons(self):
+        self.assertIs(Network.get_by_name("goerli"), Network.get_by_chain_id(5))
+
+    def test_unknown_chain_id(self):
+        with self.assertRaises(KeyError):
+            Network.get_by_chain_id(1337)
+
+
+class FakeEth:
+    def __init__(self, chain_id):
+        self.chain_id = chain_id
+        self.requests = 0
+
+    @property
+    def chainId(self):
+        self.requests += 1
+        return self.chain_id
+
+
+class ChainContextTestCase(unittest.TestCase):
+    def setUp(self):
+        patcher = patch.dict("raiden_installer.network._chain_contexts", clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _make_w3(self, endpoint_uri, chain_id):
+        return SimpleNamespace(
+            provider=SimpleNamespace(endpoint_uri=endpoint_uri), eth=FakeEth(chain_id)
+        )
+
+    def test_chain_is_resolved_once_per_endpoint(self):
+        w3 = self._make_w3("http://node.example:8545", 5)
+        other_w3 = self._make_w3("http://node.example:8545", 5)
+        for _ in range(3):
+            self.assertEqual(get_chain_context(w3).chain_id, 5)
+        self.assertIs(get_chain_context(other_w3).network, Network.get_by_name("goerli"))
+        self.assertEqual(w3.eth.requests + other_w3.eth.requests, 1)
+
+    def test_endpoints_are_kept_apart(self):
+        get_chain_context(self._make_w3("http://goerli.example", 5))
+        self.assertEqual(
+            get_chain_context(self._make_w3("http://mainnet.example", 1)).network.name,
+            "mainnet",
+        )
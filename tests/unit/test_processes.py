@@ -0,0 +1,74 @@
+import json
+import shutil
+import subprocess
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import psutil
+from tests.constants import TESTING_TEMP_FOLDER
+
+from raiden_installer.processes import ProcessSupervisor
+
+
+class ProcessSupervisorTestCase(unittest.TestCase):
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        self.folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(ProcessSupervisor, "FOLDER_PATH", self.folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.folder_path)
+        self.supervisor = ProcessSupervisor()
+
+    def _launch_sleep(self, supervisor=None):
+        supervisor = supervisor or self.supervisor
+        pid = supervisor.launch("sleep", ["sleep", "30"])
+        self.addCleanup(supervisor.kill, "sleep")
+        return pid
+
+    def test_launch_and_kill(self):
+        pid = self._launch_sleep()
+        self.assertEqual(self.supervisor.get_pid("sleep"), pid)
+        self.assertTrue(self.folder_path.joinpath("sleep.pid").exists())
+
+        self.supervisor.kill("sleep")
+        self.assertFalse(self.supervisor.is_running("sleep"))
+        self.assertFalse(self.folder_path.joinpath("sleep.pid").exists())
+
+    def test_exited_process_is_not_running(self):
+        self.supervisor.launch("true", ["true"])
+        self.supervisor._handles["true"].wait()
+        self.assertFalse(self.supervisor.is_running("true"))
+
+    def test_liveness_does_not_scan_processes(self):
+        self._launch_sleep()
+        with patch("psutil.process_iter", side_effect=AssertionError("scanned processes")):
+            for _ in range(3):
+                self.assertTrue(self.supervisor.is_running("sleep"))
+
+    def test_adopts_process_from_pidfile(self):
+        pid = self._launch_sleep()
+        with patch("psutil.process_iter", side_effect=AssertionError("scanned processes")):
+            self.assertEqual(ProcessSupervisor().get_pid("sleep"), pid)
+
+    def test_ignores_pidfile_of_reused_pid(self):
+        pid = self._launch_sleep()
+        pidfile_path = self.folder_path.joinpath("sleep.pid")
+        pidfile_path.write_text(json.dumps({"pid": pid, "create_time": 0}))
+
+        with patch("psutil.process_iter", side_effect=AssertionError("scanned processes")):
+            self.assertIsNone(ProcessSupervisor().get_pid("sleep"))
+        self.assertFalse(pidfile_path.exists())
+
+    def test_adopts_process_started_without_pidfile(self):
+        process = subprocess.Popen(["sleep", "30"])
+        self.addCleanup(process.wait)
+        self.addCleanup(process.kill)
+
+        with patch("psutil.process_iter", wraps=psutil.process_iter) as scan:
+            self.assertIsNotNone(self.supervisor.get_pid("sleep"))
+            self.assertIsNotNone(self.supervisor.get_pid("sleep"))
+        self.assertEqual(scan.call_count, 1)
+        self.assertTrue(self.folder_path.joinpath("sleep.pid").exists())
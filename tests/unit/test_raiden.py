@@ -1,12 +1,37 @@
+import hashlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
 import unittest
+import zipfile
 from datetime import datetime
+from io import BytesIO
 from pathlib import Path
+from unittest.mock import patch
 
+import requests
+from tests.constants import TESTING_TEMP_FOLDER
+
+from raiden_installer.constants import ARTIFACT_CACHE_STALE_PART_AGE
+from raiden_installer.downloads import (
+    ArtifactCache,
+    DownloadError,
+    ReleaseIndexCache,
+    SegmentedDownload,
+)
 from raiden_installer.raiden import (
+    NIGHTLY_INDEX,
+    NightlyIndex,
     RaidenNightly,
     RaidenRelease,
     RaidenTestnetRelease,
+    ReleaseIndex,
     VersionData,
+    VersionKey,
     temporary_passphrase_file,
 )
 
@@ -78,3 +103,495 @@ class RaidenClientTestCase(unittest.TestCase):
             temporary_password = passphrase_file.read_text()
             self.assertEqual(temporary_password, password)
         self.assertFalse(passphrase_file.exists())
+
+
+class FakeDownloadServer:
+    """ Stands in for ``requests.get``, serving ``content`` with range support """
+
+    def __init__(self, content, fail_after=None, etag='"v1"', accept_ranges=True):
+        self.content = content
+        self.fail_after = fail_after
+        self.etag = etag
+        self.accept_ranges = accept_ranges
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, url, headers=None, **kw):
+        headers = headers or {}
+        with self._lock:
+            self.requests.append(headers)
+        range_valid = headers.get("If-Range", self.etag) == self.etag
+        if self.accept_ranges and "Range" in headers and range_valid:
+            first, last = headers["Range"][len("bytes=") :].split("-")
+            return FakeDownloadResponse(self, int(first), int(last) + 1 if last else None)
+        return FakeDownloadResponse(self)
+
+    def get_fail_offset(self, start, end):
+        # The connection is dropped once, at ``fail_after``
+        with self._lock:
+            if self.fail_after is not None and start <= self.fail_after < end:
+                fail_after, self.fail_after = self.fail_after, None
+                return fail_after
+        return None
+
+
+class FakeDownloadResponse:
+    def __init__(self, server, start=None, end=None):
+        size = len(server.content)
+        self.status_code = 200 if start is None else 206
+        start, end = start or 0, end or size
+        self.headers = {"Content-Length": str(end - start), "ETag": server.etag}
+        if self.status_code == 206:
+            self.headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+
+        fail_after = server.get_fail_offset(start, end)
+        self.raw = BytesIO(server.content[start : fail_after or end])
+        if fail_after is not None:
+            self.raw.read = self._read_then_fail(self.raw.read)
+
+    def _read_then_fail(self, read):
+        def failing_read(size=-1):
+            data = read(size)
+            if not data:
+                raise ConnectionError("connection dropped")
+            return data
+
+        return failing_read
+
+    def raise_for_status(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def make_tar_gz(name, content):
+    archive = BytesIO()
+    with tarfile.open(fileobj=archive, mode="w:gz") as tar:
+        info = tarfile.TarInfo(name)
+        info.size = len(content)
+        tar.addfile(info, BytesIO(content))
+    return archive.getvalue()
+
+
+def make_zip(name, content):
+    archive = BytesIO()
+    with zipfile.ZipFile(archive, mode="w", compression=zipfile.ZIP_DEFLATED) as zipped:
+        zipped.writestr(name, content)
+    return archive.getvalue()
+
+
+class RaidenClientInstallTestCase(unittest.TestCase):
+    BINARY = os.urandom(256 * 1024)
+    DOWNLOAD_URL = "https://test.download.url/raiden.tar.gz"
+
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        self.binary_folder = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        for patcher in (
+            patch.object(RaidenRelease, "BINARY_FOLDER_PATH", self.binary_folder),
+            patch.object(ArtifactCache, "FOLDER_PATH", self.binary_folder.joinpath("cache")),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.binary_folder)
+        self.archive = make_tar_gz("raiden", self.BINARY)
+
+    def _install(self, server, download_url=DOWNLOAD_URL, force=False):
+        release = RaidenRelease(download_url, VersionData("1", "1", "0"))
+        progress = []
+        with patch("raiden_installer.downloads.requests.get", side_effect=server.get):
+            release.install(
+                force=force,
+                progress_callback=lambda done, total: progress.append((done, total)),
+            )
+        return release, progress
+
+    def test_install_from_tar_gz(self):
+        release, progress = self._install(FakeDownloadServer(self.archive))
+        self.assertEqual(release.install_path.read_bytes(), self.BINARY)
+        self.assertEqual(release.install_path.stat().st_mode & 0o777, 0o770)
+        self.assertEqual(progress[-1], (len(self.archive), len(self.archive)))
+
+    def test_install_from_zip(self):
+        release, _ = self._install(
+            FakeDownloadServer(make_zip("raiden", self.BINARY)),
+            download_url="https://test.download.url/raiden.zip",
+        )
+        self.assertEqual(release.install_path.read_bytes(), self.BINARY)
+
+    def test_failed_download_leaves_no_binary_behind(self):
+        server = FakeDownloadServer(self.archive, fail_after=len(self.archive) // 2)
+        with self.assertRaises(ConnectionError):
+            self._install(server)
+        self.assertEqual(
+            [path.name for path in self.binary_folder.iterdir() if path.is_file()], []
+        )
+
+    def test_resumes_interrupted_download(self):
+        server = FakeDownloadServer(self.archive, fail_after=len(self.archive) // 2)
+        with self.assertRaises(ConnectionError):
+            self._install(server)
+
+        release, _ = self._install(server)
+        self.assertEqual(release.install_path.read_bytes(), self.BINARY)
+        self.assertEqual(server.requests[-1]["Range"], f"bytes={len(self.archive) // 2}-")
+
+    def test_restarts_download_if_archive_changed(self):
+        server = FakeDownloadServer(self.archive, fail_after=len(self.archive) // 2)
+        with self.assertRaises(ConnectionError):
+            self._install(server)
+
+        server.etag = '"v2"'
+        release, _ = self._install(server)
+        self.assertEqual(release.install_path.read_bytes(), self.BINARY)
+
+    def test_reinstall_uses_cached_archive(self):
+        server = FakeDownloadServer(self.archive)
+        self._install(server)
+        request_count = len(server.requests)
+        release, _ = self._install(server, force=True)
+        self.assertEqual(release.install_path.read_bytes(), self.BINARY)
+        self.assertEqual(len(server.requests), request_count)
+
+    def test_install_with_segmented_download(self):
+        with patch("raiden_installer.downloads.DOWNLOAD_MIN_SEGMENT_SIZE", 16 * 1024):
+            release, progress = self._install(FakeDownloadServer(self.archive))
+        self.assertEqual(release.install_path.read_bytes(), self.BINARY)
+        self.assertEqual(progress[-1], (len(self.archive), len(self.archive)))
+
+
+class ArtifactCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(ArtifactCache, "FOLDER_PATH", folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, folder_path)
+        self.cache = ArtifactCache(max_size=250)
+        for patcher in (
+            patch("raiden_installer.downloads.DOWNLOAD_MIN_SEGMENT_SIZE", 16 * 1024),
+            patch.object(SegmentedDownload, "RETRY_DELAY", 0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _fetch(self, url, content, sha256=None):
+        server = FakeDownloadServer(content)
+        with patch("raiden_installer.downloads.requests.get", side_effect=server.get):
+            with self.cache.open(url, sha256=sha256) as download:
+                return download.read()
+
+    def _fetch_segmented(self, server, connections=4):
+        url = "https://test.download.url/segmented"
+        with patch("raiden_installer.downloads.requests.get", side_effect=server.get):
+            with self.cache.open(url, connections=connections) as download:
+                return download.read()
+
+    def test_downloads_segments_in_parallel(self):
+        server = FakeDownloadServer(os.urandom(64 * 1024))
+        self.assertEqual(self._fetch_segmented(server), server.content)
+        segment_ranges = sorted(request["Range"] for request in server.requests[1:])
+        self.assertEqual(
+            segment_ranges,
+            ["bytes=0-16383", "bytes=16384-32767", "bytes=32768-49151", "bytes=49152-65535"],
+        )
+
+    def test_retries_failed_segment(self):
+        server = FakeDownloadServer(os.urandom(64 * 1024), fail_after=20000)
+        self.assertEqual(self._fetch_segmented(server), server.content)
+        self.assertIn("bytes=20000-32767", [request["Range"] for request in server.requests])
+
+    def test_gives_up_on_segment_after_retries(self):
+        server = FakeDownloadServer(os.urandom(64 * 1024))
+        server.get_fail_offset = lambda start, end: start if start >= 16384 else None
+        with self.assertRaises(ConnectionError):
+            self._fetch_segmented(server)
+        self.assertEqual(list(ArtifactCache.FOLDER_PATH.iterdir()), [])
+
+    def test_falls_back_to_single_stream_without_range_support(self):
+        server = FakeDownloadServer(os.urandom(64 * 1024), accept_ranges=False)
+        self.assertEqual(self._fetch_segmented(server), server.content)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_rejects_checksum_mismatch(self):
+        with self.assertRaises(DownloadError):
+            self._fetch("https://test.download.url/a", b"a" * 100, sha256="0" * 64)
+        self.assertIsNone(self.cache.get("https://test.download.url/a"))
+
+    def test_verifies_checksum(self):
+        content = b"a" * 100
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.assertEqual(self._fetch("https://test.download.url/a", content, sha256), content)
+        self.assertIsNotNone(self.cache.get("https://test.download.url/a"))
+
+    def test_evicts_least_recently_used_archives(self):
+        for name in "abc":
+            self._fetch(f"https://test.download.url/{name}", name.encode() * 100)
+            time.sleep(0.01)
+
+        self.assertIsNone(self.cache.get("https://test.download.url/a"))
+        self.assertIsNotNone(self.cache.get("https://test.download.url/b"))
+        self.assertIsNotNone(self.cache.get("https://test.download.url/c"))
+
+    def test_only_stale_partial_downloads_are_evicted(self):
+        _, running_path, _ = self.cache._paths("https://test.download.url/running")
+        _, stale_path, _ = self.cache._paths("https://test.download.url/stale")
+        ArtifactCache.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        for partial_path in (stale_path, running_path):
+            partial_path.write_bytes(b"x" * 100)
+        stale_time = time.time() - ARTIFACT_CACHE_STALE_PART_AGE - 1
+        os.utime(stale_path, (stale_time, stale_time))
+
+        self._fetch("https://test.download.url/a", b"a" * 100)
+        self.assertFalse(stale_path.exists())
+        self.assertTrue(running_path.exists())
+        self.assertIsNotNone(self.cache.get("https://test.download.url/a"))
+
+
+class FakeIndexServer:
+    """ Stands in for ``requests.get`` serving a release index with ETag support """
+
+    def __init__(self, content, etag='"v1"'):
+        self.content = content
+        self.etag = etag
+        self.available = True
+        self.requests = []
+
+    def get(self, url, headers=None, **kw):
+        headers = headers or {}
+        self.requests.append(headers)
+        if not self.available:
+            raise requests.ConnectionError("GitHub is not reachable")
+        response = requests.Response()
+        response.url = url
+        if headers.get("If-None-Match") == self.etag:
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response._content = self.content
+            response.headers["ETag"] = self.etag
+        return response
+
+
+class ReleaseIndexCacheTestCase(unittest.TestCase):
+    INDEX_URL = "https://api.github.com/repos/raiden-network/raiden/releases/tags/v1.1.0"
+    INDEX = (
+        b'[{"assets": [{"name": "raiden-v1.1.0-linux-x86_64.tar.gz", '
+        b'"browser_download_url": "https://test.download.url/raiden-v1.1.0.tar.gz"}]}]'
+    )
+
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(ReleaseIndexCache, "FOLDER_PATH", folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, folder_path)
+        self.server = FakeIndexServer(self.INDEX)
+
+    def _get(self, ttl=60):
+        with patch("raiden_installer.downloads.requests.get", side_effect=self.server.get):
+            return ReleaseIndexCache(ttl=ttl).get(self.INDEX_URL)
+
+    def test_fresh_index_is_used_without_request(self):
+        self._get()
+        cached_response = self._get()
+        self.assertEqual(cached_response.content, self.INDEX)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_stale_index_is_revalidated(self):
+        self._get(ttl=0)
+        cached_response = self._get(ttl=0)
+        self.assertEqual(self.server.requests[-1], {"If-None-Match": '"v1"'})
+        self.assertEqual(cached_response.json(), json.loads(self.INDEX))
+
+    def test_changed_index_is_replaced(self):
+        self._get(ttl=0)
+        self.server.content, self.server.etag = b"[]", '"v2"'
+        self.assertEqual(self._get(ttl=0).json(), [])
+        self.assertEqual(self._get().json(), [])
+
+    def test_stale_index_is_used_if_unreachable(self):
+        self._get(ttl=0)
+        self.server.available = False
+        self.assertEqual(self._get(ttl=0).content, self.INDEX)
+
+    def test_unreachable_without_cached_index(self):
+        self.server.available = False
+        with self.assertRaises(requests.ConnectionError):
+            self._get()
+
+    def test_make_release_by_tag(self):
+        self.server.content = self.INDEX[1:-1]
+        with patch("raiden_installer.downloads.requests.get", side_effect=self.server.get):
+            release = RaidenRelease.make_by_tag("v1.1.0")
+        self.assertEqual(release.version, "Raiden 1.1.0")
+        self.assertEqual(release.download_url, "https://test.download.url/raiden-v1.1.0.tar.gz")
+
+
+class FakeBucket:
+    """ Stands in for ``requests.get`` answering S3 ListObjectsV2 requests, two keys a page """
+
+    PAGE_SIZE = 2
+
+    def __init__(self, keys):
+        self.keys = sorted(keys)
+        self.requests = []
+
+    def get(self, url, params=None, **kw):
+        self.requests.append(dict(params))
+        keys = [key for key in self.keys if key.startswith(params["prefix"])]
+        start_after = params.get("continuation-token") or params.get("start-after")
+        if start_after:
+            keys = [key for key in keys if key > start_after]
+        page, truncated = keys[: self.PAGE_SIZE], len(keys) > self.PAGE_SIZE
+
+        contents = "".join(f"<Contents><Key>{key}</Key></Contents>" for key in page)
+        token = f"<NextContinuationToken>{page[-1]}</NextContinuationToken>" if truncated else ""
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = BytesIO(
+            f'<ListBucketResult xmlns="http://s3.amazonaws.com/doc/2006-03-01/">'
+            f"<IsTruncated>{str(truncated).lower()}</IsTruncated>{contents}{token}"
+            f"</ListBucketResult>".encode()
+        )
+        return response
+
+
+class RaidenNightlyIndexTestCase(unittest.TestCase):
+    KEYS = [
+        f"NIGHTLY/raiden-nightly-2020-04-{day:02}T00-29-38-v1.1.1.dev{day}+g2d9d1fcfc-"
+        f"{RaidenNightly.FILE_NAME_SUFFIX}"
+        for day in range(1, 8)
+    ]
+
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(NightlyIndex, "FOLDER_PATH", folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, folder_path)
+        self.bucket = FakeBucket(self.KEYS)
+
+    def _call(self, function, *args):
+        with patch("raiden_installer.raiden.requests.get", side_effect=self.bucket.get):
+            return function(*args)
+
+    def test_make_by_tag_only_lists_the_build_date(self):
+        release = self._call(RaidenNightly.make_by_tag, "1.1.1.dev3+g2d9d1fcfc-20200403")
+        self.assertEqual(release.release, "1.1.1.dev3+g2d9d1fcfc-20200403")
+        self.assertEqual(
+            self.bucket.requests,
+            [{"list-type": "2", "prefix": "NIGHTLY/raiden-nightly-2020-04-03"}],
+        )
+
+    def test_make_by_tag_uses_local_index(self):
+        self._call(RaidenNightly.make_by_tag, "1.1.1.dev3+g2d9d1fcfc-20200403")
+        release = self._call(RaidenNightly.make_by_tag, "1.1.1.dev3+g2d9d1fcfc-20200403")
+        self.assertEqual(release.release, "1.1.1.dev3+g2d9d1fcfc-20200403")
+        self.assertEqual(len(self.bucket.requests), 1)
+
+    def test_make_by_tag_for_unknown_build(self):
+        self.assertIsNone(self._call(RaidenNightly.make_by_tag, "1.1.1-20200501"))
+        self.assertIsNone(self._call(RaidenNightly.make_by_tag, "not-a-tag"))
+
+    def test_available_releases_follow_continuation_tokens(self):
+        releases = self._call(RaidenNightly.get_available_releases)
+        self.assertEqual(len(releases), 7)
+        self.assertEqual(releases[0].release, "1.1.1.dev7+g2d9d1fcfc-20200407")
+        self.assertEqual(len(self.bucket.requests), 4)
+
+    def test_available_releases_only_list_new_builds(self):
+        self._call(RaidenNightly.get_available_releases)
+        new_key = self.KEYS[-1].replace("2020-04-07", "2020-04-08")
+        self.bucket.keys.append(new_key)
+
+        releases = self._call(RaidenNightly.get_available_releases)
+        self.assertEqual(len(releases), 8)
+        self.assertEqual(self.bucket.requests[-1]["start-after"], self.KEYS[-1])
+        self.assertEqual(len(self.bucket.requests), 5)
+
+    def test_available_releases_after_make_by_tag(self):
+        self._call(RaidenNightly.make_by_tag, "1.1.1.dev7+g2d9d1fcfc-20200407")
+        releases = self._call(RaidenNightly.get_available_releases)
+        self.assertEqual(len(releases), 7)
+        self.assertNotIn("start-after", self.bucket.requests[1])
+
+    def test_index_without_listing_marker_is_listed_again(self):
+        NightlyIndex.FOLDER_PATH.mkdir(parents=True, exist_ok=True)
+        NIGHTLY_INDEX.path.write_text(json.dumps(self.KEYS[-1:]))
+        releases = self._call(RaidenNightly.get_available_releases)
+        self.assertEqual(len(releases), 7)
+        self.assertNotIn("start-after", self.bucket.requests[0])
+
+
+class VersionKeyTestCase(unittest.TestCase):
+    def test_numeric_ordering(self):
+        self.assertLess(VersionKey.parse("0.20.0"), VersionKey.parse("0.100.0"))
+        self.assertLess(VersionKey.parse("1.1.9"), VersionKey.parse("1.1.10"))
+
+    def test_pre_releases_before_final_release(self):
+        versions = ["1.0.0", "1.0.0rc2", "1.0.0.dev3", "1.0.0b1", "1.0.0a1", "1.0.0rc10"]
+        self.assertEqual(
+            sorted(versions, key=VersionKey.parse),
+            ["1.0.0.dev3", "1.0.0a1", "1.0.0b1", "1.0.0rc2", "1.0.0rc10", "1.0.0"],
+        )
+
+    def test_equality_and_hash(self):
+        self.assertEqual(VersionKey.parse("v0.200.0-rc9"), VersionKey(0, 200, 0, "rc", 9))
+        self.assertEqual(len({VersionKey.parse("1.1.0"), VersionKey(1, 1, 0)}), 1)
+
+    def test_immutable(self):
+        with self.assertRaises(AttributeError):
+            VersionKey(1, 1, 0).major = 2
+
+    def test_parse_rejects_invalid_version(self):
+        with self.assertRaises(ValueError):
+            VersionKey.parse("latest")
+
+    def test_releases_are_parsed_once(self):
+        releases = [
+            RaidenRelease("https://test.download.url", VersionData(str(major), "0", "0"))
+            for major in range(20, 0, -1)
+        ]
+        with patch("raiden_installer.raiden.extract_version_modifier") as extract:
+            ordered = sorted(releases)
+        extract.assert_not_called()
+        self.assertEqual(ordered[0].version_data.major, "1")
+
+
+class ReleaseIndexTestCase(unittest.TestCase):
+    VERSIONS = ["0.100.3", "0.200.0-rc1", "0.200.0", "1.0.0", "1.1.0", "1.1.1"]
+
+    def setUp(self):
+        version_pattern = VersionKey.VERSION_PATTERN
+        self.index = ReleaseIndex(
+            RaidenTestnetRelease(
+                "https://test.download.url",
+                VersionData(*version_pattern.fullmatch(version).groups()),
+            )
+            for version in reversed(self.VERSIONS)
+        )
+
+    def test_sorted_by_version(self):
+        self.assertEqual([release.release for release in self.index], self.VERSIONS)
+        self.assertEqual(self.index.latest().release, "1.1.1")
+
+    def test_lookup_by_tag(self):
+        self.assertEqual(self.index.get("0.200.0-rc1").version_modifier, "rc")
+        self.assertIsNone(self.index.get("2.0.0"))
+
+    def test_lookup_by_version(self):
+        self.assertEqual(self.index.find(VersionKey.parse("1.0.0")).release, "1.0.0")
+        self.assertIsNone(self.index.find(VersionKey.parse("1.0.1")))
+
+    def test_lookup_by_version_range(self):
+        releases = self.index.between(VersionKey.parse("0.200.0"), VersionKey.parse("1.1.1"))
+        self.assertEqual([release.release for release in releases], ["0.200.0", "1.0.0", "1.1.0"])
+        self.assertEqual(len(self.index.between(lower=VersionKey.parse("1.0.0"))), 3)
@@ -0,0 +1,128 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+from tests.constants import TESTING_TEMP_FOLDER
+
+from raiden_installer.readiness import (
+    LaunchMetrics,
+    RaidenClientExited,
+    ReadinessProbe,
+    SyncProgress,
+)
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.client_ports.add(self.client_address[1])
+        body = json.dumps(self.server.statuses.pop(0) if self.server.statuses else {}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ReadinessProbeTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = HTTPServer(("127.0.0.1", 0), StatusHandler)
+        self.server.statuses = []
+        self.server.client_ports = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.status_url = f"http://127.0.0.1:{self.server.server_address[1]}/api/v1/status"
+
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        self.folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        self.addCleanup(shutil.rmtree, self.folder_path)
+
+    def _make_probe(self, **kw):
+        kw.setdefault("min_interval", 0.01)
+        kw.setdefault("max_interval", 0.05)
+        return ReadinessProbe(self.status_url, is_running=kw.pop("is_running", lambda: True), **kw)
+
+    def test_reports_sync_progress_until_ready(self):
+        self.server.statuses = [
+            {"status": "unavailable"},
+            {"status": "syncing", "blocks_to_sync": 300},
+            {"status": "syncing", "blocks_to_sync": 200},
+            {"status": "syncing", "blocks_to_sync": 100},
+            {"status": "ready"},
+        ]
+        progress = []
+        self._make_probe().wait(progress.append)
+
+        self.assertEqual(
+            [(p.status, p.blocks_to_sync, p.blocks_synced) for p in progress],
+            [
+                ("unavailable", None, 0),
+                ("syncing", 300, 0),
+                ("syncing", 200, 100),
+                ("syncing", 100, 200),
+            ],
+        )
+        self.assertIsNone(progress[1].eta)
+        self.assertGreater(progress[3].eta, 0)
+        self.assertEqual(len(self.server.client_ports), 1)
+
+    def test_unchanged_status_is_reported_once(self):
+        self.server.statuses = [{"status": "unavailable"}] * 3 + [{"status": "ready"}]
+        progress = []
+        self._make_probe().wait(progress.append)
+        self.assertEqual(progress, [SyncProgress(status="unavailable")])
+
+    def test_client_exit_stops_waiting(self):
+        with self.assertRaises(RaidenClientExited):
+            self._make_probe(is_running=lambda: False).wait()
+
+    def test_timeout(self):
+        with self.assertRaises(TimeoutError):
+            self._make_probe().wait(timeout=0.1)
+
+    def test_log_announcement_triggers_check(self):
+        log_path = self.folder_path.joinpath("raiden.log")
+        log_path.write_text("Starting Raiden\n")
+        self.server.statuses = [{"status": "unavailable"}, {"status": "ready"}]
+
+        def announce():
+            time.sleep(0.2)
+            with log_path.open("a") as log_file:
+                log_file.write("The Raiden API RPC server is now running at 127.0.0.1:5001\n")
+
+        threading.Thread(target=announce).start()
+        probe = self._make_probe(log_path=log_path, min_interval=30, max_interval=30)
+        self.assertLess(probe.wait(), 5)
+
+
+class LaunchMetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        patcher = patch.object(LaunchMetrics, "FOLDER_PATH", folder_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, folder_path)
+
+    def test_summary_by_release(self):
+        metrics = LaunchMetrics()
+        metrics.record("1.1.0", 10)
+        metrics.record("1.1.0", 20)
+        metrics.record("1.2.0", 5)
+
+        summary = metrics.summary()
+        self.assertEqual(summary["1.1.0"]["launches"], 2)
+        self.assertEqual(summary["1.1.0"]["mean"], 15)
+        self.assertEqual(summary["1.1.0"]["last"], 20)
+        self.assertEqual(summary["1.2.0"]["max"], 5)
@@ -0,0 +1,106 @@
+import threading
+import unittest
+
+from raiden_installer.tasks import TaskManager, TaskState, raise_if_cancelled
+
+TIMEOUT = 5
+
+
+class TaskManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.manager = TaskManager()
+        self.finished = {}
+
+    def _on_update(self, task):
+        if task.is_finished:
+            self.finished.setdefault(task.id, threading.Event()).set()
+
+    def _wait_finished(self, task):
+        self.assertTrue(self.finished.setdefault(task.id, threading.Event()).wait(TIMEOUT))
+
+    def _submit(self, fn, key=None, **kw):
+        return self.manager.submit("test", fn, key=key, on_update=self._on_update, **kw)
+
+    def test_submit_returns_before_task_finishes(self):
+        release = threading.Event()
+        task = self._submit(release.wait)
+        self.assertIsNotNone(task.id)
+        self.assertFalse(task.is_finished)
+        release.set()
+        self._wait_finished(task)
+        self.assertEqual(self.manager.get(task.id).state, TaskState.COMPLETED)
+
+    def test_tasks_for_same_key_are_serialized(self):
+        release = threading.Event()
+        first = self._submit(release.wait, key="0xaccount")
+        second = self._submit(lambda: None, key="0xaccount")
+
+        self.assertEqual(second.state, TaskState.PENDING)
+        release.set()
+        self._wait_finished(second)
+        self.assertLessEqual(first.finished_at, second.started_at)
+
+    def test_tasks_for_different_keys_run_in_parallel(self):
+        both_running = threading.Barrier(2, timeout=TIMEOUT)
+        first = self._submit(both_running.wait, key="0xone")
+        second = self._submit(both_running.wait, key="0xtwo")
+        self._wait_finished(first)
+        self._wait_finished(second)
+        self.assertEqual(first.state, TaskState.COMPLETED)
+        self.assertEqual(second.state, TaskState.COMPLETED)
+
+    def test_cancel_pending_task(self):
+        release = threading.Event()
+        first = self._submit(release.wait, key="0xaccount")
+        second = self._submit(lambda: None, key="0xaccount")
+
+        self.assertTrue(self.manager.cancel(second.id))
+        self.assertEqual(second.state, TaskState.CANCELLED)
+        release.set()
+        self._wait_finished(first)
+        self.assertIsNone(second.started_at)
+
+    def test_cancel_running_task(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def action():
+            started.set()
+            release.wait(TIMEOUT)
+            raise_if_cancelled()
+
+        task = self._submit(action)
+        started.wait(TIMEOUT)
+        self.assertTrue(self.manager.cancel(task.id))
+        release.set()
+        self._wait_finished(task)
+        self.assertEqual(task.state, TaskState.CANCELLED)
+        self.assertFalse(self.manager.cancel(task.id))
+
+    def test_failed_task_keeps_error(self):
+        def action():
+            raise ValueError("no funds")
+
+        task = self._submit(action)
+        self._wait_finished(task)
+        self.assertEqual(task.state, TaskState.FAILED)
+        self.assertEqual(task.error, "no funds")
+
+    def test_aborted_task_does_not_block_its_key(self):
+        def action():
+            raise SystemExit(1)
+
+        first = self._submit(action, key="0xaccount")
+        second = self._submit(lambda: None, key="0xaccount")
+        self._wait_finished(second)
+        self.assertEqual(first.state, TaskState.FAILED)
+        self.assertIsNotNone(first.finished_at)
+        self.assertEqual(second.state, TaskState.COMPLETED)
+
+    def test_finished_tasks_are_pruned(self):
+        self.manager.history_size = 2
+        tasks = [self._submit(lambda: None, key="0xaccount") for _ in range(4)]
+        for task in tasks:
+            self._wait_finished(task)
+        self._submit(lambda: None)
+        self.assertLessEqual(len(self.manager.list(key="0xaccount")), 2)
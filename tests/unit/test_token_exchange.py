@@ -0,0 +1,199 @@
+import time
+import unittest
+from types import SimpleNamespace
+
+from web3.datastructures import AttributeDict
+
+from raiden_installer.executors import QUOTES, get_executor
+from raiden_installer.token_exchange import Exchange, ExchangeError, get_quotes
+from raiden_installer.tokens import Erc20Token, EthereumAmount, TokenAmount, Wei
+
+RPC_DELAY = 0.2
+
+
+class FakeExchange:
+    delay = 0.2
+    total = EthereumAmount(1)
+
+    def __init__(self, w3):
+        self.w3 = w3
+
+    def calculate_transaction_costs(self, token_amount, account):
+        time.sleep(self.delay)
+        return {"total": self.total}
+
+
+class CheapExchange(FakeExchange):
+    total = EthereumAmount("0.5")
+
+
+class ExpensiveExchange(FakeExchange):
+    total = EthereumAmount(2)
+
+
+class SlowExchange(FakeExchange):
+    delay = 2
+
+
+class BlockingExchange(FakeExchange):
+    delay = 1
+
+
+class FailingExchange(FakeExchange):
+    def calculate_transaction_costs(self, token_amount, account):
+        raise ExchangeError("Trade not possible at the moment due to lack of liquidity")
+
+
+class QuoteAggregationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.token_amount = TokenAmount(10, Erc20Token.find_by_ticker("RDN", "mainnet"))
+        # Jobs that timed out in earlier tests may still hold workers
+        executor = get_executor(QUOTES)
+        while executor.active or executor.queued:
+            time.sleep(0.05)
+
+    def _get_quotes(self, *exchange_classes, deadline=1):
+        return get_quotes(
+            w3=None,
+            token_amount=self.token_amount,
+            account=None,
+            deadline=deadline,
+            exchange_classes=exchange_classes,
+        )
+
+    def test_exchanges_are_queried_concurrently(self):
+        started_at = time.monotonic()
+        quotes = self._get_quotes(ExpensiveExchange, CheapExchange, FakeExchange)
+
+        self.assertLess(time.monotonic() - started_at, 0.5)
+        self.assertEqual(
+            [quote.exchange for quote in quotes],
+            ["CheapExchange", "FakeExchange", "ExpensiveExchange"],
+        )
+        for quote in quotes:
+            self.assertGreaterEqual(quote.latency, 0.2)
+
+    def test_failing_and_slow_exchanges_do_not_block_others(self):
+        started_at = time.monotonic()
+        quotes = self._get_quotes(SlowExchange, FailingExchange, CheapExchange, deadline=0.5)
+
+        self.assertLess(time.monotonic() - started_at, 1)
+        self.assertEqual(quotes[0].exchange, "CheapExchange")
+        self.assertEqual(quotes[0].total, EthereumAmount("0.5"))
+        errors = {quote.exchange: quote.error for quote in quotes[1:]}
+        self.assertIn("liquidity", errors["FailingExchange"])
+        self.assertIn("No quote within", errors["SlowExchange"])
+
+    def _saturate_quote_workers(self):
+        """ Leave every worker busy for a second with jobs of a request that timed out """
+        workers = get_executor(QUOTES).max_workers
+        exchange_classes = [
+            type(f"Blocking{index}", (BlockingExchange,), {}) for index in range(workers)
+        ]
+        self._get_quotes(*exchange_classes, deadline=0.1)
+
+    def test_deadline_starts_when_the_job_runs(self):
+        self._saturate_quote_workers()
+        # Waits about 0.9 seconds for a worker, the quote itself takes 0.6
+        slower_exchange = type("CheapExchange", (CheapExchange,), {"delay": 0.6})
+        quotes = self._get_quotes(slower_exchange, deadline=1.2)
+        self.assertIsNone(quotes[0].error)
+        self.assertLess(quotes[0].latency, 1)
+
+    def test_jobs_that_cannot_start_are_dropped(self):
+        self._saturate_quote_workers()
+        quotes = self._get_quotes(CheapExchange, deadline=0.3)
+        self.assertIn("Too many quote requests", quotes[0].error)
+
+    def test_quote_as_dict(self):
+        quote = self._get_quotes(CheapExchange)[0]
+        self.assertEqual(
+            quote.to_dict(),
+            {
+                "exchange": "CheapExchange",
+                "as_wei": 5 * 10 ** 17,
+                "formatted": "0.5 ETH",
+                "latency": round(quote.latency, 3),
+                "error": None,
+            },
+        )
+
+
+class SlowEth:
+    """ Node that takes ``RPC_DELAY`` to answer every request """
+
+    chainId = 1
+
+    def getBlock(self, block_identifier):
+        time.sleep(RPC_DELAY)
+        return AttributeDict({"timestamp": 1600000000, "gasLimit": 10_000_000})
+
+    def getTransactionCount(self, address, block_identifier):
+        time.sleep(RPC_DELAY)
+        return 7
+
+
+class SlowNodeExchange(Exchange):
+    def __init__(self, w3):
+        super().__init__(w3)
+        self.estimate_params = None
+
+    def is_listing_token(self, ticker):
+        return True
+
+    def get_current_rate(self, token_amount):
+        time.sleep(RPC_DELAY)
+        return EthereumAmount("0.01")
+
+    def _get_gas_price(self):
+        time.sleep(RPC_DELAY)
+        return EthereumAmount(Wei(10 ** 9))
+
+    def _estimate_gas(self, token_amount, account, transaction_params, **kw):
+        time.sleep(RPC_DELAY)
+        self.estimate_params = dict(transaction_params, **kw)
+        return 100_000
+
+
+class TransactionCostsTestCase(unittest.TestCase):
+    def setUp(self):
+        w3 = SimpleNamespace(
+            eth=SlowEth(), provider=SimpleNamespace(endpoint_uri="http://slow-node.test")
+        )
+        self.exchange = SlowNodeExchange(w3)
+        self.account = SimpleNamespace(address="0x" + "01" * 20)
+        self.token_amount = TokenAmount(10, Erc20Token.find_by_ticker("RDN", "mainnet"))
+
+    def test_independent_requests_run_concurrently(self):
+        started_at = time.monotonic()
+        costs = self.exchange.calculate_transaction_costs(self.token_amount, self.account)
+
+        # The rate, gas price, block and nonce are fetched together, then gas is estimated
+        self.assertLess(time.monotonic() - started_at, 3.5 * RPC_DELAY)
+        self.assertEqual(costs["gas"], 125_000)
+        eth_sold = Exchange._get_eth_sold(self.token_amount, EthereumAmount("0.01"))
+        self.assertEqual(costs["eth_sold"], eth_sold)
+        self.assertEqual(costs["total"].as_wei, eth_sold.as_wei + 125_000 * 10 ** 9)
+        self.assertEqual(
+            set(costs["latencies"]),
+            {"exchange_rate", "gas_price", "latest_block", "nonce", "gas", "total"},
+        )
+        for latency in costs["latencies"].values():
+            self.assertGreaterEqual(latency, RPC_DELAY)
+
+    def test_shared_inputs_are_passed_to_the_gas_estimate(self):
+        self.exchange.calculate_transaction_costs(self.token_amount, self.account)
+
+        params = self.exchange.estimate_params
+        self.assertEqual(params["nonce"], 7)
+        self.assertEqual(params["latest_block"].timestamp, 1600000000)
+        self.assertEqual(params["exchange_rate"], EthereumAmount("0.01"))
+        eth_sold = Exchange._get_eth_sold(self.token_amount, EthereumAmount("0.01"))
+        self.assertEqual(params["value"], eth_sold.as_wei)
+
+    def test_gas_is_capped_by_the_block_gas_limit(self):
+        self.exchange.w3.eth.getBlock = lambda block_identifier: AttributeDict(
+            {"timestamp": 1600000000, "gasLimit": 100_000}
+        )
+        costs = self.exchange.calculate_transaction_costs(self.token_amount, self.account)
+        self.assertEqual(costs["gas"], 90_000)
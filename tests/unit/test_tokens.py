@@ -1,9 +1,11 @@
 import unittest
+from decimal import Decimal, getcontext
 
 from eth_utils import to_canonical_address
 
 from raiden_installer import load_settings
 from raiden_installer.tokens import (
+    TOKEN_REGISTRY,
     Erc20Token,
     EthereumAmount,
     RequiredAmounts,
@@ -100,6 +102,29 @@ class TokenAmountTestCase(unittest.TestCase):
         rdn_token = Erc20Token.find_by_ticker("RDN", "mainnet")
         self.assertEqual(self.one_rdn.address, rdn_token.address)
 
+    def test_conversion_is_exact(self):
+        amount = EthereumAmount("123456789.123456789123456789")
+        self.assertEqual(amount.as_wei, Wei(123456789_123456789123456789))
+        self.assertEqual(amount.value, Decimal("123456789.123456789123456789"))
+        self.assertEqual(
+            EthereumAmount(Decimal("0.1")) + EthereumAmount(0.2), EthereumAmount("0.3")
+        )
+
+    def test_does_not_change_decimal_context(self):
+        precision = getcontext().prec
+        TokenAmount(Wei(1), Erc20Token("USDC", "UEI", decimals=6, address=b"\x01" * 20))
+        self.assertEqual(getcontext().prec, precision)
+
+    def test_arithmetic_keeps_amount_type(self):
+        two_rdn = self.one_rdn + self.one_rdn
+        self.assertIsInstance(two_rdn, TokenAmount)
+        self.assertEqual(two_rdn.address, self.one_rdn.address)
+        self.assertEqual(repr(two_rdn), "2 RDN")
+
+    def test_formatted_is_cached(self):
+        amount = EthereumAmount("0.875")
+        self.assertIs(amount.formatted, amount.formatted)
+
 
 class Erc20TokenTestCase(unittest.TestCase):
     def test_cannot_initialize_token_without_address(self):
@@ -117,6 +142,24 @@ class Erc20TokenTestCase(unittest.TestCase):
             to_canonical_address("0x95b2d84de40a0121061b105e6b54016a49621b44")
         )
 
+    def test_find_by_address(self):
+        wiz_token = Erc20Token.find_by_ticker("WIZ", "goerli")
+        self.assertIs(
+            Erc20Token.find_by_address("0x95B2D84De40a0121061b105E6B54016a49621B44", "goerli"),
+            wiz_token,
+        )
+        self.assertIs(Erc20Token.find_by_address(wiz_token.address, "goerli"), wiz_token)
+        with self.assertRaises(TokenError):
+            Erc20Token.find_by_address(wiz_token.address, "mainnet")
+
+    def test_token_lists_by_contracts_version(self):
+        self.assertEqual(
+            TOKEN_REGISTRY.get("RDN", "goerli", version="0.25").address,
+            to_canonical_address("0x3a989d97388a39a0b5796306c615d10b7416be77"),
+        )
+        with self.assertRaises(TokenError):
+            TOKEN_REGISTRY.get("DAI", "mainnet", version="0.25")
+
 
 class InstallerAmountsTestCase(unittest.TestCase):
     def setUp(self):
@@ -150,6 +193,15 @@ class InstallerAmountsTestCase(unittest.TestCase):
             TokenAmount(Wei(self.settings.transfer_token.amount_required), self.transfer_token)
         )
 
+    def test_amounts_are_computed_once_per_settings(self):
+        self.assertIs(
+            RequiredAmounts.from_settings(self.settings),
+            RequiredAmounts.from_settings(load_settings("mainnet")),
+        )
+        self.assertIs(
+            SwapAmounts.from_settings(self.settings), SwapAmounts.from_settings(self.settings)
+        )
+
     def test_create_swap_amounts(self):
         swap_amounts = SwapAmounts.from_settings(self.settings)
 
@@ -0,0 +1,174 @@
+import json
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from eth_abi import decode_abi, encode_abi
+from eth_utils import (
+    decode_hex,
+    encode_hex,
+    function_signature_to_4byte_selector,
+    to_canonical_address,
+    to_checksum_address,
+)
+from web3 import Web3
+
+from raiden_contracts.constants import CONTRACT_USER_DEPOSIT
+from raiden_installer import multicall
+from raiden_installer.ethereum_rpc import SessionHTTPProvider
+from raiden_installer.tokens import Erc20Token, EthereumAmount, TokenAmount
+from raiden_installer.transactions import AccountSnapshot, get_account_snapshot
+from raiden_installer.utils import get_contract_address
+
+ACCOUNT_ADDRESS = to_canonical_address("0x" + "11" * 20)
+BLOCK_NUMBER = 10_000_000
+
+
+class AccountSnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.service_token = Erc20Token.find_by_ticker("RDN", "mainnet")
+        self.transfer_token = Erc20Token.find_by_ticker("DAI", "mainnet")
+        self.snapshot = AccountSnapshot(
+            block_number=1,
+            ethereum_balance=EthereumAmount(1),
+            service_token_balance=TokenAmount(2, self.service_token),
+            service_token_deposit=TokenAmount(3, self.service_token),
+            service_token_total_deposit=TokenAmount(3, self.service_token),
+            service_token_allowance=TokenAmount(0, self.service_token),
+            transfer_token_balance=TokenAmount(4, self.transfer_token),
+        )
+
+    def test_total_service_token_owned_includes_deposit(self):
+        self.assertEqual(
+            self.snapshot.total_service_token_owned, TokenAmount(5, self.service_token)
+        )
+
+    def test_get_token_balance(self):
+        self.assertEqual(
+            self.snapshot.get_token_balance(self.transfer_token),
+            TokenAmount(4, self.transfer_token),
+        )
+
+    def test_cannot_get_balance_of_unknown_token(self):
+        with self.assertRaises(ValueError):
+            self.snapshot.get_token_balance(Erc20Token.find_by_ticker("WIZ", "goerli"))
+
+
+def selector(signature):
+    return function_signature_to_4byte_selector(signature)
+
+
+class FakeNodeProvider(SessionHTTPProvider):
+    """ Node that answers the reads of an account snapshot with distinct values
+
+    ``eth_call`` is dispatched on the target address and the function
+    selector, calls to Multicall's ``aggregate`` are executed call by call.
+    """
+
+    def __init__(self, results):
+        super().__init__("http://snapshot-node.test")
+        self.results = results
+        self.posts = []
+
+    def post(self, request_data):
+        payload = json.loads(request_data)
+        self.posts.append(payload)
+        requests = payload if isinstance(payload, list) else [payload]
+        responses = [
+            {"jsonrpc": "2.0", "id": request["id"], "result": self._answer(request)}
+            for request in requests
+        ]
+        return json.dumps(responses if isinstance(payload, list) else responses[0]).encode()
+
+    def _answer(self, request):
+        method, params = request["method"], request["params"]
+        if method == "eth_chainId":
+            return "0x1"
+        if method == "eth_getBlockByNumber":
+            return {"number": hex(BLOCK_NUMBER)}
+        if method == "eth_getBalance":
+            return hex(self.results["eth"])
+        if method == "eth_call":
+            target, data = params[0]["to"], params[0]["data"]
+            return encode_hex(self._call(to_canonical_address(target), decode_hex(data)))
+        raise AssertionError(f"Unexpected request {method}")
+
+    def _call(self, target, data):
+        function_selector, arguments = data[:4], data[4:]
+        if function_selector == selector("aggregate((address,bytes)[])"):
+            (calls,) = decode_abi(["(address,bytes)[]"], arguments)
+            return_data = [self._call(to_canonical_address(to), call) for to, call in calls]
+            return encode_abi(["uint256", "bytes[]"], [BLOCK_NUMBER, return_data])
+        if function_selector == selector("getEthBalance(address)"):
+            return encode_abi(["uint256"], [self.results["eth"]])
+        output_type, value = self.results[(target, function_selector)]
+        return encode_abi([output_type], [value])
+
+
+class AccountSnapshotReadTestCase(unittest.TestCase):
+    def setUp(self):
+        self.service_token = Erc20Token.find_by_ticker("RDN", "mainnet")
+        self.transfer_token = Erc20Token.find_by_ticker("DAI", "mainnet")
+        deposit_address = get_contract_address(1, CONTRACT_USER_DEPOSIT)
+        self.provider = FakeNodeProvider(
+            {
+                "eth": 1,
+                (self.service_token.address, selector("balanceOf(address)")): ("uint256", 2),
+                (deposit_address, selector("token()")): (
+                    "address",
+                    to_checksum_address(self.service_token.address),
+                ),
+                (deposit_address, selector("effectiveBalance(address)")): ("uint256", 3),
+                (deposit_address, selector("total_deposit(address)")): ("uint256", 4),
+                (self.service_token.address, selector("allowance(address,address)")): (
+                    "uint256",
+                    5,
+                ),
+                (self.transfer_token.address, selector("balanceOf(address)")): ("uint256", 6),
+            }
+        )
+        self.w3 = Web3(self.provider)
+        self.account = SimpleNamespace(address=ACCOUNT_ADDRESS)
+
+    def _get_snapshot(self, **kw):
+        return get_account_snapshot(
+            self.w3, self.account, self.service_token, self.transfer_token, **kw
+        )
+
+    def _assert_values(self, snapshot):
+        self.assertEqual(snapshot.block_number, BLOCK_NUMBER)
+        self.assertEqual(snapshot.ethereum_balance.as_wei, 1)
+        self.assertEqual(snapshot.service_token_balance.as_wei, 2)
+        self.assertEqual(snapshot.service_token_deposit.as_wei, 3)
+        self.assertEqual(snapshot.service_token_total_deposit.as_wei, 4)
+        self.assertEqual(snapshot.service_token_allowance.as_wei, 5)
+        self.assertEqual(snapshot.transfer_token_balance.as_wei, 6)
+
+    def _get_requests(self, method):
+        requests = []
+        for payload in self.provider.posts:
+            requests.extend(payload if isinstance(payload, list) else [payload])
+        return [request for request in requests if request["method"] == method]
+
+    def test_reads_with_multicall(self):
+        self._assert_values(self._get_snapshot())
+        self.assertEqual(len(self._get_requests("eth_call")), 1)
+
+    def test_reads_with_batch_pinned_to_block(self):
+        with patch.dict(multicall.MULTICALL_ADDRESSES, clear=True):
+            self._assert_values(self._get_snapshot())
+
+        reads = self._get_requests("eth_call") + self._get_requests("eth_getBalance")
+        self.assertEqual(len(reads), 7)
+        self.assertEqual({request["params"][-1] for request in reads}, {hex(BLOCK_NUMBER)})
+        batches = [payload for payload in self.provider.posts if isinstance(payload, list)]
+        self.assertIn(7, [len(batch) for batch in batches])
+
+    def test_deposit_for_other_token_is_rejected(self):
+        deposit_address = get_contract_address(1, CONTRACT_USER_DEPOSIT)
+        self.provider.results[(deposit_address, selector("token()"))] = (
+            "address",
+            to_checksum_address(self.transfer_token.address),
+        )
+        with self.assertRaises(ValueError):
+            self._get_snapshot()
@@ -0,0 +1,162 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from tests.constants import TESTING_TEMP_FOLDER
+
+from raiden_installer.constants import NULL_ADDRESS
+from raiden_installer.exchange_metadata import ExchangeMetadataCache
+from raiden_installer.uniswap.pricing import (
+    UniswapError,
+    UniswapPairs,
+    get_amount_in,
+    get_amount_out,
+)
+
+FACTORY = b"\x0f" * 20
+WETH = b"\xee" * 20
+TOKEN = b"\x01" * 20
+OTHER_TOKEN = b"\x02" * 20
+PAIR = b"\xaa" * 20
+
+
+class FakeCall:
+    def __init__(self, result, calls, delay=0):
+        self.result = result
+        self.calls = calls
+        self.delay = delay
+
+    def call(self, block_identifier="latest"):
+        self.calls.append(block_identifier)
+        time.sleep(self.delay)
+        return self.result
+
+
+class FakeChain:
+    """ Stands in for ``w3`` with a factory knowing one pair """
+
+    def __init__(self, reserves, delay=0):
+        self.reserves = reserves
+        self.delay = delay
+        self.get_pair_calls = []
+        self.get_reserves_calls = []
+        self.eth = SimpleNamespace(contract=self.contract)
+
+    def contract(self, abi, address):
+        if address == FACTORY:
+            return SimpleNamespace(functions=SimpleNamespace(getPair=self._get_pair))
+        return SimpleNamespace(functions=SimpleNamespace(getReserves=self._get_reserves))
+
+    def _get_pair(self, token_a, token_b):
+        pair = PAIR if {token_a, token_b} == {WETH, TOKEN} else NULL_ADDRESS
+        return FakeCall(pair, self.get_pair_calls)
+
+    def _get_reserves(self):
+        return FakeCall((*self.reserves, 0), self.get_reserves_calls, self.delay)
+
+
+class UniswapLibraryTestCase(unittest.TestCase):
+    # The small cases come from the Uniswap V2 periphery tests. The others are
+    # worked out by hand from the library's formulas at 18 decimals, where a
+    # different fee or a missing rounding step changes the result.
+    def test_get_amount_in(self):
+        self.assertEqual(get_amount_in(1, 100, 100), 2)
+        self.assertEqual(
+            get_amount_in(3 * 10 ** 18, 5_000 * 10 ** 18, 2_000_000 * 10 ** 18),
+            7_522_578_986_977_809,
+        )
+        self.assertEqual(
+            get_amount_in(1_234_567_890_123_456_789, 812 * 10 ** 18 + 345, 98_765 * 10 ** 18),
+            10_180_713_332_786_095,
+        )
+
+    def test_get_amount_out(self):
+        self.assertEqual(get_amount_out(2, 100, 100), 1)
+        self.assertEqual(
+            get_amount_out(10 ** 18, 5_000 * 10 ** 18, 2_000_000 * 10 ** 18),
+            398_720_495_133_270_425_877,
+        )
+        self.assertEqual(
+            get_amount_out(2 * 10 ** 18 + 1, 98_765 * 10 ** 18, 812 * 10 ** 18 + 345),
+            16_393_411_750_488_224,
+        )
+
+    def test_rejects_what_the_router_rejects(self):
+        for args in [(0, 100, 100), (1, 0, 100), (1, 100, 0), (100, 100, 100)]:
+            with self.assertRaises(UniswapError):
+                get_amount_in(*args)
+        with self.assertRaises(UniswapError):
+            get_amount_out(0, 100, 100)
+
+    def test_amount_in_is_the_smallest_sufficient_input(self):
+        reserve_in, reserve_out = 1234 * 10 ** 18, 98_765_432 * 10 ** 18
+        for amount_out in [10 ** 9, 10 ** 18, 12_345 * 10 ** 18, 9 * 10 ** 25]:
+            amount_in = get_amount_in(amount_out, reserve_in, reserve_out)
+            self.assertGreaterEqual(get_amount_out(amount_in, reserve_in, reserve_out), amount_out)
+            self.assertLess(get_amount_out(amount_in - 2, reserve_in, reserve_out), amount_out)
+
+
+class UniswapPairsTestCase(unittest.TestCase):
+    def setUp(self):
+        TESTING_TEMP_FOLDER.mkdir(parents=True, exist_ok=True)
+        folder_path = Path(tempfile.mkdtemp(dir=TESTING_TEMP_FOLDER))
+        self.addCleanup(shutil.rmtree, folder_path)
+        metadata = ExchangeMetadataCache()
+        metadata.FOLDER_PATH = folder_path
+        patcher = patch("raiden_installer.uniswap.pricing.EXCHANGE_METADATA", metadata)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.pairs = UniswapPairs()
+        # WETH sorts after TOKEN, so the pair's token0 is TOKEN
+        self.chain = FakeChain(reserves=(10_000, 20_000))
+
+    def _get_amounts_in(self, amount_out, block_number):
+        return self.pairs.get_amounts_in(
+            self.chain, 1, FACTORY, amount_out, [WETH, TOKEN], block_number
+        )
+
+    def test_get_amounts_in(self):
+        self.chain.reserves = (10_000, 10_000)
+        self.assertEqual(self._get_amounts_in(1, 1), [2, 1])
+
+    def test_reserves_are_ordered_by_token(self):
+        # Selling WETH, which is token1 with 20_000 in reserve
+        self.assertEqual(self._get_amounts_in(100, 1)[0], get_amount_in(100, 20_000, 10_000))
+
+    def test_reserves_are_read_once_per_block(self):
+        for amount_out in range(1, 50):
+            self._get_amounts_in(amount_out, 7)
+        self.assertEqual(self.chain.get_reserves_calls, [7])
+
+        self.chain.reserves = (5_000, 40_000)
+        self.assertEqual(self._get_amounts_in(100, 8)[0], get_amount_in(100, 40_000, 5_000))
+        self.assertEqual(self.chain.get_reserves_calls, [7, 8])
+        self.assertEqual(len(self.chain.get_pair_calls), 1)
+
+    def test_concurrent_quotes_share_the_reserves_read(self):
+        self.chain.delay = 0.1
+        threads = [
+            threading.Thread(target=self._get_amounts_in, args=(amount_out, 7))
+            for amount_out in range(1, 5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.chain.get_reserves_calls, [7])
+
+    def test_missing_pairs_are_not_cached(self):
+        for _ in range(2):
+            self.assertEqual(
+                self.pairs.get_pair_address(self.chain, 1, FACTORY, WETH, OTHER_TOKEN),
+                NULL_ADDRESS,
+            )
+        self.assertEqual(len(self.chain.get_pair_calls), 2)
+        with self.assertRaises(UniswapError):
+            self.pairs.get_amounts_in(self.chain, 1, FACTORY, 1, [WETH, OTHER_TOKEN], 1)
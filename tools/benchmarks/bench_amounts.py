@@ -0,0 +1,73 @@
+"""
+Compare the integer backed amounts of ``raiden_installer.tokens`` with the
+previous implementation, which kept a ``Decimal`` and set the precision of
+the decimal context on every construction.
+
+    PYTHONPATH=. python tools/benchmarks/bench_amounts.py --number 100000
+"""
+import argparse
+import timeit
+from decimal import Decimal, getcontext
+
+from raiden_installer.tokens import ETH, EthereumAmount, Wei
+
+
+class DecimalAmount:
+    """ The Decimal backed amount type as it was before """
+
+    def __init__(self, value, currency):
+        context = getcontext()
+        context.prec = currency.decimals
+        self.value = Decimal(str(value), context=context)
+        if type(value) is Wei:
+            self.value /= 10 ** currency.decimals
+        self.currency = currency
+
+    @property
+    def formatted(self):
+        return self.currency.format_value(Decimal(self.as_wei))
+
+    @property
+    def as_wei(self):
+        return Wei(self.value * (10 ** self.currency.decimals))
+
+    def __add__(self, other):
+        if not self.currency == other.currency:
+            raise ValueError(f"Cannot add {self.formatted} and {other.formatted}")
+        return DecimalAmount(Wei(self.as_wei + other.as_wei), self.currency)
+
+    def __lt__(self, other):
+        if not self.currency == other.currency:
+            raise ValueError(f"Cannot compare {self.currency} with {other.currency}")
+        return self.as_wei < other.as_wei
+
+
+def make_cases(make_amount):
+    balance = make_amount(Wei(1_234_567_890_123_456_789))
+    required = make_amount(Wei(75_000_000_000_000_000))
+    return {
+        "construct from wei": lambda: make_amount(Wei(1_234_567_890_123_456_789)),
+        "construct from units": lambda: make_amount("0.875"),
+        "add": lambda: balance + required,
+        "compare": lambda: required < balance,
+        "as_wei": lambda: balance.as_wei,
+        "formatted": lambda: balance.formatted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--number", type=int, default=100_000)
+    args = parser.parse_args()
+
+    decimal_cases = make_cases(lambda value: DecimalAmount(value, ETH))
+    wei_cases = make_cases(EthereumAmount)
+    print(f"{'operation':<24}{'decimal (us)':>14}{'wei (us)':>14}{'speedup':>10}")
+    for name, decimal_case in decimal_cases.items():
+        decimal_time = timeit.timeit(decimal_case, number=args.number) / args.number * 1e6
+        wei_time = timeit.timeit(wei_cases[name], number=args.number) / args.number * 1e6
+        print(f"{name:<24}{decimal_time:>14.3f}{wei_time:>14.3f}{decimal_time / wei_time:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
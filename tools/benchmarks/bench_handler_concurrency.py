@@ -0,0 +1,68 @@
+"""
+Compare request latency of a tornado handler doing blocking work on the IOLoop
+with one offloading it to the executor pools of ``raiden_installer.executors``.
+
+    PYTHONPATH=. python tools/benchmarks/bench_handler_concurrency.py --requests 32 --delay 0.2
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from tornado.httpclient import AsyncHTTPClient
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+from tornado.web import Application, HTTPServer, RequestHandler
+
+from raiden_installer.executors import RPC, configure_executors, get_executor_stats, run_blocking
+
+
+def slow_rpc_call(delay):
+    # Stand-in for a web3 call waiting on the ethereum node
+    time.sleep(delay)
+    return {"block_number": 1}
+
+
+class InlineHandler(RequestHandler):
+    def get(self):
+        self.write(slow_rpc_call(self.settings["delay"]))
+
+
+class OffloadedHandler(RequestHandler):
+    async def get(self):
+        self.write(await run_blocking(RPC, slow_rpc_call, self.settings["delay"]))
+
+
+async def measure(port, path, requests):
+    client = AsyncHTTPClient(max_clients=requests)
+    started_at = time.monotonic()
+    await asyncio.gather(
+        *[client.fetch(f"http://127.0.0.1:{port}{path}") for _ in range(requests)]
+    )
+    return time.monotonic() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    configure_executors(rpc=args.workers)
+    app = Application(
+        [("/inline", InlineHandler), ("/offloaded", OffloadedHandler)], delay=args.delay
+    )
+    sockets = bind_sockets(0, "127.0.0.1")
+    port = sockets[0].getsockname()[1]
+    HTTPServer(app).add_sockets(sockets)
+
+    io_loop = IOLoop.current()
+    for path in ("/inline", "/offloaded"):
+        elapsed = io_loop.run_sync(lambda: measure(port, path, args.requests))
+        print(f"{path:>12}: {args.requests} requests in {elapsed:.2f}s")
+    print(json.dumps(get_executor_stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
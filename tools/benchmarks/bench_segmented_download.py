@@ -0,0 +1,87 @@
+"""
+Compare single stream and segmented downloads of ``raiden_installer.downloads``
+against a local HTTP server limiting the bandwidth of every connection.
+
+    PYTHONPATH=. python tools/benchmarks/bench_segmented_download.py --size 16 --bandwidth 4
+"""
+import argparse
+import os
+import re
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from raiden_installer.downloads import ArtifactCache
+
+CHUNK_SIZE = 16 * 1024
+
+
+class ThrottledHandler(BaseHTTPRequestHandler):
+    """ Serves ``server.content`` with range support, throttled per connection """
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        content = self.server.content
+        start, end = 0, len(content)
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if match:
+            start = int(match.group(1))
+            end = int(match.group(2)) + 1 if match.group(2) else end
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(content)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("ETag", '"benchmark"')
+        self.end_headers()
+
+        for offset in range(start, end, CHUNK_SIZE):
+            chunk = content[offset : min(offset + CHUNK_SIZE, end)]
+            self.wfile.write(chunk)
+            time.sleep(len(chunk) / self.server.bandwidth)
+
+    def log_message(self, *args):
+        pass
+
+
+def measure(url, connections):
+    cache_folder = Path(tempfile.mkdtemp())
+
+    class BenchmarkCache(ArtifactCache):
+        FOLDER_PATH = cache_folder
+
+    started_at = time.monotonic()
+    with BenchmarkCache().open(url, connections=connections) as download:
+        while download.read(CHUNK_SIZE):
+            pass
+    return time.monotonic() - started_at
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=16, help="archive size in MiB")
+    parser.add_argument("--bandwidth", type=float, default=4, help="MiB/s per connection")
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledHandler)
+    server.daemon_threads = True
+    server.content = os.urandom(args.size * 2 ** 20)
+    server.bandwidth = args.bandwidth * 2 ** 20
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    url = f"http://127.0.0.1:{server.server_address[1]}/raiden.tar.gz"
+    for connections in args.connections:
+        elapsed = measure(url, connections)
+        print(
+            f"{connections:>3} connections: {args.size} MiB in {elapsed:.2f}s "
+            f"({args.size / elapsed:.1f} MiB/s)"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()